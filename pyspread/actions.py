@@ -370,7 +370,64 @@ class MainWindowActions(AttrDict):
             Action(self.parent, "Refresh selected cells",
                    self.parent.grid.refresh_selected_frozen_cells,
                    icon=Icon.refresh, shortcut=QKeySequence.Refresh,
-                   statustip='Refresh selected cells even when frozen')
+                   statustip='Refresh selected frozen and volatile cells')
+
+        self.recalculate_parallel = \
+            Action(self.parent, "Recalculate in parallel",
+                   self.parent.on_recalculate_parallel,
+                   icon=Icon.refresh,
+                   statustip='Recalculates all cells, independent cells are '
+                             'evaluated concurrently in worker processes')
+
+        self.toggle_manual_calculation = \
+            Action(self.parent, "Manual calculation",
+                   self.parent.on_toggle_manual_calculation, checkable=True,
+                   statustip='Changes only mark dependent cells as dirty '
+                             'until they are recalculated')
+
+        self.recalculate = \
+            Action(self.parent, "Recalculate",
+                   self.parent.on_recalculate, shortcut='F9',
+                   statustip='Recalculates all dirty cells')
+
+        self.recalculate_table = \
+            Action(self.parent, "Recalculate table",
+                   self.parent.on_recalculate_table, shortcut='Shift+F9',
+                   statustip='Recalculates dirty cells of the current table')
+
+        self.recalculate_selection = \
+            Action(self.parent, "Recalculate selection",
+                   self.parent.on_recalculate_selection,
+                   statustip='Recalculates dirty cells of the selection')
+
+        self.toggle_kernel = \
+            Action(self.parent, "Evaluate in kernel process",
+                   self.parent.on_toggle_kernel, checkable=True,
+                   statustip='Evaluates cells in a separate process so that '
+                             'long running cells do not block pyspread')
+
+        self.restart_kernel = \
+            Action(self.parent, "Restart kernel",
+                   self.parent.on_restart_kernel,
+                   statustip='Cancels running evaluations of the kernel '
+                             'process and restarts it')
+
+        self.toggle_profiler = \
+            Action(self.parent, "Profile cell evaluation",
+                   self.parent.on_toggle_profiler, checkable=True,
+                   statustip='Records evaluation time and result size of '
+                             'each cell')
+
+        self.hot_cells = Action(self.parent, "Hot cells...",
+                                self.parent.on_hot_cells,
+                                statustip='Lists profiled cells sorted by '
+                                          'evaluation time')
+
+        self.show_heat_map = Action(self.parent, "Show heat map",
+                                    self.parent.grid.on_show_heat_map_pressed,
+                                    checkable=True,
+                                    statustip='Colors profiled cells by '
+                                              'evaluation time')
 
         self.toggle_periodic_updates = \
             Action(self.parent, "Toggle periodic updates",
@@ -401,6 +458,12 @@ class MainWindowActions(AttrDict):
                    statustip='Apply format from the clipboard to the selected '
                              'cells')
 
+        self.compact_format = \
+            Action(self.parent, "Compact format",
+                   self.parent.grid.on_compact_format,
+                   statustip='Remove format layers that do not change the '
+                             'format of any cell')
+
         self.font = Action(self.parent, "&Font...",
                            self.parent.grid. on_font_dialog,
                            icon=Icon.font_dialog,
@@ -499,6 +562,12 @@ class MainWindowActions(AttrDict):
                                             'is is only updated when <F5> is '
                                             'pressed')
 
+        self.refresh_interval = \
+            Action(self.parent, "Refresh interval...",
+                   self.parent.grid.on_refresh_interval,
+                   statustip='Set the interval, in which frozen cells are '
+                             'refreshed when periodic updates are active')
+
         self.lock_cell = Action(self.parent, "Lock cell",
                                 self.parent.grid.on_lock_pressed,
                                 icon=Icon.lock,
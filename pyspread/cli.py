@@ -108,7 +108,9 @@ class PyspreadArgumentParser(ArgumentParser):
                       "Python."
 
         # Override usage because of the PathAction fix for paths with spaces
-        usage_tpl = "{} [-h] [--version] [--default-settings] [file]"
+        usage_tpl = "{} [-h] [--version] [--default-settings] " \
+                    "[--headless FILE [FILE ...]] [--output-dir DIR] " \
+                    "[--format {{csv,json}}] [--jobs N] [file]"
         usage = usage_tpl.format(APP_NAME)
 
         super().__init__(prog=APP_NAME, description=description, usage=usage)
@@ -120,5 +122,23 @@ class PyspreadArgumentParser(ArgumentParser):
         self.add_argument('--reset-settings', action='store_true',
                           help=reset_settings_help)
 
+        headless_help = 'recalculate approved pys or pysu files and export ' \
+                        'results of each table without GUI'
+        self.add_argument('--headless', type=Path, nargs="+", metavar="FILE",
+                          help=headless_help)
+
+        output_dir_help = 'directory for exported files in headless mode, ' \
+                          'defaults to the directory of each file'
+        self.add_argument('--output-dir', type=Path, metavar="DIR",
+                          help=output_dir_help)
+
+        format_help = 'export file format in headless mode'
+        self.add_argument('--format', choices=("csv", "json"), default="csv",
+                          help=format_help)
+
+        jobs_help = 'number of files that are processed concurrently in ' \
+                    'headless mode, defaults to the number of processors'
+        self.add_argument('--jobs', type=int, metavar="N", help=jobs_help)
+
         file_help = 'open pyspread file in pys or pysu format'
         self.add_argument('file', action=PathAction, nargs="*", help=file_help)
@@ -29,6 +29,7 @@ Pyspread undoable commands
 * :class:`SetCellMerge`
 * :class:`SetCellRenderer`
 * :class:`SetCellTextAlignment`
+* :class:`CompactCellAttributes`
 * :class:`SetColumnWidth`
 * :class:`SetRowHeight`
 
@@ -741,6 +742,41 @@ class SetCellTextAlignment(SetCellFormat):
         self.model.dataChanged.emit(QModelIndex(), QModelIndex())
 
 
+class CompactCellAttributes(QUndoCommand):
+    """Removes redundant cell attribute layers without changing formats"""
+
+    def __init__(self, model: QAbstractTableModel, description: str):
+        """
+        :param model: Model of the grid object
+        :param description: Command description
+
+        """
+
+        super().__init__(description)
+
+        self.model = model
+        self.old_cell_attributes = list(model.code_array.cell_attributes)
+        self.no_removed = 0
+
+    def redo(self):
+        """Redo cell attribute compaction"""
+
+        cell_attributes = self.model.code_array.cell_attributes
+        self.no_removed = cell_attributes.compact()
+
+        if not self.no_removed:
+            # Nothing to undo
+            self.setObsolete(True)
+
+    def undo(self):
+        """Undo cell attribute compaction"""
+
+        cell_attributes = self.model.code_array.cell_attributes
+        cell_attributes.clear()
+        cell_attributes.extend(self.old_cell_attributes)
+        self.model.dataChanged.emit(QModelIndex(), QModelIndex())
+
+
 class FreezeCell(QUndoCommand):
     """Freezes cell in grid"""
 
@@ -60,7 +60,7 @@ import io
 from pathlib import Path
 from typing import List, Sequence, Tuple, Union
 
-from PyQt5.QtCore import Qt, QPoint, QSize, QEvent
+from PyQt5.QtCore import Qt, QModelIndex, QPoint, QSize, QEvent
 from PyQt5.QtWidgets \
     import (QApplication, QMessageBox, QFileDialog, QDialog, QLineEdit, QLabel,
             QFormLayout, QVBoxLayout, QGroupBox, QDialogButtonBox, QSplitter,
@@ -491,18 +491,53 @@ class PreferencesDialog(DataEntryDialog):
         title = "Preferences"
         groupbox_title = "Global settings"
         labels = ["Signature key for files", "Cell calculation timeout [ms]",
+                  "Recalculation timeout [ms]",
                   "Frozen cell refresh period [ms]", "Number of recent files",
-                  "Show sum in statusbar"]
-        self.keys = ["signature_key", "timeout", "refresh_timeout",
-                     "max_file_history", "show_statusbar_sum"]
-        self.mappers = [str, int, int, int, bool]
+                  "Show sum in statusbar", "Result cache size [MiB]",
+                  "Result snapshot size [MiB]"]
+        self.keys = ["signature_key", "timeout", "recalculation_timeout",
+                     "refresh_timeout", "max_file_history",
+                     "show_statusbar_sum", "result_cache_size",
+                     "result_snapshot_size"]
+        self.mappers = [str, int, int, int, int, bool, int, int]
         data = [getattr(parent.settings, key) for key in self.keys]
         validator = QIntValidator()
         validator.setBottom(0)  # Do not allow negative values
-        validators = [None, validator, validator, validator, bool]
+        validators = [None, validator, validator, validator, validator, bool,
+                      validator, validator]
         super().__init__(parent, title, labels, data, groupbox_title,
                          validators)
 
+        result_cache = parent.grid.model.code_array.result_cache
+        self.layout().insertWidget(1, self.create_statistics(result_cache))
+
+    def create_statistics(self, result_cache: dict) -> QGroupBox:
+        """Returns result cache statistics inside a QGroupBox
+
+        :param result_cache: Result cache of the grid
+
+        """
+
+        statistics = [
+            ("Cached results", str(len(result_cache))),
+            ("Cached results size [MiB]",
+             "{:.1f}".format(result_cache.nbytes / 2**20)),
+            ("Cache hit rate", "{:.1%}".format(result_cache.hit_rate)),
+        ]
+
+        statistics_group_box = QGroupBox("Result cache statistics")
+        statistics_layout = QFormLayout()
+
+        for label, value in statistics:
+            value_label = QLabel(value)
+            value_label.setAlignment(Qt.AlignRight)
+            statistics_layout.addRow(QLabel(label + " :"), value_label)
+
+        statistics_layout.setLabelAlignment(Qt.AlignRight)
+        statistics_group_box.setLayout(statistics_layout)
+
+        return statistics_group_box
+
     @property
     def data(self) -> dict:
         """Executes the dialog and returns a dict containing preferences data
@@ -1683,6 +1718,108 @@ class ManualDialog(TutorialDialog):
         layout.addWidget(self.tabbar)
 
 
+class HotCellsDialog(QDialog):
+    """Dialog that lists profiled cells, slowest cells first
+
+    Columns can be sorted by clicking on the header. Double clicking a row
+    selects the cell in the grid.
+
+    """
+
+    window_title = "Hot cells"
+    size_hint = 600, 400
+
+    def __init__(self, parent: QMainWindow):
+        """
+        :param parent: Main window
+
+        """
+
+        super().__init__(parent)
+
+        self.main_window = parent
+
+        self._create_widgets()
+        self._layout()
+        self.update_profiles()
+
+    def _create_widgets(self):
+        """Creates table view and buttons"""
+
+        self.model = QStandardItemModel(self)
+
+        self.table = QTableView(self)
+        self.table.setModel(self.model)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSortingEnabled(True)
+        self.table.verticalHeader().hide()
+        self.table.doubleClicked.connect(self.on_double_click)
+
+        self.refresh_button = QPushButton("Refresh")
+        self.refresh_button.clicked.connect(self.update_profiles)
+
+        self.export_button = QPushButton("Export CSV...")
+        self.export_button.clicked.connect(
+            self.main_window.workflows.profile_export)
+
+        self.button_box = QDialogButtonBox(QDialogButtonBox.Close)
+        self.button_box.rejected.connect(self.reject)
+
+    def _layout(self):
+        """Dialog layout management"""
+
+        self.setWindowTitle(self.window_title)
+
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(self.refresh_button)
+        button_layout.addWidget(self.export_button)
+        button_layout.addStretch(1)
+        button_layout.addWidget(self.button_box)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.table)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def update_profiles(self):
+        """Fills table with the current profiles"""
+
+        profiler = self.main_window.grid.model.code_array.profiler
+
+        self.model.clear()
+        self.model.setHorizontalHeaderLabels(profiler.columns)
+
+        for key, profile in profiler.hot_cells():
+            key_item = QStandardItem(str(key))
+            key_item.setData(key, Qt.UserRole)
+            row = [key_item]
+            for value in (profile.calls, profile.total_time,
+                          profile.self_time, profile.result_size):
+                item = QStandardItem()
+                item.setData(value, Qt.DisplayRole)
+                row.append(item)
+            self.model.appendRow(row)
+
+        self.table.resizeColumnsToContents()
+
+    def on_double_click(self, index: QModelIndex):
+        """Double click event handler, selects cell in grid
+
+        :param index: Index of double clicked table item
+
+        """
+
+        key = self.model.item(index.row(), 0).data(Qt.UserRole)
+        self.main_window.grid.current = key
+
+    # Overrides
+
+    def sizeHint(self) -> QSize:
+        """QDialog.sizeHint override"""
+
+        return QSize(*self.size_hint)
+
 
 class PrintPreviewDialog(QPrintPreviewDialog):
     """Adds Mouse wheel functionality"""
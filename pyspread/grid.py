@@ -35,7 +35,8 @@
 from ast import literal_eval
 from contextlib import contextmanager
 from io import BytesIO
-from typing import Any, Iterable, List, Tuple, Union
+from typing import Any, Callable, Iterable, List, Tuple, Union
+from weakref import WeakKeyDictionary
 
 import numpy
 
@@ -664,7 +665,7 @@ class Grid(QTableView):
     def _refresh_frozen_cell(self, key: Tuple[int, int, int]):
         """Refreshes the frozen cell key
 
-        Does neither emit dataChanged nor clear _attr_cache or _table_cache.
+        Does not emit dataChanged.
 
         :param key: Key of cell to be refreshed
 
@@ -676,28 +677,45 @@ class Grid(QTableView):
             self.model.code_array.frozen_cache[repr(key)] = result
 
     def refresh_frozen_cells(self):
-        """Refreshes all frozen cells"""
+        """Refreshes all frozen and volatile cells
 
-        frozen_cache = self.model.code_array.frozen_cache
-        cell_attributes = self.model.code_array.cell_attributes
+        Results of pure cells that depend on neither are kept. In kernel
+        mode, the cells are refreshed in the kernel process.
 
-        for repr_key in frozen_cache:
-            key = literal_eval(repr_key)
-            self._refresh_frozen_cell(key)
+        """
+
+        code_array = self.model.code_array
+
+        if code_array.kernel is not None:
+            code_array.kernel.refresh()
+            return
+
+        with code_array.lock:
+            for repr_key in list(code_array.frozen_cache):
+                key = literal_eval(repr_key)
+                self._refresh_frozen_cell(key)
+                code_array._invalidate(key)
+
+            code_array.invalidate_volatile()
 
-        cell_attributes._attr_cache.clear()
-        cell_attributes._table_cache.clear()
-        self.model.code_array.result_cache.clear()
         self.model.dataChanged.emit(QModelIndex(), QModelIndex())
 
     def refresh_selected_frozen_cells(self):
-        """Refreshes selected frozen cells"""
+        """Refreshes selected frozen and volatile cells"""
 
-        for idx in self.selected_idx:
-            self._refresh_frozen_cell((idx.row(), idx.column(), self.table))
+        keys = [(idx.row(), idx.column(), self.table)
+                for idx in self.selected_idx]
+
+        if self.model.code_array.kernel is not None:
+            self.model.code_array.kernel.refresh(keys)
+            return
+
+        with self.model.code_array.lock:
+            for key in keys:
+                self._refresh_frozen_cell(key)
+
+            self.model.code_array.invalidate_volatile(keys)
 
-        self.model.code_array.cell_attributes._attr_cache.clear()
-        self.model.code_array.cell_attributes._table_cache.clear()
         self.model.dataChanged.emit(QModelIndex(), QModelIndex())
 
     def on_show_frozen_pressed(self, toggled: bool):
@@ -709,6 +727,16 @@ class Grid(QTableView):
 
         self.main_window.settings.show_frozen = toggled
 
+    def on_show_heat_map_pressed(self, toggled: bool):
+        """Show heat map event handler
+
+        :param toggled: Toggle state
+
+        """
+
+        self.main_window.settings.show_heat_map = toggled
+        self.viewport().update()
+
     def on_font_dialog(self):
         """Font dialog event handler"""
 
@@ -1271,6 +1299,33 @@ class Grid(QTableView):
             command = commands.ThawCell(self.model, cells, description)
         self.main_window.undo_stack.push(command)
 
+    def on_refresh_interval(self):
+        """Refresh interval event handler for periodic updates of frozen cells
+
+        An interval of 0 uses the frozen cell refresh period from the
+        preferences.
+
+        """
+
+        cell_attributes = self.model.code_array.cell_attributes
+        current_interval = cell_attributes[self.current].refresh_interval
+        interval, accept = QInputDialog.getInt(
+            self.main_window, "Refresh interval",
+            "Refresh interval of frozen cells [ms]\n"
+            "0 uses the refresh period from the preferences:",
+            current_interval or 0, 0)
+        if not accept:
+            return
+
+        attr_dict = AttrDict([("refresh_interval", interval or None)])
+        attr = CellAttribute(self.selection, self.table, attr_dict)
+        idx_string = self._selected_idx_to_str(self.selected_idx)
+        description = "Set refresh interval to {} ms for cells {}".format(
+            interval, idx_string)
+        command = commands.SetCellFormat(attr, self.model, self.currentIndex(),
+                                         self.selected_idx, description)
+        self.main_window.undo_stack.push(command)
+
     def on_button_cell_pressed(self, toggled: bool):
         """Button cell event handler
 
@@ -1304,6 +1359,16 @@ class Grid(QTableView):
                                                 description)
             self.main_window.undo_stack.push(command)
 
+    def on_compact_format(self):
+        """Compact format event handler"""
+
+        description = "Compact format"
+        command = commands.CompactCellAttributes(self.model, description)
+        self.main_window.undo_stack.push(command)
+
+        msg = "{} redundant format layers removed.".format(command.no_removed)
+        self.main_window.statusBar().showMessage(msg)
+
     def on_merge_pressed(self):
         """Merge cells button pressed event handler"""
 
@@ -1602,6 +1667,10 @@ class GridTableModel(QAbstractTableModel):
         self.main_window = main_window
         self.code_array = CodeArray(shape, main_window.settings)
 
+        # Maps shared resolved cell attributes to dicts of objects that are
+        # derived from them, see _get_derived
+        self._derived_cache = WeakKeyDictionary()
+
     @contextmanager
     def model_reset(self):
         """Context manager for handle changing/resetting model data"""
@@ -1797,6 +1866,30 @@ class GridTableModel(QAbstractTableModel):
 
         self.code_array.delete(table, count, axis=2)
 
+    def _get_derived(self, attr: AttrDict, name: str,
+                     factory: Callable[[AttrDict], Any]) -> Any:
+        """Returns object that is derived from resolved cell attributes
+
+        Objects are created once per shared cell format instead of per cell.
+
+        :param attr: Resolved cell attributes
+        :param name: Name of the derived object
+        :param factory: Returns derived object for attr
+
+        """
+
+        try:
+            derived = self._derived_cache.setdefault(attr, {})
+        except TypeError:
+            # Cell attributes are not shared or have unhashable values
+            return factory(attr)
+
+        try:
+            return derived[name]
+        except KeyError:
+            obj = derived[name] = factory(attr)
+            return obj
+
     def font(self, key: Tuple[int, int, int]) -> QFont:
         """Returns font for given key
 
@@ -1805,6 +1898,16 @@ class GridTableModel(QAbstractTableModel):
         """
 
         attr = self.code_array.cell_attributes[key]
+        return QFont(self._get_derived(attr, "font", self._make_font))
+
+    @staticmethod
+    def _make_font(attr: AttrDict) -> QFont:
+        """Returns font for resolved cell attributes
+
+        :param attr: Resolved cell attributes
+
+        """
+
         font = QFont()
         if attr.textfont is not None:
             font.setFamily(attr.textfont)
@@ -1868,43 +1971,87 @@ class GridTableModel(QAbstractTableModel):
                and self.code_array.cell_attributes[key].frozen:
                 pattern_rgb = self.grid.palette().highlight().color()
                 bg_color = QBrush(pattern_rgb, Qt.BDiagPattern)
+            elif key in self.code_array.dirty:
+                # Outdated result in manual calculation mode
+                pattern_rgb = self.grid.palette().mid().color()
+                bg_color = QBrush(pattern_rgb, Qt.FDiagPattern)
+            elif self.main_window.settings.show_heat_map \
+                    and key in self.code_array.profiler.profiles:
+                profiler = self.code_array.profiler
+                self_time = profiler.profiles[key].self_time
+                heat = self_time / profiler.max_self_time \
+                    if profiler.max_self_time else 0.0
+                fade = int(255 * (1.0 - heat))
+                bg_color = QColor(255, fade, fade)
             else:
-                bg_color_rgb = self.code_array.cell_attributes[key].bgcolor
-                if bg_color_rgb is None:
-                    bg_color = QColor(255, 255, 255)
-                else:
-                    bg_color = QColor(*bg_color_rgb)
+                attr = self.code_array.cell_attributes[key]
+                bg_color = self._get_derived(attr, "bgcolor",
+                                             self._make_background_color)
             return bg_color
 
         if role == Qt.TextColorRole:
-            text_color_rgb = self.code_array.cell_attributes[key].textcolor
-            if text_color_rgb is None:
+            attr = self.code_array.cell_attributes[key]
+            if attr.textcolor is None:
+                # Not cached because the palette may change
                 text_color = self.grid.palette().color(QPalette.Text)
             else:
-                text_color = QColor(*text_color_rgb)
+                text_color = self._get_derived(attr, "textcolor",
+                                               self._make_text_color)
             return text_color
 
         if role == Qt.FontRole:
             return self.font(key)
 
         if role == Qt.TextAlignmentRole:
-            pys2qt = {
-                "justify_left": Qt.AlignLeft,
-                "justify_center": Qt.AlignHCenter,
-                "justify_right": Qt.AlignRight,
-                "justify_fill": Qt.AlignJustify,
-                "align_top": Qt.AlignTop,
-                "align_center": Qt.AlignVCenter,
-                "align_bottom": Qt.AlignBottom,
-            }
             attr = self.code_array.cell_attributes[key]
-            alignment = pys2qt[attr.vertical_align]
-            justification = pys2qt[attr.justification]
-            alignment |= justification
-            return alignment
+            return self._get_derived(attr, "alignment", self._make_alignment)
 
         return QVariant()
 
+    @staticmethod
+    def _make_background_color(attr: AttrDict) -> QColor:
+        """Returns background color for resolved cell attributes
+
+        :param attr: Resolved cell attributes
+
+        """
+
+        if attr.bgcolor is None:
+            return QColor(255, 255, 255)
+        return QColor(*attr.bgcolor)
+
+    @staticmethod
+    def _make_text_color(attr: AttrDict) -> QColor:
+        """Returns text color for resolved cell attributes
+
+        :param attr: Resolved cell attributes with text color
+
+        """
+
+        return QColor(*attr.textcolor)
+
+    @staticmethod
+    def _make_alignment(attr: AttrDict) -> Qt.Alignment:
+        """Returns text alignment for resolved cell attributes
+
+        :param attr: Resolved cell attributes
+
+        """
+
+        pys2qt = {
+            "justify_left": Qt.AlignLeft,
+            "justify_center": Qt.AlignHCenter,
+            "justify_right": Qt.AlignRight,
+            "justify_fill": Qt.AlignJustify,
+            "align_top": Qt.AlignTop,
+            "align_center": Qt.AlignVCenter,
+            "align_bottom": Qt.AlignBottom,
+        }
+        alignment = pys2qt[attr.vertical_align]
+        justification = pys2qt[attr.justification]
+        alignment |= justification
+        return alignment
+
     def setData(self, index: QModelIndex, value: Any, role: Qt.ItemDataRole,
                 raw: bool = False, table: int = None) -> bool:
         """Overloaded setData for code_array backend
@@ -1987,7 +2134,7 @@ class GridTableModel(QAbstractTableModel):
 
             # Clear caches
             # self.main_window.undo_stack.clear()
-            self.code_array.result_cache.clear()
+            self.code_array.reset_results()
 
             # Clear globals
             self.code_array.clear_globals()
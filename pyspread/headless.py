@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Batch recalculation and export of pyspread files without GUI
+
+Cell globals are shared in the namespace of the model module. Therefore,
+several files are processed concurrently in separate processes.
+
+**Provides**
+
+ * :func:`export_results`
+ * :func:`resolve_awaitables`
+ * :func:`recalculate_file`
+ * :func:`headless_main`
+
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import json
+import multiprocessing
+from pathlib import Path
+import sys
+from typing import Iterable, List
+
+try:
+    from pyspread.settings import Settings
+    from pyspread.model.model import CodeArray
+    from pyspread.model.workbooks import load_code_array
+except ImportError:
+    from settings import Settings
+    from model.model import CodeArray
+    from model.workbooks import load_code_array
+
+EXPORT_FORMATS = "csv", "json"
+
+
+def _json_default(obj):
+    """Returns JSON serializable representation of cell result
+
+    :param obj: Cell result that the json module cannot serialize
+
+    """
+
+    try:
+        # numpy arrays and scalars
+        return obj.tolist()
+    except AttributeError:
+        return str(obj)
+
+
+def export_results(code_array: CodeArray, basepath: Path,
+                   file_format: str = "csv") -> List[Path]:
+    """Writes cell results of each non-empty table and returns file paths
+
+    Each table is exported to one file `<basepath>_<table>.<file_format>`.
+
+    :param code_array: Code array with cells to be exported
+    :param basepath: Path of exported files without table and suffix
+    :param file_format: Export file format, must be in EXPORT_FORMATS
+
+    """
+
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError("Unknown export format {}".format(file_format))
+
+    tables = sorted({tab for _, _, tab in code_array.keys()})
+
+    filepaths = []
+
+    for table in tables:
+        last_row, last_column, _ = code_array.get_last_filled_cell(table)
+        data = code_array[:last_row + 1, :last_column + 1, table]
+
+        filepath = basepath.with_name("{}_{}.{}".format(basepath.name, table,
+                                                        file_format))
+
+        with open(filepath, "w", newline='', encoding='utf-8') as outfile:
+            if file_format == "csv":
+                writer = csv.writer(outfile)
+                writer.writerows(data)
+            else:
+                json.dump(data.tolist(), outfile, default=_json_default)
+
+        filepaths.append(filepath)
+
+    return filepaths
+
+
+def resolve_awaitables(code_array: CodeArray):
+    """Evaluates all cells and waits until their awaitables are done
+
+    Cells that depend on the results of awaitables are evaluated again,
+    until no cell returns an awaitable.
+
+    :param code_array: Code array with executed macros
+
+    """
+
+    while True:
+        for key in list(code_array.keys()):
+            code_array[key]
+        if not code_array.wait_for_awaitables():
+            return
+
+
+def recalculate_file(filepath: Path, output_dir: Path = None,
+                     file_format: str = "csv",
+                     reset_settings: bool = False) -> List[Path]:
+    """Loads file, executes macros, evaluates all cells and exports results
+
+    Returns paths of exported files.
+
+    :param filepath: Path of pys or pysu file
+    :param output_dir: Directory for exported files, None: file directory
+    :param file_format: Export file format, must be in EXPORT_FORMATS
+    :param reset_settings: Use default settings instead of stored settings
+
+    """
+
+    settings = Settings(None, reset_settings=reset_settings)
+    settings.restore(widgets=False)
+
+    # Relative workbook references in cells are resolved against the file
+    settings.last_file_input_path = filepath
+
+    code_array = load_code_array(filepath, settings)
+
+    # Globals from files that have been processed before must not leak
+    code_array.clear_globals()
+
+    # Evaluates cells that assign globals, then executes the macros. The
+    # other cells are evaluated when their results are exported.
+    _, errors = code_array.execute_macros()
+    if errors:
+        sys.stderr.write("{}: {}".format(filepath, errors))
+
+    resolve_awaitables(code_array)
+
+    if output_dir is None:
+        output_dir = filepath.parent
+
+    return export_results(code_array, output_dir / filepath.stem, file_format)
+
+
+def headless_main(filepaths: Iterable[Path], output_dir: Path = None,
+                  file_format: str = "csv", jobs: int = None,
+                  reset_settings: bool = False) -> int:
+    """Recalculates and exports files concurrently, returns exit code
+
+    :param filepaths: Paths of pys or pysu files
+    :param output_dir: Directory for exported files, None: file directories
+    :param file_format: Export file format, must be in EXPORT_FORMATS
+    :param jobs: Number of files that are processed concurrently, None: cpus
+    :param reset_settings: Use default settings instead of stored settings
+
+    """
+
+    filepaths = list(filepaths)
+    exit_code = 0
+
+    context = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(jobs, mp_context=context) as executor:
+        futures = [executor.submit(recalculate_file, filepath, output_dir,
+                                   file_format, reset_settings)
+                   for filepath in filepaths]
+
+        for filepath, future in zip(filepaths, futures):
+            try:
+                exported = future.result()
+            except Exception as error:
+                sys.stderr.write("Error processing {}: {}\n".format(filepath,
+                                                                    error))
+                exit_code = 1
+                continue
+
+            for export_path in exported:
+                sys.stdout.write("{}\n".format(export_path))
+
+    return exit_code
@@ -292,7 +292,9 @@ class PysReader:
         key = self._get_key(row, col, tab)
 
         if all(0 <= key[i] < self.code_array.shape[i] for i in range(3)):
-            self.code_array.dict_grid[key] = ast.literal_eval(code)
+            code = ast.literal_eval(code)
+            self.code_array.dict_grid[key] = code
+            self.code_array.dict_grid.update_literal(key, code)
 
     def _attr_convert_1to2(self, key: str, value: Any) -> Tuple[str, Any]:
         """Converts key, value attribute pair from v1.0 to v2.0
@@ -559,18 +561,10 @@ class PysWriter(object):
 
         """
 
-        # Remove doublettes
-        purged_cell_attributes = []
-        purged_cell_attributes_keys = []
-        for selection, tab, attr_dict in self.code_array.cell_attributes:
-            if purged_cell_attributes_keys and \
-               (selection, tab) == purged_cell_attributes_keys[-1]:
-                purged_cell_attributes[-1][2].update(attr_dict)
-            else:
-                purged_cell_attributes_keys.append((selection, tab))
-                purged_cell_attributes.append([selection, tab, attr_dict])
+        # Shadowed attributes and redundant layers are not saved
+        cell_attributes = self.code_array.cell_attributes.compacted()
 
-        for selection, tab, attr_dict in purged_cell_attributes:
+        for selection, tab, attr_dict in cell_attributes:
             sel_list = [selection.block_tl, selection.block_br,
                         selection.rows, selection.columns, selection.cells]
 
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Aggregation functions of the cell namespace
+
+``SUM[0:1000, 2, 0]`` aggregates the results of a cell range and
+``SUM(values)`` aggregates numbers and iterables of numbers. Values that are
+not real numbers, e.g. None or strings, are ignored. Ranges are aggregated
+from cached partial aggregates, see
+:meth:`model.model.CodeArray.aggregate_range`.
+
+**Provides**
+
+ * :class:`Aggregate` - Partial aggregate of numbers
+ * :func:`aggregate_values` - Returns aggregate of values
+ * :func:`combine_aggregates` - Returns aggregate of partial aggregates
+ * :class:`RangeFunction` - Aggregation function of the cell namespace
+ * :data:`RANGE_FUNCTIONS` - Maps function name to its reduction
+
+"""
+
+from numbers import Real
+from typing import Any, Callable, Iterable, NamedTuple
+
+import numpy
+
+
+class Aggregate(NamedTuple):
+    """Partial aggregate of numbers"""
+
+    total: Any
+    """Sum of the numbers"""
+
+    count: int
+    """Number of numbers"""
+
+    minimum: Any
+    """Smallest number, None if count is 0"""
+
+    maximum: Any
+    """Largest number, None if count is 0"""
+
+
+EMPTY_AGGREGATE = Aggregate(0, 0, None, None)
+
+
+def _iter_values(values: Any) -> Iterable[Any]:
+    """Yields leaves of nested arrays and iterables
+
+    :param values: Value or nested iterable of values
+
+    """
+
+    stack = [values]
+
+    while stack:
+        value = stack.pop()
+        if isinstance(value, numpy.ndarray):
+            stack.extend(reversed(value.ravel().tolist()))
+        elif isinstance(value, (list, tuple, set, frozenset, range)) \
+                or hasattr(value, "__next__"):
+            stack.extend(reversed(list(value)))
+        else:
+            yield value
+
+
+def aggregate_values(values: Any) -> Aggregate:
+    """Returns aggregate of the real numbers in values
+
+    Arrays of numeric dtype are reduced by numpy.
+
+    :param values: Value, array or nested iterable of values
+
+    """
+
+    if isinstance(values, numpy.ndarray) and values.dtype.kind in "biuf":
+        if not values.size:
+            return EMPTY_AGGREGATE
+        if values.dtype.kind == "b":
+            values = values.astype(numpy.int64)
+        minimum = values.min().item()
+        maximum = values.max().item()
+        if values.dtype.kind in "iu" and values.size * max(
+                abs(minimum), abs(maximum)) > numpy.iinfo(numpy.int64).max:
+            # The sum might overflow, Python integers do not
+            total = sum(values.ravel().tolist())
+        else:
+            total = values.sum().item()
+        return Aggregate(total, values.size, minimum, maximum)
+
+    numbers = [value for value in _iter_values(values)
+               if isinstance(value, Real)]
+
+    if not numbers:
+        return EMPTY_AGGREGATE
+
+    return Aggregate(sum(numbers), len(numbers), min(numbers), max(numbers))
+
+
+def combine_aggregates(aggregates: Iterable[Aggregate]) -> Aggregate:
+    """Returns aggregate of partial aggregates
+
+    :param aggregates: Partial aggregates
+
+    """
+
+    aggregates = [aggregate for aggregate in aggregates if aggregate.count]
+
+    if not aggregates:
+        return EMPTY_AGGREGATE
+
+    return Aggregate(sum(aggregate.total for aggregate in aggregates),
+                     sum(aggregate.count for aggregate in aggregates),
+                     min(aggregate.minimum for aggregate in aggregates),
+                     max(aggregate.maximum for aggregate in aggregates))
+
+
+def _mean(aggregate: Aggregate) -> float:
+    """Returns mean of aggregated numbers"""
+
+    if not aggregate.count:
+        raise ZeroDivisionError("MEAN of no numbers")
+
+    return aggregate.total / aggregate.count
+
+
+def _minimum(aggregate: Aggregate) -> Any:
+    """Returns smallest aggregated number"""
+
+    if not aggregate.count:
+        raise ValueError("MIN of no numbers")
+
+    return aggregate.minimum
+
+
+def _maximum(aggregate: Aggregate) -> Any:
+    """Returns largest aggregated number"""
+
+    if not aggregate.count:
+        raise ValueError("MAX of no numbers")
+
+    return aggregate.maximum
+
+
+RANGE_FUNCTIONS = {
+    "SUM": lambda aggregate: aggregate.total,
+    "MEAN": _mean,
+    "MIN": _minimum,
+    "MAX": _maximum,
+    "COUNT": lambda aggregate: aggregate.count,
+}
+
+
+class RangeFunction:
+    """Aggregation function of the cell namespace
+
+    Indexing aggregates a cell range, calling aggregates the arguments.
+
+    """
+
+    def __init__(self, name: str, reduce: Callable[[Aggregate], Any],
+                 aggregate_range: Callable[[Any], Aggregate]):
+        """
+        :param name: Function name in the cell namespace
+        :param reduce: Returns function result from aggregate
+        :param aggregate_range: Returns aggregate of a cell range key
+
+        """
+
+        self.name = name
+        self.reduce = reduce
+        self.aggregate_range = aggregate_range
+
+    def __getitem__(self, key: Any) -> Any:
+        """Returns function result for cell range
+
+        :param key: Cell key or slice key
+
+        """
+
+        return self.reduce(self.aggregate_range(key))
+
+    def __call__(self, *values: Any) -> Any:
+        """Returns function result for values
+
+        :param values: Numbers, arrays or iterables of numbers
+
+        """
+
+        return self.reduce(aggregate_values(values))
+
+    def __repr__(self) -> str:
+        return "<range function {}>".format(self.name)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Asynchronous cell results
+
+Cells may return awaitables, e.g. coroutines of macro functions that are
+defined with ``async def``. Awaitables are run concurrently on an asyncio
+event loop in a background thread, so that many I/O bound cells can be in
+flight at the same time. Until an awaitable is done, the cell shows a
+:class:`PendingResult`.
+
+Since awaitables run in the event loop thread, code after an ``await``
+must access the model only via the code array, e.g. ``S[0, 0, 0]``. The
+code array takes its lock for these accesses, so that they wait until the
+GUI thread has finished its current evaluation.
+
+**Provides**
+
+ * :class:`PendingResult` - Placeholder for a result that is not done yet
+ * :class:`AwaitableRunner` - Runs awaitables on a background event loop
+
+"""
+
+import asyncio
+from concurrent.futures import Future
+import threading
+from typing import Any, Awaitable
+
+
+class PendingResult:
+    """Placeholder for a result that is not done yet"""
+
+    __slots__ = "future",
+
+    def __init__(self, future: Future = None):
+        """
+        :param future: Future of the awaitable, None if not an awaitable
+
+        """
+
+        self.future = future
+
+    def __repr__(self) -> str:
+        return "Pending..."
+
+
+class AwaitableRunner:
+    """Runs awaitables on an asyncio event loop in a background thread
+
+    The event loop and its thread are started with the first awaitable.
+
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Running event loop, started on first access"""
+
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever,
+                                          name="AwaitableRunner",
+                                          daemon=True)
+                thread.start()
+                self._loop = loop
+
+            return self._loop
+
+    @staticmethod
+    async def _await(awaitable: Awaitable, timeout: float) -> Any:
+        """Awaits awaitable for at most timeout seconds
+
+        :param awaitable: Awaitable to be awaited
+        :param timeout: Timeout in seconds, no timeout if falsy
+
+        """
+
+        if timeout:
+            return await asyncio.wait_for(awaitable, timeout)
+
+        return await awaitable
+
+    def submit(self, awaitable: Awaitable, timeout: float) -> PendingResult:
+        """Schedules awaitable and returns placeholder for its result
+
+        Done callbacks of the future of the placeholder are called in the
+        event loop thread.
+
+        :param awaitable: Awaitable to be run, e.g. a coroutine
+        :param timeout: Timeout in seconds, no timeout if falsy
+
+        """
+
+        future = asyncio.run_coroutine_threadsafe(
+            self._await(awaitable, timeout), self.loop)
+
+        return PendingResult(future)
@@ -0,0 +1,704 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Cell dependency tracking for incremental recalculation
+
+Nodes of the dependency graph are hashable objects. Cell keys are tuples of
+three integers, global names are strings.
+
+**Provides**
+
+ * :class:`CodeReferences` - Static references of a code string
+ * :func:`get_code_references` - Returns static references of cell code
+ * :func:`get_literal` - Returns value of constant cell code
+ * :func:`get_volatile_names` - Returns names that are assigned volatile values
+ * :func:`get_cell_access_names` - Returns names that are assigned cell
+   accesses
+ * :func:`volatile` - Marks cell code as volatile
+ * :func:`resolve_index` - Resolves an `S[...]` index for a given cell key
+ * :class:`DependencyGraph` - Dependencies between cells and global names
+
+"""
+
+import ast
+import builtins
+from collections import defaultdict
+from functools import lru_cache
+from itertools import chain
+from typing import (Any, Callable, Dict, FrozenSet, Hashable, Iterable,
+                    List, NamedTuple, Set, Tuple, Union)
+
+try:
+    from pyspread.lib.aggregation import RANGE_FUNCTIONS
+except ImportError:
+    from lib.aggregation import RANGE_FUNCTIONS
+
+MAGIC_NAMES = \
+    frozenset(("X", "Y", "Z", "R", "C", "T", "S", "memo", "volatile",
+               "WB"))
+"""Names that are provided by the cell environment
+
+Range functions such as `SUM` are omitted because macros may replace them.
+
+"""
+
+RANGE_NAMES = frozenset(RANGE_FUNCTIONS) | {"S"}
+"""Names that access cells when indexed, e.g. `S[0, 0, 0]`, `SUM[:, 0, 0]`"""
+
+BUILTIN_NAMES = frozenset(dir(builtins))
+
+VOLATILE_REFERENCES = frozenset((
+    "volatile", "WB", "random", "secrets", "uuid", "numpy.random",
+    "np.random",
+    "time.time", "time.time_ns", "time.monotonic", "time.perf_counter",
+    "time.localtime", "time.gmtime", "time.ctime", "time.strftime",
+    "datetime.now", "datetime.today", "datetime.utcnow", "date.today",
+    "datetime.datetime.now", "datetime.datetime.today",
+    "datetime.datetime.utcnow", "datetime.date.today",
+    "open", "input", "os", "pathlib", "glob", "shutil", "subprocess",
+    "socket", "urllib", "http", "requests",
+    "eval", "exec", "globals", "locals", "vars", "__import__",
+))
+"""Dotted names that make results change between evaluations
+
+A reference is volatile if it or one of its prefixes is contained, e.g.
+`numpy.random.rand` or `os.path.getmtime`. Cells can be marked as volatile
+explicitly with the cell environment function `volatile`.
+
+"""
+
+SCOPE_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef,
+               ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp,
+               ast.GeneratorExp)
+"""AST node types that introduce a new scope for the names that they bind"""
+
+LITERAL_NODES = tuple(getattr(ast, name) for name in
+                      ("Constant", "Num", "Str", "Bytes", "NameConstant")
+                      if hasattr(ast, name))
+"""AST node types of constants, Num, Str, Bytes and NameConstant for < 3.8"""
+
+
+class CodeReferences(NamedTuple):
+    """References in a code string that are found by static analysis"""
+
+    cells: Tuple[Tuple[ast.AST, ast.AST, ast.AST], ...]
+    """Index expressions of all `S[row, column, table]` accesses
+
+    Indexed range functions such as `SUM[row, column, table]` are included.
+
+    """
+
+    loaded_names: FrozenSet[str]
+    """Global names that are read by the code"""
+
+    stored_names: FrozenSet[str]
+    """Global names that are assigned by the code
+
+    For cell code, these are the targets of an assignment in the last line
+    and names that are declared `global`, see `CodeArray.exec_then_eval`.
+    For other code, e.g. a statement of the macros, these are the names
+    that are bound at module level. Names that are bound inside functions,
+    lambdas or comprehensions are omitted unless they are declared `global`.
+
+    """
+
+    dynamic_access: bool
+    """True if `S` is used other than in `S[row, column, table]` accesses"""
+
+    volatile: bool
+    """True if the code references a volatile name, see VOLATILE_REFERENCES"""
+
+
+def volatile(value: Any = None) -> Any:
+    """Returns value, marks cell code that calls it as volatile
+
+    :param value: Result of the cell, e.g. `volatile(S[0, 0, 0] + 1)`
+
+    """
+
+    return value
+
+
+def _get_dotted_name(node: ast.AST) -> Union[str, None]:
+    """Returns dotted name of Name or Attribute chain, e.g. `time.time`
+
+    :param node: AST node, None is returned for other nodes
+
+    """
+
+    attributes = []
+
+    while isinstance(node, ast.Attribute):
+        attributes.append(node.attr)
+        node = node.value
+
+    if not isinstance(node, ast.Name):
+        return
+
+    return ".".join([node.id] + attributes[::-1])
+
+
+def _is_volatile_reference(dotted_name: str) -> bool:
+    """True if dotted_name or one of its prefixes is volatile
+
+    :param dotted_name: Dotted name, e.g. `numpy.random.rand`
+
+    """
+
+    parts = dotted_name.split(".")
+
+    return any(".".join(parts[:i]) in VOLATILE_REFERENCES
+               for i in range(1, len(parts) + 1))
+
+
+def _get_import_aliases(node: Union[ast.Import, ast.ImportFrom]
+                        ) -> Iterable[Tuple[str, str]]:
+    """Yields bound name, dotted name tuples of the names that node imports
+
+    E.g. `from time import time as now` yields `("now", "time.time")`.
+    Relative and star imports are omitted.
+
+    :param node: Import or ImportFrom node
+
+    """
+
+    if isinstance(node, ast.ImportFrom):
+        if node.level or node.module is None:
+            return
+        for alias in node.names:
+            if alias.name != "*":
+                yield (alias.asname or alias.name,
+                       "{}.{}".format(node.module, alias.name))
+    else:
+        for alias in node.names:
+            if alias.asname is None:
+                # import a.b binds a
+                name = alias.name.split(".")[0]
+                yield name, name
+            else:
+                yield alias.asname, alias.name
+
+
+def _resolve_alias(dotted_name: str, aliases: Dict[str, str]) -> str:
+    """Returns dotted_name with an imported first part replaced by its source
+
+    :param dotted_name: Dotted name, e.g. `t.time`
+    :param aliases: Maps bound names to imported dotted names, e.g. `time`
+
+    """
+
+    first, _, rest = dotted_name.partition(".")
+
+    try:
+        first = aliases[first]
+    except KeyError:
+        return dotted_name
+
+    return first + "." + rest if rest else first
+
+
+@lru_cache(maxsize=4096)
+def get_code_references(code: str) -> CodeReferences:
+    """Returns references of code string that are found by static analysis
+
+    Names that are provided by the cell environment and builtin names are
+    omitted. Code that cannot be parsed has no references. Names that the
+    code imports are resolved before they are matched against
+    VOLATILE_REFERENCES, e.g. `t.time` after `import time as t`.
+
+    Only names that are assigned in the last line or that are declared
+    `global` are stored names. Other names that cell code binds are local
+    to the cell.
+
+    :param code: Cell code
+
+    """
+
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError, TypeError):
+        return CodeReferences((), frozenset(), frozenset(), False, False)
+
+    references = _get_references(tree)
+
+    stored_names = {name for node in ast.walk(tree)
+                    if isinstance(node, ast.Global) for name in node.names}
+    if tree.body and isinstance(tree.body[-1], ast.Assign):
+        stored_names.update(target.id for target in tree.body[-1].targets
+                            if isinstance(target, ast.Name))
+
+    return references._replace(stored_names=frozenset(stored_names))
+
+
+def _get_references(tree: ast.AST) -> CodeReferences:
+    """Returns references of an AST, see get_code_references
+
+    Stored names are the names that the code binds at module level.
+
+    :param tree: Root node of the AST
+
+    """
+
+    cells = []
+    loaded_names = set()
+    stored_names = set()
+    cell_access_nodes = set()
+    dynamic_access = False
+    dotted_names = set()
+    aliases = {}
+
+    # Nodes inside functions, lambdas and comprehensions bind local names
+    scoped_nodes = set()
+    for node in ast.walk(tree):
+        if isinstance(node, SCOPE_NODES) and node not in scoped_nodes:
+            for child in ast.iter_child_nodes(node):
+                scoped_nodes.update(ast.walk(child))
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Subscript) \
+           and isinstance(node.value, ast.Name) \
+           and node.value.id in RANGE_NAMES:
+            index = node.slice
+            if isinstance(index, getattr(ast, "Index", ())):
+                # Python < 3.9
+                index = index.value
+            if isinstance(index, ast.Tuple) and len(index.elts) == 3:
+                cells.append(tuple(index.elts))
+                cell_access_nodes.add(node.value)
+
+        elif isinstance(node, ast.Attribute):
+            dotted_name = _get_dotted_name(node)
+            if dotted_name is not None:
+                dotted_names.add(dotted_name)
+
+        elif isinstance(node, ast.Name):
+            dotted_names.add(node.id)
+            if node.id == "S" and node not in cell_access_nodes:
+                dynamic_access = True
+            if isinstance(node.ctx, ast.Load):
+                loaded_names.add(node.id)
+            elif node not in scoped_nodes:
+                stored_names.add(node.id)
+
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef,
+                               ast.ClassDef)):
+            if node not in scoped_nodes:
+                stored_names.add(node.name)
+
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            if node not in scoped_nodes:
+                for alias in node.names:
+                    stored_names.add(
+                        (alias.asname or alias.name).split(".")[0])
+            for name, dotted_name in _get_import_aliases(node):
+                if name != dotted_name:
+                    # e.g. from time import time binds a volatile name
+                    aliases[name] = dotted_name
+                    dotted_names.add(dotted_name)
+
+        elif isinstance(node, ast.Global):
+            stored_names.update(node.names)
+
+    loaded_names -= MAGIC_NAMES | BUILTIN_NAMES
+
+    volatile = any(_is_volatile_reference(_resolve_alias(name, aliases))
+                   for name in dotted_names)
+
+    return CodeReferences(tuple(cells), frozenset(loaded_names),
+                          frozenset(stored_names), dynamic_access, volatile)
+
+
+def _get_tainted_names(code: str,
+                       is_tainted: Callable[[CodeReferences], bool]
+                       ) -> FrozenSet[str]:
+    """Returns names that tainted top level statements of code assign
+
+    A top level statement is tainted if is_tainted returns True for its
+    references or if it references names that other tainted statements
+    assign.
+
+    :param code: Code, e.g. macros
+    :param is_tainted: Returns True for references of tainted statements
+
+    """
+
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError, TypeError):
+        return frozenset()
+
+    statements = [_get_references(node) for node in tree.body]
+    tainted_names = set()
+
+    changed = True
+    while changed:
+        changed = False
+        for references in statements:
+            if (is_tainted(references)
+                    or references.loaded_names & tainted_names) \
+               and not references.stored_names <= tainted_names:
+                tainted_names.update(references.stored_names)
+                changed = True
+
+    return frozenset(tainted_names)
+
+
+@lru_cache(maxsize=16)
+def get_volatile_names(code: str) -> FrozenSet[str]:
+    """Returns names that top level statements of code assign volatile values
+
+    A top level statement, e.g. a function definition in the macros, is
+    volatile if it references volatile names or names that other volatile
+    statements assign.
+
+    :param code: Code, e.g. macros
+
+    """
+
+    return _get_tainted_names(code, lambda references: references.volatile)
+
+
+@lru_cache(maxsize=16)
+def get_cell_access_names(code: str) -> FrozenSet[str]:
+    """Returns names that top level statements of code assign cell accesses
+
+    A top level statement, e.g. a function definition in the macros,
+    accesses cells if it uses `S` or indexes a range function, or if it
+    references names that other such statements assign. The cells that
+    these names access are unknown to static analysis of cell code.
+
+    :param code: Code, e.g. macros
+
+    """
+
+    return _get_tainted_names(
+        code, lambda references: bool(references.cells
+                                      or references.dynamic_access))
+
+
+def get_literal(code: str) -> Any:
+    """Returns value of code that is a single constant expression
+
+    Constants are numbers, strings, bytes, True, False and None. Signed
+    numbers such as `-1` are constants, too.
+
+    :param code: Cell code
+    :raises ValueError: If code is not a constant expression
+
+    """
+
+    if not isinstance(code, str):
+        raise ValueError("Code {!r} is not a string".format(code))
+
+    try:
+        node = ast.parse(code, mode="eval").body
+    except (SyntaxError, TypeError) as err:
+        raise ValueError(str(err)) from err
+
+    operand = node
+    if isinstance(node, ast.UnaryOp) \
+       and isinstance(node.op, (ast.UAdd, ast.USub)):
+        operand = node.operand
+
+    if not isinstance(operand, LITERAL_NODES):
+        raise ValueError("Code {!r} is not a constant".format(code))
+
+    return ast.literal_eval(node)
+
+
+def _resolve_index_element(node: ast.AST,
+                           key: Tuple[int, int, int]) -> Union[int, None]:
+    """Returns integer value of an index expression
+
+    Supported are integer constants, the names X, Y, Z, R, C, T and the
+    operators +, - and *. Raises ValueError for other expressions.
+
+    :param node: Index expression
+    :param key: Key of the cell that contains the expression
+
+    """
+
+    if isinstance(node, ast.Constant) and type(node.value) is int:
+        return node.value
+
+    if isinstance(node, ast.Name):
+        for axis, names in enumerate((("X", "R"), ("Y", "C"), ("Z", "T"))):
+            if node.id in names:
+                return key[axis]
+
+    elif isinstance(node, ast.UnaryOp):
+        operand = _resolve_index_element(node.operand, key)
+        if isinstance(node.op, ast.USub):
+            return -operand
+        if isinstance(node.op, ast.UAdd):
+            return operand
+
+    elif isinstance(node, ast.BinOp):
+        left = _resolve_index_element(node.left, key)
+        right = _resolve_index_element(node.right, key)
+        if isinstance(node.op, ast.Add):
+            return left + right
+        if isinstance(node.op, ast.Sub):
+            return left - right
+        if isinstance(node.op, ast.Mult):
+            return left * right
+
+    raise ValueError("Index expression cannot be resolved statically")
+
+
+def resolve_index(index: Tuple[ast.AST, ast.AST, ast.AST],
+                  key: Tuple[int, int, int]
+                  ) -> Union[Tuple[Union[int, slice], ...], None]:
+    """Returns resolved `S[...]` index or None if it cannot be resolved
+
+    :param index: Index expressions from :class:`CodeReferences`
+    :param key: Key of the cell that contains the index
+
+    """
+
+    def resolve(node: ast.AST) -> Any:
+        if node is None:
+            return
+        return _resolve_index_element(node, key)
+
+    resolved = []
+
+    try:
+        for node in index:
+            if isinstance(node, ast.Slice):
+                resolved.append(slice(resolve(node.lower),
+                                      resolve(node.upper),
+                                      resolve(node.step)))
+            else:
+                resolved.append(resolve(node))
+    except (ValueError, TypeError):
+        return
+
+    return tuple(resolved)
+
+
+class DependencyGraph:
+    """Directed graph of dependencies between cells and global names
+
+    A dependent node has to be recalculated if one of its dependencies
+    changes. Besides single nodes, a node may depend on a range of cells,
+    which is given as a tuple of three `range` objects.
+
+    Cell ranges are indexed in buckets so that finding the ranges that
+    contain a cell does not test all ranges. Ranges with few rows are
+    stored in buckets of a table, a tile of rows and a column. Ranges with
+    many rows and few columns, e.g. `S[:, 0, 0]`, are stored in buckets of
+    a table and a column. The remaining ranges are tested for each cell.
+
+    """
+
+    # Number of rows of the tiles, in which cell ranges are indexed
+    range_tile_size = 64
+
+    # Maximum number of buckets, in which one cell range is indexed
+    max_range_buckets = 64
+
+    def __init__(self):
+        # Maps node to the nodes that it depends on
+        self.dependencies = defaultdict(set)
+
+        # Maps node to the nodes that depend on it
+        self.dependents = defaultdict(set)
+
+        # Maps node to the cell ranges that it depends on
+        self.dependency_ranges = defaultdict(set)
+
+        # Maps cell range to the nodes that depend on it
+        self.range_dependents = defaultdict(set)
+
+        # Maps table, row tile or None, column tuples to cell ranges
+        self._range_buckets = defaultdict(set)
+
+        # Cell ranges that are too large for buckets
+        self._large_ranges = set()
+
+    def __len__(self) -> int:
+        """Returns number of nodes that have dependencies"""
+
+        return len(set(self.dependencies) | set(self.dependency_ranges))
+
+    def add(self, dependent: Hashable, dependency: Hashable):
+        """Adds dependency of dependent node on dependency node
+
+        :param dependent: Node that depends on dependency
+        :param dependency: Node that dependent depends on
+
+        """
+
+        self.dependencies[dependent].add(dependency)
+        self.dependents[dependency].add(dependent)
+
+    def add_range(self, dependent: Hashable,
+                  cell_range: Tuple[range, range, range]):
+        """Adds dependency of dependent node on all cells in cell_range
+
+        :param dependent: Node that depends on cell_range
+        :param cell_range: Row, column and table ranges
+
+        """
+
+        if cell_range not in self.range_dependents:
+            self._index_range(cell_range)
+
+        self.dependency_ranges[dependent].add(cell_range)
+        self.range_dependents[cell_range].add(dependent)
+
+    def _get_range_buckets(self, cell_range: Tuple[range, range, range]
+                           ) -> Union[List[tuple], None]:
+        """Returns buckets of cell range, None if there are too many
+
+        :param cell_range: Row, column and table ranges
+
+        """
+
+        rows, columns, tables = cell_range
+        size = self.range_tile_size
+
+        if not rows:
+            return []
+
+        tiles = range(rows[0] // size, rows[-1] // size + 1) \
+            if rows.step > 0 else range(rows[-1] // size, rows[0] // size + 1)
+
+        if len(tiles) * len(columns) * len(tables) <= self.max_range_buckets:
+            return [(table, tile, column)
+                    for table in tables for tile in tiles
+                    for column in columns]
+
+        if len(columns) * len(tables) <= self.max_range_buckets:
+            return [(table, None, column)
+                    for table in tables for column in columns]
+
+    def _index_range(self, cell_range: Tuple[range, range, range]):
+        """Adds cell range to the buckets
+
+        :param cell_range: Row, column and table ranges
+
+        """
+
+        buckets = self._get_range_buckets(cell_range)
+
+        if buckets is None:
+            self._large_ranges.add(cell_range)
+            return
+
+        for bucket in buckets:
+            self._range_buckets[bucket].add(cell_range)
+
+    def _unindex_range(self, cell_range: Tuple[range, range, range]):
+        """Removes cell range from the buckets
+
+        :param cell_range: Row, column and table ranges
+
+        """
+
+        buckets = self._get_range_buckets(cell_range)
+
+        if buckets is None:
+            self._large_ranges.discard(cell_range)
+            return
+
+        for bucket in buckets:
+            cell_ranges = self._range_buckets[bucket]
+            cell_ranges.discard(cell_range)
+            if not cell_ranges:
+                del self._range_buckets[bucket]
+
+    def remove(self, dependent: Hashable):
+        """Removes all dependencies of dependent node
+
+        Dependencies of other nodes on dependent are kept.
+
+        :param dependent: Node, for which dependencies are removed
+
+        """
+
+        for dependency in self.dependencies.pop(dependent, ()):
+            dependents = self.dependents[dependency]
+            dependents.discard(dependent)
+            if not dependents:
+                del self.dependents[dependency]
+
+        for cell_range in self.dependency_ranges.pop(dependent, ()):
+            range_dependents = self.range_dependents[cell_range]
+            range_dependents.discard(dependent)
+            if not range_dependents:
+                del self.range_dependents[cell_range]
+                self._unindex_range(cell_range)
+
+    def clear(self):
+        """Removes all nodes"""
+
+        self.dependencies.clear()
+        self.dependents.clear()
+        self.dependency_ranges.clear()
+        self.range_dependents.clear()
+        self._range_buckets.clear()
+        self._large_ranges.clear()
+
+    def _direct_dependents(self, node: Hashable) -> Set[Hashable]:
+        """Returns nodes that directly depend on node
+
+        :param node: Node, for which dependents are returned
+
+        """
+
+        direct_dependents = set(self.dependents.get(node, ()))
+
+        if isinstance(node, tuple) and len(node) == 3 \
+           and all(type(ele) is int for ele in node):
+            row, column, table = node
+            tile = row // self.range_tile_size
+            buckets = self._range_buckets
+            candidates = chain(buckets.get((table, tile, column), ()),
+                               buckets.get((table, None, column), ()),
+                               self._large_ranges)
+            for cell_range in candidates:
+                if all(ele in rng for ele, rng in zip(node, cell_range)):
+                    direct_dependents.update(self.range_dependents[cell_range])
+
+        return direct_dependents
+
+    def get_dependents(self, *nodes: Hashable) -> Set[Hashable]:
+        """Returns all other nodes that directly or indirectly depend on nodes
+
+        :param nodes: Nodes, for which dependents are returned
+
+        """
+
+        dependents = set()
+        stack = list(nodes)
+
+        while stack:
+            for dependent in self._direct_dependents(stack.pop()):
+                if dependent not in dependents:
+                    dependents.add(dependent)
+                    stack.append(dependent)
+
+        dependents.difference_update(nodes)
+
+        return dependents
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Bounded caches
+
+**Provides**
+
+ * :func:`estimate_size` - Estimates memory size of an object
+ * :class:`LRUDict` - Dict that discards least recently used items
+ * :class:`SizedLRUDict` - LRUDict with a memory budget
+
+"""
+
+from collections import OrderedDict
+import sys
+from typing import Any, Hashable, Tuple
+
+
+def estimate_size(obj: Any) -> int:
+    """Returns estimated memory size of obj in bytes
+
+    The estimate includes data buffers of numpy arrays, QImages and
+    rendered matplotlib figures. Items of containers and of object arrays
+    are counted shallowly.
+
+    :param obj: Object to be sized
+
+    """
+
+    try:
+        size = sys.getsizeof(obj)
+    except TypeError:
+        size = 0
+
+    nbytes = getattr(obj, "nbytes", None)
+    if isinstance(nbytes, int):
+        # numpy arrays may share their data buffer
+        size = max(size, nbytes)
+        if getattr(obj, "dtype", None) == object:
+            size += sum(map(sys.getsizeof, obj.flat))
+        return size
+
+    size_in_bytes = getattr(obj, "sizeInBytes", None)
+    if callable(size_in_bytes):
+        # QImage
+        return size + size_in_bytes()
+
+    if callable(getattr(obj, "get_size_inches", None)):
+        # matplotlib figure, estimated as RGBA buffer of the rendered canvas
+        width, height = obj.get_size_inches() * obj.dpi
+        return size + int(width * height * 4)
+
+    if isinstance(obj, dict):
+        return size + sum(sys.getsizeof(key) + sys.getsizeof(value)
+                          for key, value in obj.items())
+
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(map(sys.getsizeof, obj))
+
+    return size
+
+
+class LRUDict(OrderedDict):
+    """Dict with a maximum number of items
+
+    If the maximum is exceeded then the least recently used items are
+    discarded. Item access via `[]` marks the item as recently used and
+    is counted as hit or miss.
+
+    """
+
+    def __init__(self, maxsize: int = 128):
+        """
+        :param maxsize: Maximum number of items
+
+        """
+
+        super().__init__()
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def __getitem__(self, key: Hashable) -> Any:
+        """Returns item and marks it as recently used
+
+        :param key: Key of item
+
+        """
+
+        try:
+            value = super().__getitem__(key)
+        except KeyError:
+            self.misses += 1
+            raise
+
+        self.hits += 1
+        self.move_to_end(key)
+
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any):
+        """Sets item and discards least recently used items if required
+
+        :param key: Key of item
+        :param value: Value of item
+
+        """
+
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        """Returns ratio of hits to all counted item accesses"""
+
+        lookups = self.hits + self.misses
+        if not lookups:
+            return 0.0
+
+        return self.hits / lookups
+
+    def reset_statistics(self):
+        """Resets hit and miss counters"""
+
+        self.hits = 0
+        self.misses = 0
+
+
+class SizedLRUDict(LRUDict):
+    """LRUDict with a maximum estimated memory size of its values
+
+    If the memory size is exceeded then the least recently used items are
+    discarded. The most recently set item is always kept.
+
+    """
+
+    def __init__(self, maxbytes: int, maxsize: int = sys.maxsize):
+        """
+        :param maxbytes: Maximum estimated memory size of all values
+        :param maxsize: Maximum number of items
+
+        """
+
+        # Maps key to estimated memory size of value
+        self.sizes = {}
+        self.nbytes = 0
+
+        super().__init__(maxsize)
+
+        self._maxbytes = maxbytes
+
+    @property
+    def maxbytes(self) -> int:
+        """Maximum estimated memory size of all values"""
+
+        return self._maxbytes
+
+    @maxbytes.setter
+    def maxbytes(self, maxbytes: int):
+        """Sets maximum memory size and discards items if required
+
+        :param maxbytes: Maximum estimated memory size of all values
+
+        """
+
+        self._maxbytes = maxbytes
+        self._shrink()
+
+    def _shrink(self):
+        """Discards least recently used items until values fit maxbytes"""
+
+        while self.nbytes > self._maxbytes and len(self) > 1:
+            self.popitem(last=False)
+
+    def __setitem__(self, key: Hashable, value: Any):
+        """Sets item and discards least recently used items if required
+
+        :param key: Key of item
+        :param value: Value of item
+
+        """
+
+        size = estimate_size(value)
+
+        self.nbytes += size - self.sizes.get(key, 0)
+        self.sizes[key] = size
+
+        super().__setitem__(key, value)
+        self._shrink()
+
+    def __delitem__(self, key: Hashable):
+        """Deletes item
+
+        :param key: Key of item
+
+        """
+
+        super().__delitem__(key)
+        self.nbytes -= self.sizes.pop(key)
+
+    def pop(self, key: Hashable, *default: Any) -> Any:
+        """Removes item and returns its value
+
+        :param key: Key of item
+        :param default: Returned if key is not present
+
+        """
+
+        if key in self:
+            self.nbytes -= self.sizes.pop(key)
+
+        return super().pop(key, *default)
+
+    def popitem(self, last: bool = True) -> Tuple[Hashable, Any]:
+        """Removes and returns most or least recently used item
+
+        :param last: Remove most recently used item if True
+
+        """
+
+        key, value = super().popitem(last)
+        self.nbytes -= self.sizes.pop(key)
+
+        return key, value
+
+    def clear(self):
+        """Removes all items"""
+
+        super().clear()
+        self.sizes.clear()
+        self.nbytes = 0
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Memoization of macro functions
+
+``@memo`` in macros caches the results of pure helper functions. All
+decorated functions share one bounded cache, which is cleared when the
+macros are executed again.
+
+**Provides**
+
+ * :class:`Memoizer` - Memoizing decorator with a shared LRU cache
+
+"""
+
+from functools import wraps
+import threading
+from typing import Any, Callable
+
+try:
+    from pyspread.lib.lru_dict import LRUDict
+except ImportError:
+    from lib.lru_dict import LRUDict
+
+
+class Memoizer:
+    """Memoizing decorator with a shared LRU cache
+
+    Results are cached per function and arguments. Calls with unhashable
+    arguments are not cached.
+
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        """
+        :param maxsize: Maximum number of cached results of all functions
+
+        """
+
+        self.cache = LRUDict(maxsize)
+        self._lock = threading.RLock()
+
+    def __call__(self, func: Callable) -> Callable:
+        """Returns memoizing wrapper of func
+
+        :param func: Pure function, of which results are cached
+
+        """
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                key = func, args, frozenset(kwargs.items())
+                hash(key)
+            except TypeError:
+                return func(*args, **kwargs)
+
+            with self._lock:
+                try:
+                    return self.cache[key]
+                except KeyError:
+                    pass
+
+            result = func(*args, **kwargs)
+
+            with self._lock:
+                self.cache[key] = result
+
+            return result
+
+        return wrapper
+
+    @property
+    def hits(self) -> int:
+        """Number of calls that returned a cached result"""
+
+        return self.cache.hits
+
+    @property
+    def misses(self) -> int:
+        """Number of calls that computed their result"""
+
+        return self.cache.misses
+
+    @property
+    def hit_rate(self) -> float:
+        """Ratio of hits to all cacheable calls"""
+
+        return self.cache.hit_rate
+
+    def clear(self):
+        """Removes all cached results and resets the statistics"""
+
+        with self._lock:
+            self.cache.clear()
+            self.cache.reset_statistics()
+
+    def __repr__(self) -> str:
+        return "<memo {} results, {} hits, {} misses>".format(
+            len(self.cache), self.hits, self.misses)
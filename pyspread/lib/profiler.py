@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Profiling of cell evaluation
+
+**Provides**
+
+ * :class:`CellProfile` - Evaluation statistics of one cell
+ * :class:`CellProfiler` - Records evaluation statistics per cell key
+
+"""
+
+import csv
+import threading
+from time import perf_counter
+from typing import Any, Hashable, List, TextIO, Tuple
+
+try:
+    from pyspread.lib.lru_dict import estimate_size
+except ImportError:
+    from lib.lru_dict import estimate_size
+
+
+class CellProfile:
+    """Evaluation statistics of one cell"""
+
+    __slots__ = "calls", "total_time", "self_time", "result_size"
+
+    def __init__(self):
+        self.calls = 0
+        """Number of evaluations"""
+
+        self.total_time = 0.0
+        """Wall time of all evaluations in seconds"""
+
+        self.self_time = 0.0
+        """Wall time without evaluating referenced cells in seconds"""
+
+        self.result_size = 0
+        """Estimated memory size of the last result in bytes"""
+
+
+class CellProfiler:
+    """Records evaluation statistics per cell key
+
+    Evaluations may be nested if cells reference other cells. The self time
+    of a cell excludes the time of nested evaluations.
+
+    """
+
+    columns = "Cell", "Calls", "Total time [s]", "Self time [s]", \
+        "Result size [bytes]"
+    """Column titles of the hot cell report"""
+
+    def __init__(self):
+        self.enabled = False
+        """Evaluations are only recorded if True"""
+
+        self.profiles = {}
+        """Maps cell key to :class:`CellProfile`"""
+
+        self.max_self_time = 0.0
+        """Largest self time of all cells, e.g. for scaling a heat map"""
+
+        # Accumulated time of nested evaluations for each running evaluation
+        # Evaluations in different threads are not nested.
+        self._thread_state = threading.local()
+
+    @property
+    def _nested_times(self) -> List[float]:
+        """Nested evaluation times of the current thread"""
+
+        try:
+            return self._thread_state.nested_times
+        except AttributeError:
+            nested_times = self._thread_state.nested_times = []
+            return nested_times
+
+    def start(self) -> float:
+        """Starts timing an evaluation and returns its start time"""
+
+        self._nested_times.append(0.0)
+
+        return perf_counter()
+
+    def stop(self, key: Hashable, start: float, result: Any):
+        """Stops timing an evaluation and records it
+
+        :param key: Key of evaluated cell
+        :param start: Start time from :meth:`start`
+        :param result: Result of the evaluation
+
+        """
+
+        elapsed = perf_counter() - start
+        nested_times = self._nested_times
+        nested_time = nested_times.pop()
+
+        if nested_times:
+            nested_times[-1] += elapsed
+
+        try:
+            profile = self.profiles[key]
+        except KeyError:
+            profile = self.profiles[key] = CellProfile()
+
+        profile.calls += 1
+        profile.total_time += elapsed
+        profile.self_time += elapsed - nested_time
+        profile.result_size = estimate_size(result)
+
+        self.max_self_time = max(self.max_self_time, profile.self_time)
+
+    def clear(self):
+        """Removes all records"""
+
+        self.profiles.clear()
+        self.max_self_time = 0.0
+
+    def hot_cells(self) -> List[Tuple[Hashable, CellProfile]]:
+        """Returns key profile tuples sorted by descending self time"""
+
+        return sorted(self.profiles.items(),
+                      key=lambda item: item[1].self_time, reverse=True)
+
+    def write_csv(self, csvfile: TextIO):
+        """Writes hot cell report to csv file
+
+        :param csvfile: File, to which the report is written
+
+        """
+
+        writer = csv.writer(csvfile)
+        writer.writerow(self.columns)
+
+        for key, profile in self.hot_cells():
+            writer.writerow([key, profile.calls, profile.total_time,
+                             profile.self_time, profile.result_size])
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Spatial index of grid selections
+
+Cell attributes are stored as layers, each of which applies to one
+selection. A :class:`SelectionIndex` finds the layers that contain a cell
+without testing each selection. Block selections are looked up in an
+:class:`IntervalTree` over their rows, row, column and cell selections in
+dicts.
+
+**Provides**
+
+ * :func:`get_rectangles` - Rectangles that make up a selection
+ * :func:`get_bounding_box` - Bounds of a selection including open edges
+ * :class:`IntervalTree` - Static centered interval tree
+ * :class:`SelectionIndex` - Finds selections that contain a cell
+ * :class:`RectangleCover` - Checks if rectangles cover a selection
+
+"""
+
+from collections import defaultdict
+from math import inf
+from typing import Any, Iterable, List, Optional, Tuple
+
+Rectangle = Tuple[float, float, float, float]
+
+try:
+    from pyspread.lib.selection import Selection
+except ImportError:
+    from lib.selection import Selection
+
+
+def get_rectangles(selection: Selection) -> List[Rectangle]:
+    """Returns top, left, bottom, right rectangles that make up selection
+
+    Open edges are 0 or `inf`. Malformed cells are skipped.
+
+    :param selection: Selection, of which the rectangles are returned
+
+    """
+
+    rectangles = []
+
+    for (top, left), (bottom, right) in zip(selection.block_tl,
+                                            selection.block_br):
+        rectangles.append((0 if top is None else top,
+                           0 if left is None else left,
+                           inf if bottom is None else bottom,
+                           inf if right is None else right))
+    rectangles.extend((row, 0, row, inf) for row in selection.rows)
+    rectangles.extend((0, column, inf, column)
+                      for column in selection.columns)
+    for cell in selection.cells:
+        try:
+            row, column = cell
+        except (TypeError, ValueError):
+            continue
+        rectangles.append((row, column, row, column))
+
+    return rectangles
+
+
+def get_bounding_box(selection: Selection) -> Optional[Rectangle]:
+    """Returns top, left, bottom, right of rectangle that contains selection
+
+    Unlike `Selection.get_bbox`, open edges are 0 or `inf`. Returns None for
+    empty selections.
+
+    :param selection: Selection, of which the bounding box is returned
+
+    """
+
+    rectangles = get_rectangles(selection)
+    if not rectangles:
+        return
+
+    tops, lefts, bottoms, rights = zip(*rectangles)
+
+    return min(tops), min(lefts), max(bottoms), max(rights)
+
+
+class IntervalTree:
+    """Static centered interval tree for finding intervals that contain a point
+
+    Intervals are closed and may be unbounded, i.e. bounds may be `inf`.
+
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[float, float, Any]]):
+        """
+        :param intervals: Start, end, payload tuples with start <= end
+
+        """
+
+        intervals = list(intervals)
+
+        self.center = None
+        self.left = self.right = None
+
+        if not intervals:
+            return
+
+        points = sorted(point for start, end, _ in intervals
+                        for point in (start, end))
+        self.center = center = points[len(points) // 2]
+
+        left = [interval for interval in intervals if interval[1] < center]
+        right = [interval for interval in intervals if interval[0] > center]
+
+        # Intervals that contain center, sorted for early termination
+        overlapping = [interval for interval in intervals
+                       if interval[0] <= center <= interval[1]]
+        self.by_start = sorted(overlapping, key=lambda interval: interval[0])
+        self.by_end = sorted(overlapping, key=lambda interval: interval[1],
+                             reverse=True)
+
+        if left:
+            self.left = IntervalTree(left)
+        if right:
+            self.right = IntervalTree(right)
+
+    def query(self, point: float) -> List[Any]:
+        """Returns payloads of all intervals that contain point
+
+        :param point: Point to be looked up
+
+        """
+
+        payloads = []
+        node = self
+
+        while node is not None and node.center is not None:
+            if point < node.center:
+                for start, _, payload in node.by_start:
+                    if start > point:
+                        break
+                    payloads.append(payload)
+                node = node.left
+            elif point > node.center:
+                for _, end, payload in node.by_end:
+                    if end < point:
+                        break
+                    payloads.append(payload)
+                node = node.right
+            else:
+                payloads.extend(payload for _, _, payload in node.by_start)
+                break
+
+        return payloads
+
+
+class SelectionIndex:
+    """Finds the selections of a sequence that contain a cell
+
+    The index reflects the selections at creation time. It has to be
+    created again when selections are changed.
+
+    """
+
+    def __init__(self, selections: Iterable[Selection]):
+        """
+        :param selections: Selections, which are identified by their index
+
+        """
+
+        self.rows = defaultdict(list)
+        self.columns = defaultdict(list)
+        self.cells = defaultdict(list)
+
+        blocks = []
+
+        for i, selection in enumerate(selections):
+            for (top, left), (bottom, right) in zip(selection.block_tl,
+                                                    selection.block_br):
+                top = 0 if top is None else top
+                left = 0 if left is None else left
+                bottom = inf if bottom is None else bottom
+                right = inf if right is None else right
+                if top <= bottom:
+                    blocks.append((top, bottom, (left, right, i)))
+
+            for row in selection.rows:
+                self.rows[row].append(i)
+            for column in selection.columns:
+                self.columns[column].append(i)
+            for cell in selection.cells:
+                try:
+                    self.cells[tuple(cell)].append(i)
+                except TypeError:
+                    # Malformed cells are never contained in a selection
+                    pass
+
+        self.blocks = IntervalTree(blocks)
+
+    def find(self, cell: Tuple[int, int]) -> List[int]:
+        """Returns sorted indices of all selections that contain cell
+
+        :param cell: Row and column of cell
+
+        """
+
+        row, column = cell
+
+        indices = {i for left, right, i in self.blocks.query(row)
+                   if left <= column <= right}
+        indices.update(self.rows.get(row, ()))
+        indices.update(self.columns.get(column, ()))
+        indices.update(self.cells.get((row, column), ()))
+
+        return sorted(indices)
+
+
+class RectangleCover:
+    """Rectangles, against which covering of selections is checked
+
+    A selection is covered if each of its rectangles is contained in one
+    rectangle of the cover. Unions of several rectangles are not considered
+    so that :meth:`covers` may return False for covered selections.
+
+    Rectangles are stored in tiles of the grid so that only rectangles near
+    the checked rectangle are compared. Large rectangles are always compared.
+
+    """
+
+    tile_size = 64
+    max_tiles = 16
+
+    def __init__(self):
+        # Maps tile to rectangles that overlap it
+        self.tiles = defaultdict(list)
+
+        # Rectangles that overlap more than max_tiles tiles
+        self.large = []
+
+    def _get_tiles(self, rectangle: Rectangle) -> Optional[List[tuple]]:
+        """Returns tiles of rectangle, None if there are more than max_tiles
+
+        :param rectangle: Top, left, bottom, right of rectangle
+
+        """
+
+        top, left, bottom, right = rectangle
+        size = self.tile_size
+
+        if bottom == inf or right == inf:
+            return
+
+        rows = range(int(top) // size, int(bottom) // size + 1)
+        columns = range(int(left) // size, int(right) // size + 1)
+
+        if len(rows) * len(columns) > self.max_tiles:
+            return
+
+        return [(row, column) for row in rows for column in columns]
+
+    def _covers_rectangle(self, rectangle: Rectangle) -> bool:
+        """True if rectangle is contained in one rectangle of the cover
+
+        :param rectangle: Top, left, bottom, right of rectangle
+
+        """
+
+        top, left, bottom, right = rectangle
+        size = self.tile_size
+
+        candidates = self.large
+        if top != inf and left != inf:
+            tile = int(top) // size, int(left) // size
+            candidates = self.large + self.tiles.get(tile, [])
+
+        return any(c_top <= top and c_left <= left and bottom <= c_bottom
+                   and right <= c_right
+                   for c_top, c_left, c_bottom, c_right in candidates)
+
+    def add(self, rectangles: Iterable[Rectangle]):
+        """Adds rectangles to the cover
+
+        :param rectangles: Top, left, bottom, right rectangles
+
+        """
+
+        for rectangle in rectangles:
+            if self._covers_rectangle(rectangle):
+                continue
+
+            tiles = self._get_tiles(rectangle)
+            if tiles is None:
+                self.large.append(rectangle)
+            else:
+                for tile in tiles:
+                    self.tiles[tile].append(rectangle)
+
+    def covers(self, rectangles: Iterable[Rectangle]) -> bool:
+        """True if each rectangle is contained in a rectangle of the cover
+
+        :param rectangles: Top, left, bottom, right rectangles
+
+        """
+
+        return all(self._covers_rectangle(rectangle)
+                   for rectangle in rectangles)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+test_aggregation
+================
+
+Unit tests for aggregation.py
+
+"""
+
+import numpy
+import pytest
+
+from ..aggregation import (Aggregate, EMPTY_AGGREGATE, RANGE_FUNCTIONS,
+                           RangeFunction, aggregate_values,
+                           combine_aggregates)
+
+
+param_test_aggregate_values = [
+    (numpy.array([3, 1, 2]), Aggregate(6, 3, 1, 3)),
+    (numpy.array([[1.5], [0.5]]), Aggregate(2.0, 2, 0.5, 1.5)),
+    (numpy.array([True, False]), Aggregate(1, 2, 0, 1)),
+    (numpy.array([], dtype="int64"), EMPTY_AGGREGATE),
+    (numpy.array([2**62, 2**62]), Aggregate(2**63, 2, 2**62, 2**62)),
+    (numpy.array([1, None, "a", [2, 3]], dtype="O"), Aggregate(6, 3, 1, 3)),
+    ((1, [2, (i for i in range(3))], "x"), Aggregate(6, 5, 0, 2)),
+    ((None, "a"), EMPTY_AGGREGATE),
+]
+
+
+@pytest.mark.parametrize("values, res", param_test_aggregate_values)
+def test_aggregate_values(values, res):
+    """Unit test for aggregate_values"""
+
+    assert aggregate_values(values) == res
+
+
+def test_combine_aggregates():
+    """Unit test for combine_aggregates"""
+
+    aggregates = [Aggregate(6, 3, 1, 3), EMPTY_AGGREGATE,
+                  Aggregate(-1, 2, -4, 3)]
+
+    assert combine_aggregates(aggregates) == Aggregate(5, 5, -4, 3)
+    assert combine_aggregates([EMPTY_AGGREGATE]) == EMPTY_AGGREGATE
+
+
+param_test_range_function = [
+    ("SUM", 10), ("MEAN", 2.5), ("MIN", 1), ("MAX", 4), ("COUNT", 4),
+]
+
+
+@pytest.mark.parametrize("name, res", param_test_range_function)
+def test_range_function(name, res):
+    """Unit test for RangeFunction"""
+
+    function = RangeFunction(name, RANGE_FUNCTIONS[name],
+                             lambda key: aggregate_values(
+                                 numpy.arange(key.start, key.stop)))
+
+    assert function[1:5] == res
+    assert function(1, [2, 3], 4) == res
+
+
+@pytest.mark.parametrize("name, error", [("MEAN", ZeroDivisionError),
+                                         ("MIN", ValueError),
+                                         ("MAX", ValueError)])
+def test_range_function_empty(name, error):
+    """Unit test for RangeFunction without numbers"""
+
+    function = RangeFunction(name, RANGE_FUNCTIONS[name], None)
+
+    with pytest.raises(error):
+        function(None)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+test_awaitables
+===============
+
+Unit tests for awaitables.py
+
+"""
+
+import asyncio
+from time import perf_counter
+
+import pytest
+
+from ..awaitables import AwaitableRunner, PendingResult
+
+
+class TestAwaitableRunner:
+    """Unit tests for AwaitableRunner"""
+
+    def setup_method(self, method):
+        """Creates AwaitableRunner"""
+
+        self.runner = AwaitableRunner()
+
+    def test_submit(self):
+        """Unit test for submit"""
+
+        pending = self.runner.submit(asyncio.sleep(0, result=42), 1)
+
+        assert isinstance(pending, PendingResult)
+        assert repr(pending) == "Pending..."
+        assert pending.future.result(1) == 42
+
+    def test_submit_concurrent(self):
+        """Unit test for submit with many awaitables in flight"""
+
+        start = perf_counter()
+        pendings = [self.runner.submit(asyncio.sleep(0.2, result=i), 0)
+                    for i in range(100)]
+
+        assert [pending.future.result(5) for pending in pendings] == \
+            list(range(100))
+        assert perf_counter() - start < 2
+
+    def test_submit_timeout(self):
+        """Unit test for submit with expiring timeout"""
+
+        pending = self.runner.submit(asyncio.sleep(5), 0.05)
+
+        with pytest.raises(asyncio.TimeoutError):
+            pending.future.result(1)
+
+    def test_submit_exception(self):
+        """Unit test for submit with failing awaitable"""
+
+        async def fail():
+            raise ValueError("Test")
+
+        pending = self.runner.submit(fail(), 1)
+
+        with pytest.raises(ValueError):
+            pending.future.result(1)
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+
+"""
+test_dependency_graph
+=====================
+
+Unit tests for dependency_graph.py
+
+"""
+
+import pytest
+
+from ..dependency_graph import (DependencyGraph, get_cell_access_names,
+                                get_code_references, get_literal,
+                                get_volatile_names, resolve_index)
+
+
+param_test_get_code_references = [
+    ("1 + 2", set(), set()),
+    ("a + numpy.sin(X)", {"a", "numpy"}, set()),
+    ("b = len(c)", {"c"}, {"b"}),
+    ("import math\nmath.pi", {"math"}, set()),
+    ("def f(x): return x\nf(1)", {"f", "x"}, set()),
+    ("1 +", set(), set()),
+    ("SUM[0:10, 0, 0] + MEAN(a)", {"a", "SUM", "MEAN"}, set()),
+    ("a = b = 1", set(), {"a", "b"}),
+    ("a = 1\nb = a + 1", {"a"}, {"b"}),
+    ("s = 0\nfor i in range(3): s += i\ns", {"s", "i"}, set()),
+    ("c = [i for i in range(3)]", {"i"}, {"c"}),
+    ("global d\nd = 1\nd", {"d"}, {"d"}),
+    ("def f():\n    global e\n    e = 1\nf()", {"f"}, {"e"}),
+]
+
+
+@pytest.mark.parametrize("code, loaded, stored",
+                         param_test_get_code_references)
+def test_get_code_references_names(code, loaded, stored):
+    """Unit test for names in get_code_references"""
+
+    references = get_code_references(code)
+
+    assert references.loaded_names == loaded
+    assert references.stored_names == stored
+
+
+param_test_get_code_references_dynamic_access = [
+    ("S[0, 0, 0] + S[X, Y-1, Z]", False),
+    ("S[0, 0]", True),
+    ("S.shape", True),
+    ("f(S)", True),
+    ("T", False),
+    ("SUM[:, 0, 0] + MAX(S[0, 0, 0], 1)", False),
+]
+
+
+@pytest.mark.parametrize("code, res",
+                         param_test_get_code_references_dynamic_access)
+def test_get_code_references_dynamic_access(code, res):
+    """Unit test for dynamic_access in get_code_references"""
+
+    assert get_code_references(code).dynamic_access == res
+
+
+param_test_get_code_references_volatile = [
+    ("random.random()", True),
+    ("numpy.random.rand(3)", True),
+    ("datetime.datetime.now()", True),
+    ("datetime.date(2020, 1, 1)", False),
+    ("open('data.csv').read()", True),
+    ("os.path.getmtime('data.csv')", True),
+    ("volatile(S[0, 0, 0] + 1)", True),
+    ("S[0, 0, 0].random", False),
+    ("time.sleep(1)", False),
+    ("math.pi", False),
+    ("from random import random\nrandom()", True),
+    ("import time as t\nt.time()", True),
+    ("import time as t\nt.sleep(1)", False),
+    ("from time import time as now\nnow()", True),
+    ("import numpy as np\nnp.random.rand(3)", True),
+    ("import numpy as n\nn.sin(1)", False),
+    ("from numpy import random as npr\nnpr.rand(3)", True),
+    ("from datetime import datetime\ndatetime(2020, 1, 1)", False),
+    ("from .time import time\ntime()", False),
+]
+
+
+@pytest.mark.parametrize("code, res",
+                         param_test_get_code_references_volatile)
+def test_get_code_references_volatile(code, res):
+    """Unit test for get_code_references volatile detection"""
+
+    assert get_code_references(code).volatile == res
+
+
+def test_get_volatile_names():
+    """Unit test for get_volatile_names"""
+
+    macros = "import random\n" \
+             "def roll(): return random.randint(1, 6)\n" \
+             "def twice(): return 2 * roll()\n" \
+             "def square(x): return x * x\n" \
+             "now = datetime.datetime.now()"
+
+    assert get_volatile_names(macros) == {"roll", "twice", "now"}
+    assert get_volatile_names("from time import time as now") == {"now"}
+    assert get_volatile_names("1 +") == set()
+    assert get_volatile_names("for t in range(3): pass\n"
+                              "l = [time.time() for r in range(3)]") == {"l"}
+
+
+def test_get_cell_access_names():
+    """Unit test for get_cell_access_names"""
+
+    macros = "def g(): return S[0, 1, 0] * 2\n" \
+             "def h(): return g() + 1\n" \
+             "def total(): return SUM[:, 0, 0]\n" \
+             "def shape(): return S.shape\n" \
+             "def square(x): return x * x"
+
+    assert get_cell_access_names(macros) == {"g", "h", "total", "shape"}
+    assert get_cell_access_names("1 +") == set()
+
+
+param_test_resolve_index = [
+    ("S[1, 2, 0]", (4, 5, 1), (1, 2, 0)),
+    ("S[X-1, Y, Z]", (4, 5, 1), (3, 5, 1)),
+    ("S[R, C+2*3, T]", (4, 5, 1), (4, 11, 1)),
+    ("S[0:X, -Y, 0]", (4, 5, 1), (slice(0, 4, None), -5, 0)),
+    ("S[a, 0, 0]", (4, 5, 1), None),
+    ("COUNT[0:X, Y, Z]", (4, 5, 1), (slice(0, 4, None), 5, 1)),
+]
+
+
+@pytest.mark.parametrize("code, key, res", param_test_resolve_index)
+def test_resolve_index(code, key, res):
+    """Unit test for resolve_index"""
+
+    index, = get_code_references(code).cells
+
+    assert resolve_index(index, key) == res
+
+
+param_test_get_literal = [
+    ("123", 123),
+    ("-3.14", -3.14),
+    ("'abc'", "abc"),
+    ("b'x' # bytes", b"x"),
+    ("None", None),
+    ("(\n1e3\n)", 1000.0),
+]
+
+
+@pytest.mark.parametrize("code, res", param_test_get_literal)
+def test_get_literal(code, res):
+    """Unit test for get_literal"""
+
+    assert get_literal(code) == res
+
+
+@pytest.mark.parametrize("code", ["1 + 1", "[1]", "x", "-True", " 1", "1\n2",
+                                  "1 +", None])
+def test_get_literal_no_constant(code):
+    """Unit test for get_literal with code that is not a constant"""
+
+    with pytest.raises(ValueError):
+        get_literal(code)
+
+
+class TestDependencyGraph:
+    """Unit tests for DependencyGraph"""
+
+    def setup_method(self, method):
+        """Creates graph (0, 0, 0) <- (1, 0, 0) <- (2, 0, 0), b <- a"""
+
+        self.graph = DependencyGraph()
+        self.graph.add((1, 0, 0), (0, 0, 0))
+        self.graph.add((2, 0, 0), (1, 0, 0))
+        self.graph.add("a", "b")
+
+    def test_get_dependents(self):
+        """Unit test for get_dependents"""
+
+        assert self.graph.get_dependents((0, 0, 0)) == {(1, 0, 0), (2, 0, 0)}
+        assert self.graph.get_dependents((2, 0, 0)) == set()
+        assert self.graph.get_dependents("b") == {"a"}
+        assert self.graph.get_dependents((1, 0, 0), "b") == {(2, 0, 0), "a"}
+        assert self.graph.get_dependents((0, 0, 0), (1, 0, 0)) == {(2, 0, 0)}
+
+    def test_get_dependents_cycle(self):
+        """Unit test for get_dependents with cyclic dependencies"""
+
+        self.graph.add((0, 0, 0), (2, 0, 0))
+
+        assert self.graph.get_dependents((0, 0, 0)) == {(1, 0, 0), (2, 0, 0)}
+
+    def test_add_range(self):
+        """Unit test for add_range"""
+
+        self.graph.add_range((5, 0, 0), (range(0, 3), range(0, 1), range(1)))
+
+        assert self.graph.get_dependents((1, 0, 0)) == {(2, 0, 0), (5, 0, 0)}
+        assert self.graph.get_dependents((3, 0, 0)) == set()
+
+    @pytest.mark.parametrize("cell_range, inside, outside", [
+        ((range(0, 3), range(0, 1), range(1)), (2, 0, 0), (3, 0, 0)),
+        ((range(0, 100000), range(4, 5), range(1)), (99999, 4, 0),
+         (50, 5, 0)),
+        ((range(0, 100000), range(0, 1000), range(1)), (5000, 999, 0),
+         (5000, 1000, 0)),
+        ((range(60, 70, 3), range(0, 1), range(1)), (66, 0, 0), (65, 0, 0)),
+        ((range(9, -1, -1), range(0, 1), range(1)), (0, 0, 0), (10, 0, 0)),
+        ((range(0), range(0, 1), range(1)), None, (0, 0, 0)),
+    ])
+    def test_add_range_index(self, cell_range, inside, outside):
+        """Unit test for add_range with the range buckets"""
+
+        self.graph.add_range("node", cell_range)
+
+        if inside is not None:
+            assert "node" in self.graph.get_dependents(inside)
+        assert "node" not in self.graph.get_dependents(outside)
+
+        self.graph.remove("node")
+
+        assert not self.graph._range_buckets
+        assert not self.graph._large_ranges
+        if inside is not None:
+            assert "node" not in self.graph.get_dependents(inside)
+
+    def test_remove(self):
+        """Unit test for remove"""
+
+        self.graph.add_range((2, 0, 0), (range(9, 10), range(1), range(1)))
+        self.graph.remove((2, 0, 0))
+
+        assert self.graph.get_dependents((0, 0, 0)) == {(1, 0, 0)}
+        assert self.graph.get_dependents((9, 0, 0)) == set()
+        assert len(self.graph) == 2
+
+    def test_clear(self):
+        """Unit test for clear"""
+
+        self.graph.clear()
+
+        assert not self.graph.get_dependents((0, 0, 0))
+        assert len(self.graph) == 0
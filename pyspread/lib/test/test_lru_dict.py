@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+
+"""
+test_lru_dict
+=============
+
+Unit tests for lru_dict.py
+
+"""
+
+import sys
+
+import numpy
+import pytest
+
+from ..lru_dict import estimate_size, LRUDict, SizedLRUDict
+
+
+param_test_estimate_size = [
+    (numpy.zeros(1000), 8000),
+    (numpy.zeros(1000)[::2], 4000),
+    ([b"x" * 1000, b"y" * 1000], 2000),
+    ({"a": b"x" * 1000}, 1000),
+    (1, sys.getsizeof(1)),
+]
+
+
+@pytest.mark.parametrize("obj, minsize", param_test_estimate_size)
+def test_estimate_size(obj, minsize):
+    """Unit test for estimate_size"""
+
+    size = estimate_size(obj)
+
+    assert minsize <= size < minsize + 1000
+
+
+class TestLRUDict:
+    """Unit tests for LRUDict"""
+
+    def setup_method(self, method):
+        """Creates LRUDict with three items a, b, c"""
+
+        self.lru_dict = LRUDict(maxsize=3)
+        for key in "abc":
+            self.lru_dict[key] = key.upper()
+
+    def test_eviction(self):
+        """Unit test for discarding least recently used items"""
+
+        assert self.lru_dict["a"] == "A"
+
+        self.lru_dict["d"] = "D"
+
+        assert list(self.lru_dict) == ["c", "a", "d"]
+
+    def test_statistics(self):
+        """Unit test for hits, misses and hit_rate"""
+
+        assert self.lru_dict.hit_rate == 0.0
+
+        self.lru_dict["a"]
+        with pytest.raises(KeyError):
+            self.lru_dict["x"]
+
+        assert self.lru_dict.hits == 1
+        assert self.lru_dict.misses == 1
+        assert self.lru_dict.hit_rate == 0.5
+
+        self.lru_dict.reset_statistics()
+
+        assert self.lru_dict.hits == self.lru_dict.misses == 0
+
+
+class TestSizedLRUDict:
+    """Unit tests for SizedLRUDict"""
+
+    def setup_method(self, method):
+        """Creates SizedLRUDict with two arrays of 4000 bytes"""
+
+        self.lru_dict = SizedLRUDict(maxbytes=10000)
+        for key in "ab":
+            self.lru_dict[key] = numpy.zeros(500)
+
+    def test_eviction(self):
+        """Unit test for discarding items that exceed maxbytes"""
+
+        self.lru_dict["a"]
+        self.lru_dict["c"] = numpy.zeros(500)
+
+        assert list(self.lru_dict) == ["a", "c"]
+        assert self.lru_dict.nbytes == sum(self.lru_dict.sizes.values())
+
+    def test_eviction_large_item(self):
+        """Unit test for keeping an item that exceeds maxbytes"""
+
+        self.lru_dict["c"] = numpy.zeros(5000)
+
+        assert list(self.lru_dict) == ["c"]
+
+    def test_maxbytes(self):
+        """Unit test for reducing maxbytes"""
+
+        self.lru_dict.maxbytes = 5000
+
+        assert list(self.lru_dict) == ["b"]
+
+    def test_removal(self):
+        """Unit test for keeping nbytes up to date on removal"""
+
+        self.lru_dict["c"] = 1
+        self.lru_dict.pop("a")
+        del self.lru_dict["b"]
+        self.lru_dict.pop("x", None)
+
+        assert self.lru_dict.nbytes == self.lru_dict.sizes["c"]
+
+        self.lru_dict.clear()
+
+        assert self.lru_dict.nbytes == 0
+        assert not self.lru_dict.sizes
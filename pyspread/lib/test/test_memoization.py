@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+test_memoization
+================
+
+Unit tests for memoization.py
+
+"""
+
+from ..memoization import Memoizer
+
+
+class TestMemoizer:
+    """Unit tests for Memoizer"""
+
+    def setup_method(self, method):
+        """Creates Memoizer and a memoized function that records calls"""
+
+        self.memo = Memoizer(maxsize=2)
+        self.calls = []
+
+        @self.memo
+        def square(x, offset=0):
+            """Returns x ** 2 + offset"""
+
+            self.calls.append(x)
+            return x ** 2 + offset
+
+        self.square = square
+
+    def test_cache(self):
+        """Unit test for returning cached results"""
+
+        assert self.square(2) == 4
+        assert self.square(2) == 4
+        assert self.square(2, offset=1) == 5
+
+        assert self.calls == [2, 2]
+        assert self.memo.hits == 1
+        assert self.memo.misses == 2
+        assert self.square.__doc__ == "Returns x ** 2 + offset"
+
+    def test_eviction(self):
+        """Unit test for discarding least recently used results"""
+
+        for x in (1, 2, 1, 3, 1, 2):
+            self.square(x)
+
+        assert self.calls == [1, 2, 3, 2]
+
+    def test_unhashable(self):
+        """Unit test for calls with unhashable arguments"""
+
+        @self.memo
+        def total(values):
+            self.calls.append(values)
+            return sum(values)
+
+        assert total([1, 2]) == total([1, 2]) == 3
+        assert len(self.calls) == 2
+        assert not self.memo.cache
+
+    def test_clear(self):
+        """Unit test for clearing results and statistics"""
+
+        self.square(2)
+        self.square(2)
+        self.memo.clear()
+
+        assert not self.memo.cache
+        assert self.memo.hits == self.memo.misses == 0
+
+        self.square(2)
+
+        assert self.calls == [2, 2]
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+test_profiler
+=============
+
+Unit tests for profiler.py
+
+"""
+
+import io
+
+import pytest
+
+from .. import profiler
+from ..profiler import CellProfiler
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces perf_counter by a clock that advances on each call"""
+
+    times = iter([0.0, 1.0, 3.0, 5.0, 10.0, 14.0])
+    monkeypatch.setattr(profiler, "perf_counter", lambda: next(times))
+
+
+class TestCellProfiler:
+    """Unit tests for CellProfiler"""
+
+    def setup_method(self, method):
+        """Creates CellProfiler"""
+
+        self.profiler = CellProfiler()
+
+    def test_stop_nested(self, clock):
+        """Unit test for stop with a nested evaluation"""
+
+        outer_start = self.profiler.start()  # 0.0
+        inner_start = self.profiler.start()  # 1.0
+        self.profiler.stop((1, 0, 0), inner_start, 2)  # 3.0
+        self.profiler.stop((0, 0, 0), outer_start, 4)  # 5.0
+
+        inner = self.profiler.profiles[1, 0, 0]
+        outer = self.profiler.profiles[0, 0, 0]
+
+        assert inner.calls == outer.calls == 1
+        assert inner.total_time == inner.self_time == 2.0
+        assert outer.total_time == 5.0
+        assert outer.self_time == 3.0
+        assert self.profiler.max_self_time == 3.0
+
+    def test_hot_cells(self, clock):
+        """Unit test for hot_cells"""
+
+        for key in (0, 0, 0), (1, 0, 0), (2, 0, 0):
+            self.profiler.stop(key, self.profiler.start(), None)
+
+        assert [key for key, _ in self.profiler.hot_cells()] == \
+            [(2, 0, 0), (1, 0, 0), (0, 0, 0)]
+
+    def test_clear(self, clock):
+        """Unit test for clear"""
+
+        self.profiler.stop((0, 0, 0), self.profiler.start(), None)
+        self.profiler.clear()
+
+        assert not self.profiler.profiles
+        assert self.profiler.max_self_time == 0.0
+
+    def test_write_csv(self, clock):
+        """Unit test for write_csv"""
+
+        self.profiler.stop((0, 0, 0), self.profiler.start(), b"x" * 100)
+
+        csvfile = io.StringIO()
+        self.profiler.write_csv(csvfile)
+        lines = csvfile.getvalue().splitlines()
+
+        assert lines[0] == ",".join(CellProfiler.columns)
+        assert lines[1].startswith('"(0, 0, 0)",1,1.0,1.0,')
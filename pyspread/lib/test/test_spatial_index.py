@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+test_spatial_index
+==================
+
+Unit tests for spatial_index.py
+
+"""
+
+from math import inf
+from random import Random
+
+import pytest
+
+from ..selection import Selection
+from ..spatial_index import (get_bounding_box, get_rectangles, IntervalTree,
+                             RectangleCover, SelectionIndex)
+
+INTERVALS = [(0, 10, "a"), (5, 5, "b"), (3, inf, "c"), (20, 30, "d"),
+             (-2, 0, "e")]
+
+SELECTIONS = [
+    Selection([(1, 1)], [(3, 4)], [], [], []),
+    Selection([], [], [2, 7], [], []),
+    Selection([], [], [], [5], []),
+    Selection([], [], [], [], [(0, 0), (8, 8)]),
+    Selection([(None, 2)], [(4, None)], [], [], []),
+    Selection([(6, None)], [(None, 1)], [], [], []),
+    Selection([], [], [], [], [(32), (34)]),
+    Selection([(1, 1), (2, 6)], [(2, 2), (2, 9)], [9], [0], [(3, 3)]),
+]
+
+def test_get_rectangles():
+    """Unit test for get_rectangles"""
+
+    selection = Selection([(None, 2)], [(3, None)], [4], [5], [(6, 7), (8)])
+
+    assert get_rectangles(selection) == \
+        [(0, 2, 3, inf), (4, 0, 4, inf), (0, 5, inf, 5), (6, 7, 6, 7)]
+
+
+param_test_get_bounding_box = [
+    (Selection([], [], [], [], []), None),
+    (Selection([(1, 2)], [(3, 4)], [], [], [(0, 9)]), (0, 2, 3, 9)),
+    (Selection([(None, 2)], [(3, None)], [], [], []), (0, 2, 3, inf)),
+    (Selection([], [], [4], [], [(5, 1)]), (4, 0, 5, inf)),
+    (Selection([], [], [], [3], [(32), (34)]), (0, 3, inf, 3)),
+]
+
+
+@pytest.mark.parametrize("selection, res", param_test_get_bounding_box)
+def test_get_bounding_box(selection, res):
+    """Unit test for get_bounding_box"""
+
+    assert get_bounding_box(selection) == res
+
+
+class TestIntervalTree:
+    """Unit tests for IntervalTree"""
+
+    param_test_query = [
+        (0, ["a", "e"]),
+        (5, ["a", "b", "c"]),
+        (11, ["c"]),
+        (25, ["c", "d"]),
+        (-3, []),
+        (10 ** 9, ["c"]),
+    ]
+
+    @pytest.mark.parametrize("point, res", param_test_query)
+    def test_query(self, point, res):
+        """Unit test for query"""
+
+        assert sorted(IntervalTree(INTERVALS).query(point)) == res
+
+    def test_query_empty(self):
+        """Unit test for query of empty tree"""
+
+        assert IntervalTree([]).query(0) == []
+
+
+class TestSelectionIndex:
+    """Unit tests for SelectionIndex"""
+
+    param_test_find = [
+        ((0, 0), [3, 7]),
+        ((2, 3), [0, 1, 4]),
+        ((2, 7), [1, 4, 7]),
+        ((7, 1), [1, 5]),
+        ((9, 5), [2, 7]),
+        ((100, 0), [5, 7]),
+        ((100, 100), []),
+    ]
+
+    @pytest.mark.parametrize("cell, res", param_test_find)
+    def test_find(self, cell, res):
+        """Unit test for find"""
+
+        assert SelectionIndex(SELECTIONS).find(cell) == res
+
+    def test_find_random(self):
+        """Compares find with Selection.__contains__ for random selections"""
+
+        rand = Random(42)
+
+        def bound():
+            return rand.choice([None, rand.randrange(20)])
+
+        selections = []
+        for _ in range(50):
+            blocks = [((bound(), bound()), (bound(), bound()))
+                      for _ in range(rand.randrange(3))]
+            selections.append(Selection(
+                [top_left for top_left, _ in blocks],
+                [bottom_right for _, bottom_right in blocks],
+                rand.sample(range(20), rand.randrange(2)),
+                rand.sample(range(20), rand.randrange(2)),
+                [(rand.randrange(20), rand.randrange(20))
+                 for _ in range(rand.randrange(3))]))
+
+        index = SelectionIndex(selections)
+
+        for row in range(22):
+            for column in range(22):
+                cell = row, column
+                assert index.find(cell) == \
+                    [i for i, selection in enumerate(selections)
+                     if cell in selection]
+
+
+class TestRectangleCover:
+    """Unit tests for RectangleCover"""
+
+    def setup_method(self):
+        """Creates RectangleCover with small and large rectangles"""
+
+        self.cover = RectangleCover()
+        self.cover.add([(10, 10, 20, 20), (1000, 0, 1000, inf),
+                        (0, 0, 500, 500)])
+
+    param_test_covers = [
+        ([(12, 12, 13, 13)], True),
+        ([(12, 12, 13, 13), (1000, 5, 1000, 9)], True),
+        ([(400, 400, 501, 400)], False),
+        ([(1000, 5, 1001, 9)], False),
+        ([(0, 0, inf, 0)], False),
+        ([], True),
+    ]
+
+    @pytest.mark.parametrize("rectangles, res", param_test_covers)
+    def test_covers(self, rectangles, res):
+        """Unit test for covers"""
+
+        assert self.cover.covers(rectangles) == res
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+test_watchdog
+=============
+
+Unit tests for watchdog.py
+
+"""
+
+from time import perf_counter, sleep
+
+import pytest
+
+from ..watchdog import EvaluationTimeout, RecalculationTimeout, Watchdog
+
+
+def busy_wait(duration: float):
+    """Executes bytecode for duration seconds"""
+
+    end = perf_counter() + duration
+    while perf_counter() < end:
+        pass
+
+
+class TestWatchdog:
+    """Unit tests for Watchdog"""
+
+    def setup_method(self, method):
+        """Creates Watchdog"""
+
+        self.watchdog = Watchdog()
+
+    def test_arm(self):
+        """Unit test for arm with expiring deadline"""
+
+        start = perf_counter()
+        previous = self.watchdog.arm(0.05)
+
+        with pytest.raises(EvaluationTimeout):
+            try:
+                busy_wait(5)
+            finally:
+                self.watchdog.disarm(previous)
+
+        assert 0.05 <= perf_counter() - start < 1
+
+    def test_disarm(self):
+        """Unit test for disarm before the deadline expires"""
+
+        for _ in range(1000):
+            self.watchdog.disarm(self.watchdog.arm(0.05))
+
+        busy_wait(0.1)
+
+    def test_arm_no_timeout(self):
+        """Unit test for arm without timeout"""
+
+        previous = self.watchdog.arm(0)
+        busy_wait(0.05)
+        self.watchdog.disarm(previous)
+
+        assert previous is None
+
+    def test_arm_nested(self):
+        """Unit test for nested deadlines, inner is bound by outer"""
+
+        outer = self.watchdog.arm(0.05)
+        try:
+            inner = self.watchdog.arm(10)
+            with pytest.raises(EvaluationTimeout):
+                try:
+                    busy_wait(5)
+                finally:
+                    self.watchdog.disarm(inner)
+        finally:
+            self.watchdog.disarm(outer)
+
+    def test_budget(self):
+        """Unit test for budget"""
+
+        assert not self.watchdog.budget_exhausted()
+
+        with self.watchdog.budget(0.05):
+            assert not self.watchdog.budget_exhausted()
+            previous = self.watchdog.arm(0)
+            with pytest.raises(RecalculationTimeout):
+                try:
+                    busy_wait(5)
+                finally:
+                    self.watchdog.disarm(previous)
+
+            with pytest.raises(RecalculationTimeout):
+                self.watchdog.arm(1)
+
+            assert self.watchdog.budget_exhausted()
+
+        assert not self.watchdog.budget_exhausted()
+        self.watchdog.disarm(self.watchdog.arm(1))
+
+    def test_sleeping_watchdog(self):
+        """Unit test for deadline that is earlier than the watchdog wakeup"""
+
+        previous = self.watchdog.arm(10)
+        sleep(0.01)  # Watchdog sleeps until the first deadline
+        with self.watchdog.budget(0.05):
+            inner = self.watchdog.arm(0)
+            with pytest.raises(RecalculationTimeout):
+                try:
+                    busy_wait(5)
+                finally:
+                    self.watchdog.disarm(inner)
+        self.watchdog.disarm(previous)
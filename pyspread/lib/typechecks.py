@@ -27,12 +27,17 @@ Functions for checking types and type likeness
  * :func:`is_stringlike`
  * :func:`is_svg`
  * :func:`check_shape_validity`
+ * :func:`get_compact_dtype`
 
 """
 
 from io import BytesIO
 import xml.etree.ElementTree as ET
-from typing import Tuple
+from typing import Any, Sequence, Tuple, Union
+
+import numpy
+
+_INT64 = numpy.iinfo(numpy.int64)
 
 
 def is_stringlike(obj: object) -> bool:
@@ -97,3 +102,43 @@ def check_shape_validity(shape: Tuple[int, int, int],
         raise ValueError("Grid shape {} exceeds {}.".format(shape, maxshape))
 
     return True
+
+
+def get_compact_dtype(values: Sequence[Any]) -> Union[type, None]:
+    """Returns compact numpy dtype that holds all values without conversion
+
+    Python integers are checked against the int64 range. Unsigned and
+    extended precision numpy types are not converted.
+
+    :param values: Values to be checked
+    :return: numpy.bool_, numpy.int64 or numpy.float64, None if values
+             contain other types or mix booleans, integers and floats
+
+    """
+
+    if not values:
+        return
+
+    dtypes = set()
+
+    for value_type in set(map(type, values)):
+        if issubclass(value_type, (bool, numpy.bool_)):
+            dtypes.add(numpy.bool_)
+        elif issubclass(value_type, (int, numpy.signedinteger)):
+            dtypes.add(numpy.int64)
+        elif issubclass(value_type, (float, numpy.float16, numpy.float32,
+                                     numpy.float64)):
+            dtypes.add(numpy.float64)
+        else:
+            return
+
+    if len(dtypes) != 1:
+        return
+
+    dtype = dtypes.pop()
+
+    if dtype is numpy.int64 \
+       and not _INT64.min <= min(values) <= max(values) <= _INT64.max:
+        return
+
+    return dtype
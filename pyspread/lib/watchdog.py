@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Evaluation timeouts
+
+A single watchdog thread supervises the deadlines of all threads that
+evaluate code. Arming a deadline costs neither a system call nor a signal
+handler, so that many short evaluations stay cheap. When a deadline
+expires, the watchdog raises an exception asynchronously in the evaluating
+thread. The exception is delivered when the thread executes its next
+Python bytecode. Unlike a SIGALRM signal, it cannot interrupt blocking C
+calls such as `time.sleep` or socket reads, which time out only after
+they return.
+
+**Provides**
+
+ * :class:`EvaluationTimeout` - Raised when a cell deadline expires
+ * :class:`RecalculationTimeout` - Raised when a recalculation budget is
+   exhausted
+ * :class:`Watchdog` - Enforces deadlines of evaluating threads
+
+"""
+
+from contextlib import contextmanager
+import ctypes
+from math import inf
+import threading
+from time import perf_counter
+from typing import Optional, Tuple, Type
+
+try:
+    _set_async_exc = ctypes.pythonapi.PyThreadState_SetAsyncExc
+except AttributeError:
+    # Python implementation without C API, e.g. PyPy
+    _set_async_exc = None
+
+
+class EvaluationTimeout(RuntimeError):
+    """Raised when a cell deadline expires"""
+
+    def __init__(self, *args):
+        super().__init__(*(args or ["Evaluation timeout"]))
+
+
+class RecalculationTimeout(EvaluationTimeout):
+    """Raised when a recalculation budget is exhausted"""
+
+    def __init__(self, *args):
+        super().__init__(*(args or ["Recalculation timeout"]))
+
+
+Deadline = Tuple[float, Type[EvaluationTimeout]]
+
+
+class Watchdog:
+    """Enforces deadlines of evaluating threads
+
+    Deadlines are armed and disarmed per thread and may be nested. A nested
+    deadline never expires later than the deadline that encloses it. A
+    budget limits the total time of all deadlines that are armed inside it.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._thread = None
+
+        # Armed deadline and recalculation budget of each thread
+        self._deadlines = {}
+        self._budgets = {}
+
+        # Threads, in which a timeout exception has been raised
+        self._fired = set()
+
+        # Time, until which the watchdog thread sleeps
+        self._wakeup = inf
+
+    def arm(self, timeout: float) -> Optional[Deadline]:
+        """Arms deadline of the current thread, returns previous deadline
+
+        The previous deadline has to be passed to :meth:`disarm`.
+
+        :param timeout: Timeout in seconds, 0 for no timeout
+
+        """
+
+        if _set_async_exc is None:
+            return
+
+        ident = threading.get_ident()
+        now = perf_counter()
+
+        with self._lock:
+            previous = self._deadlines.get(ident)
+
+            deadline = previous
+            budget = self._budgets.get(ident)
+            if budget is not None and (deadline is None or budget < deadline):
+                deadline = budget
+            if timeout and (deadline is None or now + timeout < deadline[0]):
+                deadline = now + timeout, EvaluationTimeout
+
+            if deadline is not None and deadline[0] <= now:
+                raise deadline[1]
+
+            self._set_deadline(ident, deadline)
+
+        return previous
+
+    def disarm(self, previous: Optional[Deadline]):
+        """Restores previous deadline of the current thread
+
+        A timeout exception that has been raised but not yet been delivered
+        is discarded.
+
+        :param previous: Deadline that has been returned by :meth:`arm`
+
+        """
+
+        if _set_async_exc is None:
+            return
+
+        ident = threading.get_ident()
+
+        with self._lock:
+            self._set_deadline(ident, previous)
+            if ident in self._fired:
+                self._fired.discard(ident)
+                _set_async_exc(ctypes.c_ulong(ident), None)
+
+    @contextmanager
+    def budget(self, timeout: float):
+        """Context manager that limits the time of all enclosed evaluations
+
+        :param timeout: Budget in seconds, 0 for no limit
+
+        """
+
+        ident = threading.get_ident()
+
+        with self._lock:
+            previous = self._budgets.get(ident)
+            if timeout:
+                budget = perf_counter() + timeout, RecalculationTimeout
+                if previous is None or budget < previous:
+                    self._budgets[ident] = budget
+        try:
+            yield
+        finally:
+            with self._lock:
+                if previous is None:
+                    self._budgets.pop(ident, None)
+                else:
+                    self._budgets[ident] = previous
+
+    def budget_exhausted(self) -> bool:
+        """True if the budget of the current thread has expired"""
+
+        with self._lock:
+            budget = self._budgets.get(threading.get_ident())
+
+        return budget is not None and budget[0] <= perf_counter()
+
+    def _set_deadline(self, ident: int, deadline: Optional[Deadline]):
+        """Sets deadline of thread ident, requires lock
+
+        :param ident: Thread identifier
+        :param deadline: Deadline time and exception, None for no deadline
+
+        """
+
+        if deadline is None:
+            self._deadlines.pop(ident, None)
+            return
+
+        self._deadlines[ident] = deadline
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True,
+                                            name="pyspread watchdog")
+            self._thread.start()
+
+        if deadline[0] < self._wakeup:
+            # The watchdog sleeps too long and has to be woken up
+            self._event.set()
+
+    def _run(self):
+        """Watchdog thread main loop"""
+
+        while True:
+            self._event.clear()
+            now = perf_counter()
+
+            with self._lock:
+                for ident, (time, exception) in list(self._deadlines.items()):
+                    if time <= now:
+                        del self._deadlines[ident]
+                        self._fired.add(ident)
+                        _set_async_exc(ctypes.c_ulong(ident),
+                                       ctypes.py_object(exception))
+
+                self._wakeup = min((time for time, _ in
+                                    self._deadlines.values()), default=inf)
+                wakeup = self._wakeup
+
+            self._event.wait(None if wakeup == inf else wakeup - now)
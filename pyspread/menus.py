@@ -192,8 +192,21 @@ class ViewMenu(QMenu):
         self.addAction(actions.zoom_1)
         self.addSeparator()
         self.addAction(actions.refresh_cells)
+        self.addAction(actions.recalculate_parallel)
         self.addAction(actions.toggle_periodic_updates)
         self.addSeparator()
+        self.addAction(actions.toggle_manual_calculation)
+        self.addAction(actions.recalculate)
+        self.addAction(actions.recalculate_table)
+        self.addAction(actions.recalculate_selection)
+        self.addSeparator()
+        self.addAction(actions.toggle_kernel)
+        self.addAction(actions.restart_kernel)
+        self.addSeparator()
+        self.addAction(actions.toggle_profiler)
+        self.addAction(actions.hot_cells)
+        self.addAction(actions.show_heat_map)
+        self.addSeparator()
         self.addAction(actions.show_frozen)
 
 
@@ -211,6 +224,7 @@ class FormatMenu(QMenu):
 
         self.addAction(actions.copy_format)
         self.addAction(actions.paste_format)
+        self.addAction(actions.compact_format)
         self.addSeparator()
         self.addAction(actions.font)
         self.addAction(actions.bold)
@@ -227,6 +241,7 @@ class FormatMenu(QMenu):
             self.renderer_submenu.addAction(actions.matplotlib)
 
         self.addAction(actions.freeze_cell)
+        self.addAction(actions.refresh_interval)
         self.addAction(actions.lock_cell)
         self.addAction(actions.button_cell)
 
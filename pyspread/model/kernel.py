@@ -0,0 +1,577 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Out of process evaluation kernel
+
+In kernel mode, cells are evaluated in a separate kernel process that owns
+the namespace of the macros and cell globals as well as the result cache.
+Long running cells then do not block the GUI and crashes in native code do
+not take down the application. Recalculation is canceled by restarting the
+kernel.
+
+The :class:`KernelClient` mirrors the code of a
+:class:`~model.model.CodeArray` into the kernel and fetches results in
+batches over a pipe. Until a result has arrived, the cell shows a
+:class:`~lib.awaitables.PendingResult` or its previous result. Results that
+cannot be pickled are transferred as their string representation. Macros,
+frozen cells and button cells are executed in the kernel, too.
+
+**Provides**
+
+ * :func:`kernel_main` - Message loop of the kernel process
+ * :class:`KernelClient` - Evaluates cells of a code array in a kernel
+
+"""
+
+from ast import literal_eval
+from collections import deque
+import multiprocessing
+from multiprocessing.connection import Connection
+import pickle
+from time import monotonic
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+try:
+    from pyspread.settings import Settings
+    from pyspread.lib.awaitables import PendingResult
+    from pyspread.model.model import CodeArray
+except ImportError:
+    from settings import Settings
+    from lib.awaitables import PendingResult
+    from model.model import CodeArray
+
+# Names of settings that are passed to the kernel
+KERNEL_SETTINGS = "timeout", "recalculation_timeout", "result_cache_size"
+
+# Waiting time of the idle kernel before it applies results of awaitables
+POLL_INTERVAL = 0.05
+
+
+def _dumps(result: Any) -> bytes:
+    """Pickles result, unpicklable results are pickled as string
+
+    :param result: Cell result to be pickled
+
+    """
+
+    if isinstance(result, PendingResult):
+        result = PendingResult()
+
+    try:
+        return pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        try:
+            text = str(result)
+        except Exception as err:
+            text = str(err)
+        return pickle.dumps(text, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load(state: Tuple, settings: Settings) -> Tuple[CodeArray, Tuple]:
+    """Returns new code array and macro output for state
+
+    :param state: Shape, code, cell attributes, macros and safe mode flag
+    :param settings: Kernel settings
+
+    """
+
+    shape, code, attributes, macros, safe_mode = state
+
+    code_array = CodeArray(shape, settings)
+    code_array.safe_mode = safe_mode
+    code_array.macros = macros
+    code_array.dict_grid.update(code)
+    for attribute in attributes:
+        code_array.cell_attributes.append(attribute)
+
+    code_array.clear_globals()
+
+    return code_array, code_array.execute_macros()
+
+
+def _set_code(code_array: CodeArray, key: Tuple[int, int, int],
+              code: Union[str, None]) -> List[Tuple[int, int, int]]:
+    """Changes cell code and returns keys of invalidated cells
+
+    :param code_array: Code array of the kernel
+    :param key: Key of changed cell
+    :param code: New cell code, None if the cell has been deleted
+
+    """
+
+    nodes = code_array.dependency_graph.get_dependents(key)
+
+    if code is None:
+        if key in code_array.dict_grid:
+            code_array.pop(key)
+    else:
+        code_array[key] = code
+
+    return [key] + [node for node in nodes if isinstance(node, tuple)]
+
+
+def _refresh(code_array: CodeArray,
+             keys: Union[List[Tuple[int, int, int]], None]
+             ) -> List[Tuple[int, int, int]]:
+    """Refreshes frozen and volatile cells, returns keys of invalidated cells
+
+    :param code_array: Code array of the kernel
+    :param keys: Keys of cells to be refreshed, None: all cells
+
+    """
+
+    if keys is None:
+        frozen_keys = [literal_eval(repr_key)
+                       for repr_key in code_array.frozen_cache]
+        volatile_keys = set(code_array.volatile_keys)
+    else:
+        keys = [tuple(key) for key in keys]
+        frozen_keys = [key for key in keys
+                       if code_array.cell_attributes[key].frozen]
+        volatile_keys = code_array.volatile_keys.intersection(keys)
+
+    nodes = code_array.dependency_graph.get_dependents(*frozen_keys,
+                                                       *volatile_keys)
+
+    for key in frozen_keys:
+        code_array.frozen_cache[repr(key)] = \
+            code_array._eval_cell(key, code_array(key))
+        code_array._invalidate(key)
+
+    code_array.invalidate_volatile(keys)
+
+    return frozen_keys + sorted(volatile_keys) \
+        + [node for node in nodes if isinstance(node, tuple)]
+
+
+def _press_button(code_array: CodeArray, key: Tuple[int, int, int]):
+    """Executes code of button cell and discards all results
+
+    :param code_array: Code array of the kernel
+    :param key: Key of button cell
+
+    """
+
+    code_array.frozen_cache[repr(key)] = \
+        code_array._eval_cell(key, code_array(key))
+    code_array.reset_results()
+
+
+def kernel_main(connection: Connection, settings_values: Dict[str, Any]):
+    """Message loop of the kernel process
+
+    Requests are tuples of a command and its arguments. Each request is
+    answered by a ``("reply", value)`` message in order. Keys of cells that
+    are invalidated because awaitables are done are sent as
+    ``("invalidate", keys)`` messages in between.
+
+    :param connection: Kernel end of the pipe
+    :param settings_values: Maps names from KERNEL_SETTINGS to values
+
+    """
+
+    settings = Settings(None)
+    for name, value in settings_values.items():
+        setattr(settings, name, value)
+
+    code_array = None
+
+    while True:
+        if not connection.poll(POLL_INTERVAL):
+            if code_array is not None:
+                keys = code_array.apply_awaitable_results()
+                if keys:
+                    connection.send(("invalidate", keys))
+            continue
+
+        try:
+            command, *args = connection.recv()
+        except EOFError:
+            return
+
+        if command == "load":
+            code_array, reply = _load(args[0], settings)
+        elif command == "set":
+            reply = _set_code(code_array, *args)
+        elif command == "get":
+            reply = [_dumps(code_array[key]) for key in args[0]]
+        elif command == "refresh":
+            reply = _refresh(code_array, *args)
+        elif command == "press":
+            reply = _press_button(code_array, *args)
+        elif command == "stop":
+            return
+        else:
+            raise ValueError("Unknown kernel command {}".format(command))
+
+        connection.send(("reply", reply))
+
+
+class KernelClient:
+    """Evaluates cells of a code array in a kernel process
+
+    Results of single cells are fetched asynchronously. Missing results are
+    requested in batches by :meth:`poll`, which the GUI calls periodically.
+    Macro output is passed to :attr:`macro_output_callback`. Results of
+    slices are fetched synchronously, waiting at most `settings.timeout`.
+
+    """
+
+    def __init__(self, code_array: CodeArray):
+        """
+        :param code_array: Code array, whose cells are evaluated
+
+        """
+
+        self.code_array = code_array
+
+        self.results = {}
+        """Maps cell key to last result from the kernel"""
+
+        self.process = None
+        self.connection = None
+
+        # Keys of results that are outdated
+        self._stale = set()
+
+        # Keys of results that have been requested but not received
+        self._requested = set()
+
+        # Keys of results that are requested with the next batch
+        self._batch = []
+
+        # Handlers of expected replies in request order
+        self._reply_handlers = deque()
+
+        # Keys of cells that need repainting
+        self._changed_keys = []
+
+        self.macro_output_callback = None
+        """Called with result and error string of macro execution"""
+
+    @property
+    def running(self) -> bool:
+        """True if the kernel process is alive"""
+
+        return self.process is not None and self.process.is_alive()
+
+    def start(self):
+        """Starts kernel process and loads code array into it
+
+        The kernel process is spawned rather than forked because the calling
+        process usually runs a Qt event loop.
+
+        """
+
+        settings = self.code_array.settings
+        settings_values = {name: getattr(settings, name)
+                           for name in KERNEL_SETTINGS}
+
+        context = multiprocessing.get_context("spawn")
+        self.connection, kernel_connection = context.Pipe()
+        self.process = context.Process(target=kernel_main,
+                                       args=(kernel_connection,
+                                             settings_values),
+                                       name="pyspread kernel", daemon=True)
+        self.process.start()
+        kernel_connection.close()
+
+        self.reload()
+
+    def stop(self):
+        """Terminates kernel process, pending requests are discarded"""
+
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.connection.close()
+
+        self.process = None
+        self.connection = None
+
+        self._changed_keys.extend(self.results)
+
+        self.results.clear()
+        self._stale.clear()
+        self._requested.clear()
+        self._batch.clear()
+        self._reply_handlers.clear()
+
+    def restart(self):
+        """Restarts kernel, e.g. for canceling a long running evaluation"""
+
+        self.stop()
+        self.start()
+
+    def _get_state(self) -> Tuple:
+        """Returns code array state for the kernel"""
+
+        code_array = self.code_array
+
+        return (code_array.shape, dict(code_array.dict_grid),
+                list(code_array.cell_attributes), code_array.macros,
+                code_array.safe_mode)
+
+    def _on_macro_output(self, macro_output: Tuple[str, str]):
+        """Passes macro output to macro_output_callback
+
+        :param macro_output: Result and error string of macro execution
+
+        """
+
+        if self.macro_output_callback is not None:
+            self.macro_output_callback(*macro_output)
+
+    def _invalidate_all(self, reply: Any = None):
+        """Marks all results as outdated
+
+        :param reply: Reply of the kernel, which is ignored
+
+        """
+
+        self._stale.update(self.results)
+        self._changed_keys.extend(self.results)
+
+    def _on_load(self, macro_output: Tuple[str, str]):
+        """Marks all results as outdated after the kernel has been loaded
+
+        :param macro_output: Result and error string of macro execution
+
+        """
+
+        self._invalidate_all()
+        self._on_macro_output(macro_output)
+
+    def _on_reload(self, macro_output: Tuple[str, str]):
+        """Discards all results after the kernel has been reloaded
+
+        :param macro_output: Result and error string of macro execution
+
+        """
+
+        self._changed_keys.extend(self.results)
+        self.results.clear()
+        self._stale.clear()
+
+        self._on_macro_output(macro_output)
+
+    def reload(self):
+        """Loads the code array into the kernel and executes the macros
+
+        Results are discarded because cell keys may have changed, e.g. after
+        rows have been inserted.
+
+        """
+
+        self._send(("load", self._get_state()), self._on_reload)
+
+    def execute_macros(self) -> Tuple[str, str]:
+        """Reloads kernel without waiting, returns preliminary macro output
+
+        The macro output is passed to :attr:`macro_output_callback` when the
+        macros have been executed. Previous results are shown until they are
+        updated.
+
+        """
+
+        try:
+            self._send(("load", self._get_state()), self._on_load)
+        except (EOFError, OSError):
+            self.restart()
+
+        return "Executing macros in kernel process...", ""
+
+    def refresh(self, keys: List[Tuple[int, int, int]] = None):
+        """Refreshes frozen and volatile cells in the kernel
+
+        :param keys: Keys of cells to be refreshed, None: all cells
+
+        """
+
+        self._send(("refresh", keys), self._invalidate)
+
+    def press_button(self, key: Tuple[int, int, int]):
+        """Executes code of button cell in the kernel
+
+        All results are outdated afterwards.
+
+        :param key: Key of button cell
+
+        """
+
+        self._send(("press", tuple(key)), self._invalidate_all)
+
+    def set_code(self, key: Tuple[int, int, int]):
+        """Sends changed code of cell to the kernel
+
+        :param key: Key of cell with changed code
+
+        """
+
+        key = tuple(key)
+
+        if key in self.results:
+            self._stale.add(key)
+
+        self._send(("set", key, self.code_array(key)), self._invalidate)
+
+    def _invalidate(self, keys: List[Tuple[int, int, int]]):
+        """Marks results of keys as outdated
+
+        :param keys: Keys of cells with outdated results
+
+        """
+
+        self._stale.update(key for key in keys if key in self.results)
+        self._changed_keys.extend(keys)
+
+    def _on_results(self, keys: List[Tuple[int, int, int]],
+                    data: List[bytes]):
+        """Stores results that have been received
+
+        :param keys: Keys of requested cells
+        :param data: Pickled results
+
+        """
+
+        for key, result in zip(keys, data):
+            self.results[key] = pickle.loads(result)
+            self._requested.discard(key)
+            self._stale.discard(key)
+
+        self._changed_keys.extend(keys)
+
+    def __getitem__(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                     Union[int, slice]]) -> Any:
+        """Returns result from the kernel
+
+        Single cell results are returned immediately. If the result has not
+        yet been received then it is requested and a previous result or a
+        :class:`~lib.awaitables.PendingResult` is returned.
+
+        :param key: Cell key or slice key
+
+        """
+
+        if any(isinstance(ele, slice) for ele in key):
+            timeout = self.code_array.settings.timeout / 1000
+            try:
+                data = self._call(("get", [key]), timeout or None)
+            except RuntimeError as err:
+                return err
+            return pickle.loads(data[0])
+
+        key = tuple(key)
+
+        # Empty cells are not requested
+        if key not in self.code_array.dict_grid:
+            return
+
+        if key not in self._requested \
+           and (key not in self.results or key in self._stale):
+            self._requested.add(key)
+            self._batch.append(key)
+
+        try:
+            return self.results[key]
+        except KeyError:
+            return PendingResult()
+
+    def _send(self, message: Tuple, handler: Callable[[Any], None]):
+        """Sends request to kernel, requested results are sent before
+
+        :param message: Command tuple
+        :param handler: Called with the reply
+
+        """
+
+        if self._batch and message[0] != "get":
+            self._flush()
+
+        self.connection.send(message)
+        self._reply_handlers.append(handler)
+
+    def _flush(self):
+        """Requests batch of missing results"""
+
+        keys = self._batch
+        self._batch = []
+
+        self._send(("get", keys),
+                   lambda data: self._on_results(keys, data))
+
+    def _receive(self):
+        """Receives and handles one message from the kernel"""
+
+        kind, value = self.connection.recv()
+
+        if kind == "invalidate":
+            self._invalidate(value)
+        else:
+            self._reply_handlers.popleft()(value)
+
+    def _call(self, message: Tuple, timeout: float = None) -> Any:
+        """Sends request to kernel and waits for its reply
+
+        :param message: Command tuple
+        :param timeout: Maximum waiting time in seconds, None: no limit
+
+        """
+
+        reply = []
+
+        try:
+            self._send(message, reply.append)
+            end = None if timeout is None else monotonic() + timeout
+            while not reply:
+                if end is not None and \
+                   not self.connection.poll(max(0, end - monotonic())):
+                    # The reply is discarded when it arrives
+                    msg = "Timeout after {} ms."
+                    raise RuntimeError(msg.format(int(timeout * 1000)))
+                self._receive()
+        except (EOFError, OSError):
+            self.restart()
+            raise RuntimeError("Kernel process has terminated")
+
+        return reply[0]
+
+    def poll(self) -> List[Tuple[int, int, int]]:
+        """Requests missing results, handles replies without blocking
+
+        A kernel process that has died, e.g. from a crash in native code, is
+        restarted. Returns keys of cells that need repainting.
+
+        """
+
+        try:
+            if self._batch:
+                self._flush()
+            while self.connection.poll():
+                self._receive()
+        except (EOFError, OSError):
+            self.restart()
+
+        changed_keys = self._changed_keys
+        self._changed_keys = []
+
+        return changed_keys
@@ -32,6 +32,8 @@ into the following layers.
 **Provides**
 
  * :class:`DefaultCellAttributeDict`
+ * :class:`SharedCellAttributeDict`
+ * :class:`ChainNamespace`
  * :class:`CellAttribute`
  * :class:`CellAttributes`
  * :class:`KeyValueStore`
@@ -48,21 +50,27 @@ from builtins import zip
 from builtins import range
 
 import ast
+import asyncio
 import base64
 import bz2
-from collections import defaultdict
+from collections import defaultdict, deque
+from contextlib import contextmanager
 from copy import copy
 import datetime
 from importlib import reload
-from inspect import isgenerator
+from inspect import isawaitable, isgenerator
 import io
 from itertools import product
+from pathlib import Path
 import re
-import signal
 import sys
+import threading
 from traceback import print_exception
+from types import CodeType
+from weakref import WeakValueDictionary
 from typing import (
-        Any, Dict, Iterable, List, NamedTuple, Sequence, Tuple, Union)
+        Any, Awaitable, Dict, Iterable, List, NamedTuple, Sequence, Set, Tuple,
+        Union)
 
 import numpy
 from PyQt5.QtGui import QImage, QPixmap
@@ -73,18 +81,45 @@ except ImportError:
 
 try:
     from pyspread.settings import Settings
+    from pyspread.lib.aggregation import (
+        Aggregate, RangeFunction, RANGE_FUNCTIONS, aggregate_values,
+        combine_aggregates)
     from pyspread.lib.attrdict import AttrDict
+    from pyspread.lib.awaitables import AwaitableRunner, PendingResult
+    from pyspread.lib.memoization import Memoizer
     import pyspread.lib.charts as charts
+    from pyspread.lib.dependency_graph import (
+        DependencyGraph, get_cell_access_names, get_code_references,
+        get_literal, get_volatile_names, resolve_index, volatile)
+    from pyspread.lib.lru_dict import LRUDict, SizedLRUDict
     from pyspread.lib.exception_handling import get_user_codeframe
-    from pyspread.lib.typechecks import is_stringlike
+    from pyspread.lib.profiler import CellProfiler
+    from pyspread.lib.typechecks import get_compact_dtype, is_stringlike
     from pyspread.lib.selection import Selection
+    from pyspread.lib.spatial_index import (
+        IntervalTree, RectangleCover, SelectionIndex, get_rectangles)
+    from pyspread.lib.watchdog import (Watchdog, EvaluationTimeout,
+                                       RecalculationTimeout)
 except ImportError:
     from settings import Settings
+    from lib.aggregation import (
+        Aggregate, RangeFunction, RANGE_FUNCTIONS, aggregate_values,
+        combine_aggregates)
     from lib.attrdict import AttrDict
+    from lib.awaitables import AwaitableRunner, PendingResult
+    from lib.memoization import Memoizer
     import lib.charts as charts
+    from lib.dependency_graph import (
+        DependencyGraph, get_cell_access_names, get_code_references,
+        get_literal, get_volatile_names, resolve_index, volatile)
+    from lib.lru_dict import LRUDict, SizedLRUDict
     from lib.exception_handling import get_user_codeframe
-    from lib.typechecks import is_stringlike
+    from lib.profiler import CellProfiler
+    from lib.typechecks import get_compact_dtype, is_stringlike
     from lib.selection import Selection
+    from lib.spatial_index import (
+        IntervalTree, RectangleCover, SelectionIndex, get_rectangles)
+    from lib.watchdog import Watchdog, EvaluationTimeout, RecalculationTimeout
 
 
 class DefaultCellAttributeDict(AttrDict):
@@ -110,12 +145,97 @@ class DefaultCellAttributeDict(AttrDict):
         self.vertical_align = "align_top"
         self.justification = "justify_left"
         self.frozen = False
+        self.refresh_interval = None
         self.merge_area = None
         self.renderer = "text"
         self.button_cell = False
         self.panel_cell = False
 
 
+class SharedCellAttributeDict(DefaultCellAttributeDict):
+    """Immutable resolved cell attributes that cells with equal formats share
+
+    Instances are created by :meth:`CellAttributes.__getitem__` only. They
+    are hashed by their items so that objects that are derived from a
+    format, e.g. fonts, can be cached per format. Instances with unhashable
+    values are unhashable. Copies are mutable `AttrDict` instances.
+
+    """
+
+    def __init__(self, attr_dict: DefaultCellAttributeDict):
+        """
+        :param attr_dict: Resolved cell attributes
+
+        """
+
+        # Items are not attributes so that the hash can be stored
+        dict.__init__(self, attr_dict)
+
+        try:
+            items_hash = hash(frozenset(self.items()))
+        except TypeError:
+            items_hash = None
+        object.__setattr__(self, "_hash", items_hash)
+
+    def __getattr__(self, name: str):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("Resolved cell attributes are shared and immutable")
+
+    __setitem__ = __delitem__ = __setattr__ = __delattr__ = __ior__ = \
+        clear = pop = popitem = setdefault = update = _immutable
+
+    def __hash__(self) -> int:
+        if self._hash is None:
+            raise TypeError("Cell attributes with unhashable values")
+        return self._hash
+
+    def __reduce__(self):
+        return AttrDict, (dict(self),)
+
+
+class ChainNamespace(dict):
+    """Namespace that looks up missing names in a parent namespace
+
+    Cell code is executed in a small `ChainNamespace` on top of the globals
+    so that the globals are neither copied nor written back for each cell.
+
+    """
+
+    def __init__(self, parent: dict, *args, **kwargs):
+        """
+        :param parent: Namespace for looking up missing names
+
+        """
+
+        super().__init__(*args, **kwargs)
+
+        self.parent = parent
+
+        # Names that are meant to shadow the parent namespace
+        self.layer_names = frozenset(self)
+
+    def __missing__(self, name: str) -> Any:
+        """Returns value from parent namespace
+
+        :param name: Name that is not present in self
+
+        """
+
+        return self.parent[name]
+
+    def commit(self):
+        """Writes names that have been assigned after creation to parent"""
+
+        for name, value in self.items():
+            if name not in self.layer_names and name != "__builtins__":
+                self.parent[name] = value
+
+
 class CellAttribute(NamedTuple):
     """Single cell attribute"""
 
@@ -140,9 +260,36 @@ class CellAttributes(list):
 
     """
 
+    # Number of cell attributes, above which files are compacted on loading
+    compaction_threshold = 10000
+
+    # Maps items of resolved cell attributes to their shared instance
+    # Shared by all instances because the resolved cell attributes are
+    # immutable
+    _shared_attr_dicts = WeakValueDictionary()
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+        # Guards layers and caches, which e.g. frozen cell refreshes read
+        # from worker threads while commands change them
+        self._lock = threading.RLock()
+
+        # Maps table to dicts that map row to dicts that map column to the
+        # resolved attribute dict of the cell, see _invalidate_caches
+        self._attr_cache = {}
+
+        # Maps table to selection, attr_dict tuples of its layers in order
+        self._table_cache = {}
+
+        # Maps table to its _table_cache list, the SelectionIndex of the list
+        # and a dict that maps indices of the layers that cover a cell to
+        # the resolved attributes of the cell
+        self._index_cache = {}
+
+        # Maps table to IntervalTree of its merge areas, see _get_merge_index
+        self._merge_index_cache = {}
+
         self.__add__ = None
         self.__delattr__ = None
         self.__delitem__ = None
@@ -157,13 +304,64 @@ class CellAttributes(list):
         self.reverse = None
         self.sort = None
 
-    # Cache for __getattr__ maps key to tuple of len and attr_dict
+    def __reduce__(self):
+        """Copies and pickles have caches of their own"""
+
+        return CellAttributes, (list(self),)
+
+    def _invalidate_caches(self, cell_attribute: CellAttribute):
+        """Removes cached attributes of the cells that a layer may cover
+
+        :param cell_attribute: Cell attribute that is added or removed
+
+        """
+
+        selection, table, attr = cell_attribute
+
+        self._index_cache.pop(table, None)
+        if "merge_area" in attr:
+            self._merge_index_cache.pop(table, None)
+
+        try:
+            table_attr_cache = self._attr_cache[table]
+        except KeyError:
+            return
+
+        # Only cached cells in the rectangles of the selection are visited
+        for top, left, bottom, right in get_rectangles(selection):
+            for row in self._get_keys_between(table_attr_cache, top, bottom):
+                row_attr_cache = table_attr_cache[row]
+                for col in self._get_keys_between(row_attr_cache,
+                                                  left, right):
+                    del row_attr_cache[col]
+                if not row_attr_cache:
+                    del table_attr_cache[row]
+
+    @staticmethod
+    def _get_keys_between(mapping: dict, start: int, end: float) -> List[int]:
+        """Returns integer keys of mapping from start to end inclusively
+
+        Visits the shorter of the interval and the keys of mapping.
+
+        :param mapping: Dict with integer keys
+        :param start: First key of the interval
+        :param end: Last key of the interval, may be `inf`
+
+        """
+
+        if end - start < len(mapping):
+            return [key for key in range(start, int(end) + 1)
+                    if key in mapping]
+
+        return [key for key in mapping if start <= key <= end]
+
+    def _is_table_cache_valid(self) -> bool:
+        """True if the table cache contains all cell attributes"""
 
-    _attr_cache = AttrDict()
-    _table_cache = {}
+        return len(self) == self._len_table_cache()
 
     def append(self, cell_attribute: CellAttribute):
-        """append that clears caches
+        """append that updates caches
 
         :param cell_attribute: Cell attribute to be appended
 
@@ -174,23 +372,101 @@ class CellAttributes(list):
             raise Warning(msg)
             return
 
-        # We need to clean up merge areas
+        with self._lock:
+            # We need to clean up merge areas
+            selection, table, attr = cell_attribute
+            if "merge_area" in attr:
+                for i, ele in enumerate(reversed(self)):
+                    if ele[0] == selection and ele[1] == table \
+                       and "merge_area" in ele[2]:
+                        try:
+                            self.pop(-1 - i)
+                        except IndexError:
+                            pass
+                if attr["merge_area"] is not None:
+                    self._append(cell_attribute)
+            else:
+                self._append(cell_attribute)
+
+    def _append(self, cell_attribute: CellAttribute):
+        """Appends cell attribute and updates caches
+
+        :param cell_attribute: Cell attribute to be appended
+
+        """
+
+        is_table_cache_valid = self._is_table_cache_valid()
+
+        super().append(cell_attribute)
+
         selection, table, attr = cell_attribute
-        if "merge_area" in attr:
-            for i, ele in enumerate(reversed(self)):
-                if ele[0] == selection and ele[1] == table \
-                   and "merge_area" in ele[2]:
-                    try:
-                        self.pop(-1 - i)
-                    except IndexError:
-                        pass
-            if attr["merge_area"] is not None:
-                super().append(cell_attribute)
-        else:
-            super().append(cell_attribute)
+        if is_table_cache_valid:
+            self._table_cache.setdefault(table, []).append((selection, attr))
 
-        self._attr_cache.clear()
-        self._table_cache.clear()
+        self._invalidate_caches(cell_attribute)
+
+    def extend(self, cell_attributes: Iterable[CellAttribute]):
+        """extend that resets caches
+
+        :param cell_attributes: Cell attributes to be appended
+
+        """
+
+        with self._lock:
+            super().extend(cell_attributes)
+
+            self._attr_cache.clear()
+            self._table_cache.clear()
+            self._merge_index_cache.clear()
+
+    def pop(self, index: int = -1) -> CellAttribute:
+        """pop that updates caches
+
+        :param index: Index of cell attribute to be removed
+
+        """
+
+        with self._lock:
+            is_last = index in (-1, len(self) - 1)
+            is_table_cache_valid = self._is_table_cache_valid()
+
+            cell_attribute = super().pop(index)
+
+            _, table, _ = cell_attribute
+            if is_last and is_table_cache_valid:
+                self._table_cache[table].pop()
+            else:
+                # Rebuilt on next access
+                self._table_cache.clear()
+
+            self._invalidate_caches(cell_attribute)
+
+            return cell_attribute
+
+    def __delitem__(self, index: Union[int, slice]):
+        """__delitem__ that resets caches
+
+        :param index: Index or slice of cell attributes to be deleted
+
+        """
+
+        with self._lock:
+            super().__delitem__(index)
+
+            self._attr_cache.clear()
+            self._table_cache.clear()
+            self._merge_index_cache.clear()
+
+    def clear(self):
+        """clear that resets caches"""
+
+        with self._lock:
+            super().clear()
+
+            self._attr_cache.clear()
+            self._table_cache.clear()
+            self._index_cache.clear()
+            self._merge_index_cache.clear()
 
     def __getitem__(self, key: Tuple[int, int, int]) -> AttrDict:
         """Returns attribute dict for a single key
@@ -203,37 +479,42 @@ class CellAttributes(list):
 #            raise Warning("slice in key {}".format(key))
 #            return
 
-        try:
-            cache_len, cache_dict = self._attr_cache[key]
+        row, col, tab = key
 
-            # Use cache result only if no new attrs have been defined
-            if cache_len == len(self):
-                return cache_dict
+        try:
+            return self._attr_cache[tab][row][col]
         except KeyError:
             pass
 
-        # Update table cache if it is outdated (e.g. when creating a new grid)
-        if len(self) != self._len_table_cache():
-            self._update_table_cache()
+        with self._lock:
+            # Update table cache if it is outdated, e.g. for a new grid
+            if not self._is_table_cache_valid():
+                self._update_table_cache()
 
-        row, col, tab = key
+            try:
+                table_cache = self._table_cache[tab]
+            except KeyError:
+                table_cache = []
 
-        result_dict = DefaultCellAttributeDict()
+            # Only layers that cover the cell are applied, in their order
+            index, resolved = self._get_selection_index(tab, table_cache)
+            layers = tuple(index.find((row, col)))
 
-        try:
-            for selection, attr_dict in self._table_cache[tab]:
-                if (row, col) in selection:
-                    result_dict.update(attr_dict)
-        except KeyError:
-            pass
+            try:
+                result_dict = resolved[layers]
+            except KeyError:
+                result_dict = DefaultCellAttributeDict()
+                for i in layers:
+                    result_dict.update(table_cache[i][1])
+                result_dict = resolved[layers] = self._share(result_dict)
 
-        # Upddate cache with current length and dict
-        self._attr_cache[key] = (len(self), result_dict)
+            self._attr_cache.setdefault(tab, {}).setdefault(row, {})[col] = \
+                result_dict
 
-        return result_dict
+            return result_dict
 
     def __setitem__(self, index: int, cell_attribute: CellAttribute):
-        """__setitem__ that clears caches
+        """__setitem__ that updates caches
 
         :param index: Index of item in self
         :param cell_attribute: Cell attribute to be set
@@ -245,10 +526,62 @@ class CellAttributes(list):
             raise Warning(msg)
             return
 
-        super().__setitem__(index, cell_attribute)
+        with self._lock:
+            old_cell_attribute = super().__getitem__(index)
 
-        self._attr_cache.clear()
-        self._table_cache.clear()
+            super().__setitem__(index, cell_attribute)
+
+            # Rebuilt on next access
+            self._table_cache.clear()
+
+            self._invalidate_caches(old_cell_attribute)
+            self._invalidate_caches(cell_attribute)
+
+    def _get_selection_index(self, table: int, table_cache: list
+                             ) -> Tuple[SelectionIndex, Dict[tuple, Any]]:
+        """Returns index of the selections of the table cache of a table
+
+        Also returns a dict that maps indices of covering layers to resolved
+        attributes, which is valid as long as the index is valid.
+
+        :param table: Table of the table cache
+        :param table_cache: Selection, attr_dict tuples from the table cache
+
+        """
+
+        try:
+            cached_table_cache, index, resolved = self._index_cache[table]
+            if cached_table_cache is table_cache:
+                return index, resolved
+        except KeyError:
+            pass
+
+        index = SelectionIndex(selection for selection, _ in table_cache)
+        resolved = {}
+        self._index_cache[table] = table_cache, index, resolved
+
+        return index, resolved
+
+    def _share(self, attr_dict: DefaultCellAttributeDict
+               ) -> SharedCellAttributeDict:
+        """Returns shared immutable instance with the items of attr_dict
+
+        :param attr_dict: Resolved cell attributes
+
+        """
+
+        try:
+            items = frozenset(attr_dict.items())
+        except TypeError:
+            # Unhashable values are not shared with other formats
+            return SharedCellAttributeDict(attr_dict)
+
+        try:
+            return self._shared_attr_dicts[items]
+        except KeyError:
+            shared = SharedCellAttributeDict(attr_dict)
+            self._shared_attr_dicts[items] = shared
+            return shared
 
     def _len_table_cache(self) -> int:
         """Returns the length of the table cache"""
@@ -264,6 +597,7 @@ class CellAttributes(list):
         """Clears and updates the table cache to be in sync with self"""
 
         self._table_cache.clear()
+        self._index_cache.clear()
         for sel, tab, val in self:
             try:
                 self._table_cache[tab].append((sel, val))
@@ -283,14 +617,42 @@ class CellAttributes(list):
 
         """
 
-        row, col, tab = key
+        with self._lock:
+            row, col, tab = key
+
+            # The first merge area that contains the cell merges it
+            merge_areas = [(i, top, left) for left, right, top, i
+                           in self._get_merge_index(tab).query(row)
+                           if left <= col <= right]
+            if merge_areas:
+                _, top, left = min(merge_areas)
+                return top, left, tab
+
+    def _get_merge_index(self, table: int) -> IntervalTree:
+        """Returns interval tree of the merge areas of a table
+
+        Intervals are the rows of the merge areas. Payloads are left, right,
+        top and the index of the cell attribute.
 
-        # Is cell merged
-        for selection, table, attr in self:
-            if tab == table and "merge_area" in attr:
+        :param table: Table of the merge areas
+
+        """
+
+        try:
+            return self._merge_index_cache[table]
+        except KeyError:
+            pass
+
+        merge_areas = []
+        for i, (_, __table, attr) in enumerate(self):
+            if __table == table and attr.get("merge_area") is not None:
                 top, left, bottom, right = attr["merge_area"]
-                if top <= row <= bottom and left <= col <= right:
-                    return top, left, tab
+                merge_areas.append((top, bottom, (left, right, top, i)))
+
+        merge_index = self._merge_index_cache[table] = \
+            IntervalTree(merge_areas)
+
+        return merge_index
 
     def for_table(self, table: int) -> list:
         """Return cell attributes for a given table
@@ -313,6 +675,101 @@ class CellAttributes(list):
 
         return table_cell_attributes
 
+    def compacted(self) -> list:
+        """Returns cell attributes with fewer layers and identical formatting
+
+        Return type should be `CellAttributes`, see :meth:`for_table`.
+
+        Attributes of a layer are removed if a later layer of the same table
+        sets them for all cells of the layer. Layers without attributes and
+        layers without cells are removed. Then consecutive layers of a table
+        are joined if they have equal selections or equal attributes.
+
+        Layers with merge areas are kept unchanged because merge areas are
+        resolved by the first instead of the last layer.
+
+        """
+
+        # Remove shadowed attributes, last layer first
+        covers = defaultdict(lambda: defaultdict(RectangleCover))
+        reversed_layers = []
+
+        for selection, table, attr in reversed(self):
+            if "merge_area" in attr:
+                reversed_layers.append(CellAttribute(selection, table, attr))
+                continue
+
+            rectangles = get_rectangles(selection)
+            table_covers = covers[table]
+
+            new_attr = AttrDict((key, value) for key, value in attr.items()
+                                if key not in table_covers
+                                or not table_covers[key].covers(rectangles))
+            for key in attr:
+                table_covers[key].add(rectangles)
+
+            if rectangles and new_attr:
+                reversed_layers.append(CellAttribute(selection, table,
+                                                     new_attr))
+
+        # Join consecutive layers of each table
+        layers = []
+        last_layer_index = {}  # Maps table to index of its last layer
+
+        for selection, table, attr in reversed(reversed_layers):
+            last_index = last_layer_index.get(table)
+
+            if last_index is not None and "merge_area" not in attr:
+                last_selection, _, last_attr = layers[last_index]
+
+                if last_selection == selection:
+                    joined_attr = AttrDict(last_attr)
+                    joined_attr.update(attr)
+                    layers[last_index] = \
+                        CellAttribute(selection, table, joined_attr)
+                    continue
+
+                if last_attr == attr:
+                    joined_selection = Selection(*(
+                        list(last_parameter) + list(parameter)
+                        for last_parameter, parameter
+                        in zip(last_selection.parameters,
+                               selection.parameters)))
+                    layers[last_index] = \
+                        CellAttribute(joined_selection, table, attr)
+                    continue
+
+            layers.append(CellAttribute(selection, table, attr))
+
+            if "merge_area" in attr:
+                # Layers are not joined across merge areas
+                last_layer_index[table] = None
+            else:
+                last_layer_index[table] = len(layers) - 1
+
+        return CellAttributes(layers)
+
+    def compact(self) -> int:
+        """Replaces cell attributes with :meth:`compacted` cell attributes
+
+        Returns the number of removed layers.
+
+        """
+
+        with self._lock:
+            compacted = self.compacted()
+            no_removed = len(self) - len(compacted)
+
+            # Formatting is unchanged so that the attribute cache stays valid
+            list.clear(self)
+            list.extend(self, compacted)
+
+            self._table_cache.clear()
+            self._index_cache.clear()
+            self._merge_index_cache.clear()
+
+            return no_removed
+
 # End of class CellAttributes
 
 
@@ -374,6 +831,10 @@ class DictGrid(KeyValueStore):
         self.row_heights = defaultdict(float)  # Keys have format (row, table)
         self.col_widths = defaultdict(float)  # Keys have format (col, table)
 
+        # Maps keys of constant cells to (code, value) tuples
+        # An entry is only valid while the cell code equals its code.
+        self.literals = {}
+
     def __getitem__(self, key: Tuple[int, int, int]) -> Any:
         """
         :param key: Cell key
@@ -394,6 +855,33 @@ class DictGrid(KeyValueStore):
 
         return
 
+    def update_literal(self, key: Tuple[int, int, int], code: str):
+        """Stores value of cell code if it is a constant, see get_literal
+
+        :param key: Cell key
+        :param code: Cell code
+
+        """
+
+        try:
+            self.literals[key] = code, get_literal(code)
+        except ValueError:
+            self.literals.pop(key, None)
+
+    def lookup_literal(self, key: Tuple[int, int, int]) -> Tuple[bool, Any]:
+        """Returns True and value if cell key is constant else False, None
+
+        :param key: Cell key
+
+        """
+
+        try:
+            code, value = self.literals[key]
+        except KeyError:
+            return False, None
+
+        return code == self.get(key), value
+
 # End of class DictGrid
 
 # -----------------------------------------------------------------------------
@@ -501,6 +989,7 @@ class DataArray:
 
         if "grid" in kwargs:
             self.dict_grid.clear()
+            self.dict_grid.literals.clear()
             self.dict_grid.update(kwargs["grid"])
 
         if "attributes" in kwargs:
@@ -695,6 +1184,7 @@ class DataArray:
                     self.cell_attributes.get_merging_cell(single_key)
                 if merging_cell is None or merging_cell == single_key:
                     self.dict_grid[single_key] = value
+                    self.dict_grid.update_literal(single_key, value)
             else:
                 # Value is empty --> delete cell
                 try:
@@ -754,6 +1244,8 @@ class DataArray:
 
         """
 
+        self.dict_grid.literals.pop(key, None)
+
         return self.dict_grid.pop(key)
 
     def get_last_filled_cell(self, table: int = None) -> Tuple[int, int, int]:
@@ -1205,19 +1697,96 @@ class CodeArray(DataArray):
 
     """
 
-    # Cache for results from __getitem__ calls
-    result_cache = {}
-
-    # Cache for frozen objects
-    frozen_cache = {}
+    # Cache for compiled cell code, maps code string to code objects
+    code_cache = LRUDict(maxsize=10000)
 
     # Custom font storage
     custom_fonts = {}
 
+    # Enforces cell timeouts and recalculation budgets of all threads
+    watchdog = Watchdog()
+
+    # Runs awaitables that cells return on a background event loop
+    awaitable_runner = AwaitableRunner()
+
+    # Rows of the blocks, for which range functions cache partial aggregates
+    aggregate_block_size = 16384
+
+    # Maximum number of results that the memo decorator caches
+    memo_size = 4096
+
     # Safe mode: If True then Whether pyspread is operating in safe_mode
     # In safe_mode, cells are not evaluated but its code is returned instead.
     safe_mode = False
 
+    def __init__(self, shape: Tuple[int, int, int], settings: Settings):
+        """
+        :param shape: Shape of the grid
+        :param settings: Pyspread settings
+
+        """
+
+        # Serializes evaluations and changes of the model across threads,
+        # e.g. of the GUI, of frozen cell refreshes and of awaitables
+        self.lock = threading.RLock()
+
+        super().__init__(shape, settings)
+
+        # Cache for frozen objects, keys are repr of cell keys
+        self.frozen_cache = {}
+
+        # Cache for results from __getitem__ calls, keys are graph nodes
+        self.result_cache = \
+            SizedLRUDict(maxbytes=settings.result_cache_size * 2**20)
+
+        # Dependencies of cached results on cells and global names
+        self.dependency_graph = DependencyGraph()
+
+        # Per thread stack of dependency graph nodes of the cells that are
+        # currently evaluated, see _evaluation_stack
+        self._evaluation_state = threading.local()
+
+        # Opt-in recording of cell evaluation times
+        self.profiler = CellProfiler()
+
+        # Aggregation functions of the cell namespace, e. g. SUM[:, 0, 0]
+        self.range_functions = {
+            name: RangeFunction(name, reduce, self.aggregate_range)
+            for name, reduce in RANGE_FUNCTIONS.items()}
+
+        # Memoizing decorator for macro functions, cleared with the macros
+        self.memo = Memoizer(self.memo_size)
+
+        # Futures of awaitables that cells have returned and that are running
+        self._pending_futures = set()
+
+        # Key, code, PendingResult tuples of awaitables that are done
+        self._done_awaitables = deque()
+
+        # Notified when an awaitable is done
+        self._awaitables_condition = threading.Condition()
+
+        # Called in the event loop thread when an awaitable is done,
+        # e. g. for notifying the GUI, see apply_awaitable_results
+        self.awaitable_done_callback = None
+
+        # Client of an evaluation kernel process, see model.kernel
+        # If set then cells are evaluated in the kernel process.
+        self.kernel = None
+
+        # Manual calculation mode: Changes only mark dependents as dirty
+        self._manual_calculation = False
+
+        # Dependency graph nodes with outdated results in manual calculation
+        self.dirty = set()
+
+        # Keys of evaluated cells, of which results change between
+        # evaluations, e. g. because they call random or datetime.now
+        self.volatile_keys = set()
+
+        # Global names that the macros assign volatile values
+        self.volatile_names = frozenset()
+
     def __setitem__(self, key: Tuple[Union[int, slice], Union[int, slice],
                                      Union[int, slice]], value: str):
         """Sets cell code and resets result cache
@@ -1227,23 +1796,36 @@ class CodeArray(DataArray):
 
         """
 
-        # Change numpy array repr function for grid cell results
-        numpy.set_string_function(lambda s: repr(s.tolist()))
+        with self.lock:
+            # Change numpy array repr function for grid cell results
+            numpy.set_string_function(lambda s: repr(s.tolist()))
+
+            # Prevent unchanged cells from being recalculated on cursor
+            # movement
+
+            node = self._get_node(key)
 
-        # Prevent unchanged cells from being recalculated on cursor movement
+            unchanged = (node in self.result_cache and
+                         value == self(key)) or \
+                        ((value is None or value == "") and
+                         node not in self.result_cache)
 
-        repr_key = repr(key)
+            # Empty values delete cells via pop, which updates the kernel
+            # Slice nodes are strings.
+            code_changed = self.kernel is not None and value and \
+                (isinstance(node, str) or value != self(key))
 
-        unchanged = (repr_key in self.result_cache and
-                     value == self(key)) or \
-                    ((value is None or value == "") and
-                     repr_key not in self.result_cache)
+            super().__setitem__(key, value)
 
-        super().__setitem__(key, value)
+            if code_changed:
+                if isinstance(node, str):
+                    self.kernel.reload()
+                else:
+                    self.kernel.set_code(key)
 
-        if not unchanged:
-            # Reset result cache
-            self.result_cache = {}
+            if not unchanged:
+                # Reset results of the cell and of its dependents
+                self._invalidate(key)
 
     def __getitem__(self, key: Tuple[Union[int, slice], Union[int, slice],
                                      Union[int, slice]]) -> Any:
@@ -1253,83 +1835,587 @@ class CodeArray(DataArray):
 
         """
 
-        if not any(isinstance(k, slice) for k in key):
-            # Button cell handling
-            if self.cell_attributes[key].button_cell is not False:
-                return
-            # Frozen cell handling
-            frozen_res = self.cell_attributes[key].frozen
-            if frozen_res:
-                if repr(key) in self.frozen_cache:
-                    return self.frozen_cache[repr(key)]
-                # Frozen cache is empty.
-                # Maybe we have a reload without the frozen cache
-                result = self._eval_cell(key, self(key))
-                self.frozen_cache[repr(key)] = result
+        with self.lock:
+            if self.kernel is not None and not self.safe_mode:
+                return self.kernel[key]
+
+            if self._evaluation_stack:
+                self._trace_access(key)
+
+            if not any(isinstance(k, slice) for k in key):
+                # Button cell handling
+                if self.cell_attributes[key].button_cell is not False:
+                    return
+                # Frozen cell handling
+                frozen_res = self.cell_attributes[key].frozen
+                if frozen_res:
+                    if repr(key) in self.frozen_cache:
+                        return self.frozen_cache[repr(key)]
+                    # Frozen cache is empty.
+                    # Maybe we have a reload without the frozen cache
+                    with self._evaluating(None):
+                        result = self._eval_cell(key, self(key))
+                    if not self.watchdog.budget_exhausted():
+                        self.frozen_cache[repr(key)] = result
+                    return result
+
+                # Constant cells are not evaluated
+                if not self.safe_mode:
+                    is_literal, value = \
+                        self.dict_grid.lookup_literal(tuple(key))
+                    if is_literal:
+                        return value
+
+            # Normal cell handling
+
+            node = self._get_node(key)
+
+            if node in self.result_cache:
+                return self.result_cache[node]
+
+            elif self(key) is not None:
+                self.result_cache.misses += 1
+                result = self._evaluate(key)
+
+                # Results after the recalculation budget may be timeouts
+                if not self.watchdog.budget_exhausted():
+                    self.result_cache[node] = result
+
                 return result
 
-        # Normal cell handling
+    @staticmethod
+    def _get_node(key: Tuple[Union[int, slice], Union[int, slice],
+                             Union[int, slice]]
+                  ) -> Union[Tuple[int, int, int], str]:
+        """Returns dependency graph node and result cache key for key
 
-        if repr(key) in self.result_cache:
-            return self.result_cache[repr(key)]
+        Cell keys are represented as tuples. Slice keys are represented by
+        their repr string because slices are not hashable.
 
-        elif self(key) is not None:
-            result = self._eval_cell(key, self(key))
-            self.result_cache[repr(key)] = result
+        :param key: Cell key or slice key
 
-            return result
+        """
 
-    def _make_nested_list(self, gen: Union[Iterable, Iterable[Iterable],
-                                           Iterable[Iterable[Iterable]]]
-                          ) -> Union[Sequence, Sequence[Sequence],
-                                     Sequence[Sequence[Sequence]]]:
-        """Makes nested list from generator for creating numpy.array"""
+        if any(isinstance(ele, slice) for ele in key):
+            return repr(key)
 
-        res = []
+        return tuple(key)
 
-        for ele in gen:
-            if ele is None:
-                res.append(None)
+    @property
+    def _evaluation_stack(self) -> List[Any]:
+        """Dependency graph nodes of the cells that are currently evaluated
 
-            elif not is_stringlike(ele) and isgenerator(ele):
-                # Nested generator
-                res.append(self._make_nested_list(ele))
+        None suppresses dependency tracing, e. g. inside slices. Each thread
+        has its own stack so that frozen cells can be refreshed in worker
+        threads.
 
-            else:
-                res.append(ele)
+        """
 
-        return res
+        try:
+            return self._evaluation_state.stack
+        except AttributeError:
+            stack = self._evaluation_state.stack = []
+            return stack
 
-    def _get_updated_environment(self, env_dict: dict = None) -> dict:
-        """Returns globals environment with 'magic' variable
+    @contextmanager
+    def _evaluating(self, node: Any):
+        """Context manager that traces cell accesses for dependency node
 
-        :param env_dict: Maps global variable name to value, None: {'S': self}
+        :param node: Dependency graph node, None suppresses tracing
 
         """
 
-        if env_dict is None:
-            env_dict = {'S': self}
-
-        env = globals().copy()
-        env.update(env_dict)
-
-        return env
+        self._evaluation_stack.append(node)
+        try:
+            yield
+        finally:
+            self._evaluation_stack.pop()
 
-    def exec_then_eval(self, code: str,
-                       _globals: dict = None, _locals: dict = None):
-        """execs multuiline code and returns eval of last code line
+    def _trace_access(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                       Union[int, slice]]):
+        """Adds dependency of the currently evaluated cell on key
 
-        :param code: Code to be executed / evaled
-        :param _globals: Globals dict for code execution and eval
-        :param _locals: Locals dict for code execution and eval
+        :param key: Cell key or slice key that is accessed
 
         """
 
-        if _globals is None:
-            _globals = {}
+        dependent = self._evaluation_stack[-1]
 
-        if _locals is None:
-            _locals = {}
+        if dependent is not None:
+            self.dependency_graph.add(dependent, self._get_node(key))
+
+    def _key_ranges(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                     Union[int, slice]]
+                    ) -> Tuple[range, range, range]:
+        """Returns row, column and table ranges that are covered by key
+
+        :param key: Cell key or slice key
+
+        """
+
+        return tuple(range(*ele.indices(dim)) if isinstance(ele, slice)
+                     else range(ele, ele + 1)
+                     for ele, dim in zip(key, self.shape))
+
+    def _add_static_dependencies(self, key: Tuple[int, int, int], code: str):
+        """Adds dependencies of cell key that are found in its code
+
+        :param key: Key of cell
+        :param code: Code of cell
+
+        """
+
+        self.volatile_keys.discard(key)
+
+        if not isinstance(code, str):
+            return
+
+        references = get_code_references(code)
+
+        if references.volatile \
+           or not references.loaded_names.isdisjoint(self.volatile_names):
+            self.volatile_keys.add(key)
+
+        for name in references.loaded_names:
+            self.dependency_graph.add(key, name)
+
+        for name in references.stored_names:
+            self.dependency_graph.add(name, key)
+
+        for index in references.cells:
+            ref_key = resolve_index(index, key)
+            if ref_key is None:
+                continue
+            if any(isinstance(ele, slice) for ele in ref_key):
+                node = self._get_node(ref_key)
+                self.dependency_graph.add(key, node)
+                self.dependency_graph.add_range(node,
+                                                self._key_ranges(ref_key))
+            else:
+                self.dependency_graph.add(key, ref_key)
+
+    def _evaluate(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                   Union[int, slice]]) -> Any:
+        """Evaluates cell or slice key and updates its dependencies
+
+        :param key: Cell key or slice key that is evaluated
+
+        """
+
+        code = self(key)
+
+        if any(isinstance(ele, slice) for ele in key):
+            node = self._get_node(key)
+            self.dependency_graph.remove(node)
+            self.dependency_graph.add_range(node, self._key_ranges(key))
+            if self.safe_mode:
+                return self._eval_cell(key, code)
+            return self.read_range(key)
+
+        self.dependency_graph.remove(key)
+        self._add_static_dependencies(key, code)
+        with self._evaluating(key):
+            if not self.profiler.enabled:
+                return self._eval_cell(key, code)
+
+            start = self.profiler.start()
+            result = None
+            try:
+                result = self._eval_cell(key, code)
+            finally:
+                self.profiler.stop(key, start, result)
+            return result
+
+    def cache_result(self, key: Tuple[int, int, int], result: Any):
+        """Stores result of cell that has been evaluated elsewhere
+
+        Only dependencies that are found by static analysis of the cell code
+        are recorded.
+
+        :param key: Key of cell that has been evaluated
+        :param result: Result of the cell
+
+        """
+
+        with self.lock:
+            key = tuple(key)
+
+            self.dependency_graph.remove(key)
+            self._add_static_dependencies(key, self(key))
+            self.result_cache[key] = result
+
+    def get_cell_globals(self) -> Set[str]:
+        """Returns names that are assigned by cell code"""
+
+        cell_globals = set()
+
+        for code in self.dict_grid.values():
+            if isinstance(code, str):
+                cell_globals.update(get_code_references(code).stored_names)
+
+        return cell_globals
+
+    def get_static_dependencies(self, key: Tuple[int, int, int],
+                                cell_globals: Set[str]
+                                ) -> Union[Set[Tuple[int, int, int]], None]:
+        """Returns keys of cells that key references, None if unknown
+
+        None is returned unless static analysis proves that the result of
+        the cell only depends on its code, the macros and the referenced
+        cells. This excludes e.g. frozen cells, button cells, volatile cells,
+        cells that assign globals or use globals that other cells assign and
+        cells that use macros, which access cells.
+
+        :param key: Key of cell to be analyzed
+        :param cell_globals: Names that are assigned by cell code
+
+        """
+
+        code = self(key)
+        if not isinstance(code, str):
+            return
+
+        attributes = self.cell_attributes[key]
+        if attributes.frozen or attributes.button_cell is not False:
+            return
+
+        references = get_code_references(code)
+        if references.dynamic_access or references.stored_names \
+           or not references.loaded_names.isdisjoint(cell_globals):
+            return
+
+        # Macros may not have been executed yet, e.g. for a loaded file
+        volatile_names = self.volatile_names | get_volatile_names(self.macros)
+        if references.volatile or key in self.volatile_keys \
+           or not references.loaded_names.isdisjoint(volatile_names):
+            return
+
+        # Cells that macros access are unknown, e.g. def f(): return S[0, 0, 0]
+        if not references.loaded_names.isdisjoint(
+                get_cell_access_names(self.macros)):
+            return
+
+        dependencies = set()
+        ranges = []
+
+        for index in references.cells:
+            ref_key = resolve_index(index, key)
+            if ref_key is None:
+                return
+            if any(isinstance(ele, slice) for ele in ref_key):
+                ranges.append([range(*ele.indices(dim))
+                               if isinstance(ele, slice)
+                               else range(ele, ele + 1)
+                               for ele, dim in zip(ref_key, self.shape)])
+            else:
+                dependencies.add(ref_key)
+
+        if ranges:
+            for cell_key in self.dict_grid:
+                if any(all(ele in rng for ele, rng in zip(cell_key, ranges_))
+                       for ranges_ in ranges):
+                    dependencies.add(cell_key)
+
+        return dependencies
+
+    def _invalidate(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                     Union[int, slice]]):
+        """Removes results of key and of all its dependents from result cache
+
+        In manual calculation mode, the dependents are marked as dirty
+        instead.
+
+        :param key: Key of cell that has been changed
+
+        """
+
+        with self.lock:
+            if any(isinstance(ele, slice) for ele in key):
+                if self.manual_calculation:
+                    self.dirty.update(self.result_cache)
+                else:
+                    self.result_cache.clear()
+                return
+
+            key = tuple(key)
+            nodes = self.dependency_graph.get_dependents(key)
+
+            # Dependents of globals that are assigned by the new cell code
+            code = self(key)
+            if isinstance(code, str):
+                for name in get_code_references(code).stored_names:
+                    nodes.add(name)
+                    nodes.update(self.dependency_graph.get_dependents(name))
+
+            # The changed cell itself is always evaluated again
+            self.result_cache.pop(key, None)
+
+            self._discard_results(nodes)
+            self.dirty.discard(key)
+
+    def _discard_results(self, nodes: Iterable[Any]):
+        """Removes results of nodes from result cache
+
+        In manual calculation mode, the nodes are marked as dirty instead.
+
+        :param nodes: Dependency graph nodes
+
+        """
+
+        if self.manual_calculation:
+            self.dirty.update(nodes)
+            return
+
+        for node in nodes:
+            self.result_cache.pop(node, None)
+
+    def invalidate_volatile(self,
+                            keys: Iterable[Tuple[int, int, int]] = None):
+        """Removes results of volatile cells and of their dependents
+
+        Results of pure cells are kept.
+
+        :param keys: Keys of cells that are refreshed, None: all cells
+
+        """
+
+        with self.lock:
+            if keys is None:
+                volatile_keys = set(self.volatile_keys)
+            else:
+                volatile_keys = \
+                    self.volatile_keys.intersection(map(tuple, keys))
+
+            nodes = self.dependency_graph.get_dependents(*volatile_keys)
+            nodes.update(volatile_keys)
+
+            self._discard_results(nodes)
+
+    @property
+    def manual_calculation(self) -> bool:
+        """True if changes only mark dependent results as dirty
+
+        In manual calculation mode, a changed cell is evaluated again but
+        cached results of its dependents are kept until :meth:`recalculate`
+        is called. Leaving the mode discards all dirty results.
+
+        """
+
+        return self._manual_calculation
+
+    @manual_calculation.setter
+    def manual_calculation(self, manual_calculation: bool):
+        """Sets manual calculation mode
+
+        :param manual_calculation: Manual calculation mode if True
+
+        """
+
+        with self.lock:
+            self._manual_calculation = manual_calculation
+
+            if not manual_calculation:
+                for node in self.dirty:
+                    self.result_cache.pop(node, None)
+                self.dirty.clear()
+
+    def recalculate(self, table: int = None, selection: Selection = None
+                    ) -> List[Tuple[int, int, int]]:
+        """Evaluates dirty cells again and returns their keys
+
+        Dirty results that do not belong to a cell, e.g. of slices or
+        globals, are always discarded so that they are evaluated on demand.
+        Dependents of the recalculated cells that are not recalculated
+        become dirty.
+
+        :param table: Recalculate only cells of this table, None: all cells
+        :param selection: Recalculate only selected cells of table
+
+        """
+
+        with self.lock:
+            nodes = {node for node in self.dirty
+                     if not isinstance(node, tuple)
+                     or table is None
+                     or (node[2] == table
+                         and (selection is None or node[:2] in selection))}
+
+            for node in nodes:
+                self.result_cache.pop(node, None)
+            self.dirty -= nodes
+
+            keys = sorted(node for node in nodes if isinstance(node, tuple)
+                          and node in self.dict_grid)
+
+            with self.recalculation():
+                for key in keys:
+                    self[key]
+
+            if table is not None:
+                self.dirty.update(self.dependency_graph.get_dependents(*keys))
+
+            return keys
+
+    def read_range(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                    Union[int, slice]],
+                   compact: bool = False) -> numpy.ndarray:
+        """Returns results of a block of cells as array
+
+        The results are collected in a single pass. The array has one
+        dimension for each slice in key and dtype object, so that results
+        are the objects that the cells return.
+
+        :param key: Cell key or slice key of the block
+        :param compact: If True then the dtype is bool, int64 or float64 if
+                        all results have the same type and can be stored
+                        without conversion, e.g. for aggregation
+
+        """
+
+        ranges = self._key_ranges(key)
+        shape = tuple(len(rng) for rng, ele in zip(ranges, key)
+                      if isinstance(ele, slice))
+
+        result_cache = self.result_cache
+        dict_grid = self.dict_grid
+
+        values = []
+
+        with self._evaluating(None):
+            for cell_key in product(*ranges):
+                if cell_key not in dict_grid:
+                    values.append(None)
+                    continue
+                if cell_key in result_cache:
+                    values.append(result_cache[cell_key])
+                else:
+                    values.append(self[cell_key])
+
+        if not values:
+            return numpy.empty(shape, dtype="O")
+
+        dtype = get_compact_dtype(values) if compact else None
+        if dtype is not None:
+            return numpy.array(values, dtype=dtype).reshape(shape)
+
+        # Nested lists keep the array layout of nested cell results
+        for size in reversed(shape[1:]):
+            values = [values[i:i + size] for i in range(0, len(values), size)]
+
+        return numpy.array(values, dtype="O")
+
+    def aggregate_range(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                         Union[int, slice]]) -> Aggregate:
+        """Returns aggregate of the numeric results of a block of cells
+
+        Rows are split into blocks that are aligned to multiples of
+        aggregate_block_size. Aggregates of the blocks are cached like cell
+        results, so that after a change only blocks with changed results
+        are read again.
+
+        :param key: Cell key or slice key of the block
+
+        """
+
+        rows, columns, tables = self._key_ranges(key)
+
+        if rows.step != 1:
+            return aggregate_values(self[key])
+
+        block_size = self.aggregate_block_size
+        aggregates = []
+
+        for table in tables:
+            for column in columns:
+                start = rows.start
+                while start < rows.stop:
+                    stop = min(rows.stop,
+                               (start // block_size + 1) * block_size)
+                    aggregates.append(self._aggregate_block(
+                        (slice(start, stop), column, table)))
+                    start = stop
+
+        return combine_aggregates(aggregates)
+
+    def _aggregate_block(self, key: Tuple[slice, int, int]) -> Aggregate:
+        """Returns cached aggregate of the results of a column block
+
+        The aggregate is cached under its own dependency graph node, which
+        depends on the cells of the block.
+
+        :param key: Slice key of a block of rows in one column
+
+        """
+
+        node = "aggregate{!r}".format(key)
+
+        if self._evaluation_stack and self._evaluation_stack[-1] is not None:
+            self.dependency_graph.add(self._evaluation_stack[-1], node)
+
+        if node in self.result_cache:
+            return self.result_cache[node]
+
+        self.dependency_graph.remove(node)
+        self.dependency_graph.add_range(node, self._key_ranges(key))
+
+        aggregate = aggregate_values(self.read_range(key, compact=True))
+        self.result_cache[node] = aggregate
+
+        return aggregate
+
+    def _make_nested_list(self, gen: Union[Iterable, Iterable[Iterable],
+                                           Iterable[Iterable[Iterable]]]
+                          ) -> Union[Sequence, Sequence[Sequence],
+                                     Sequence[Sequence[Sequence]]]:
+        """Makes nested list from generator for creating numpy.array"""
+
+        res = []
+
+        for ele in gen:
+            if ele is None:
+                res.append(None)
+
+            elif not is_stringlike(ele) and isgenerator(ele):
+                # Nested generator
+                res.append(self._make_nested_list(ele))
+
+            else:
+                res.append(ele)
+
+        return res
+
+    def _get_updated_environment(self, env_dict: dict = None
+                                 ) -> ChainNamespace:
+        """Returns globals environment with 'magic' variable
+
+        The environment is a layer on top of the globals, which are not copied.
+
+        :param env_dict: Maps global variable name to value,
+                         None: {'S': self, 'memo': self.memo}
+
+        """
+
+        if env_dict is None:
+            env_dict = {'S': self, 'memo': self.memo}
+
+        return ChainNamespace(self.get_globals(), env_dict)
+
+    def _compile(self, code: str) -> Tuple[CodeType, CodeType,
+                                           Tuple[ast.AST, ...]]:
+        """Returns compiled code for exec_then_eval, uses code_cache
+
+        The returned tuple contains the code object for all lines but the
+        last one, the code object for evaluating the last line and the
+        assignment targets of the last line.
+
+        :param code: Code to be compiled
+
+        """
+
+        try:
+            return self.code_cache[code]
+        except KeyError:
+            pass
 
         block = ast.parse(code, mode='exec')
 
@@ -1337,14 +2423,44 @@ class CodeArray(DataArray):
         last_body = block.body.pop()
         last = ast.Expression(last_body.value)
 
-        exec(compile(block, '<string>', mode='exec'), _globals, _locals)
-        res = eval(compile(last, '<string>', mode='eval'), _globals, _locals)
+        compiled = (compile(block, '<string>', mode='exec'),
+                    compile(last, '<string>', mode='eval'),
+                    tuple(getattr(last_body, "targets", ())))
+
+        self.code_cache[code] = compiled
+
+        return compiled
+
+    def exec_then_eval(self, code: str,
+                       _globals: dict = None, _locals: dict = None):
+        """execs multuiline code and returns eval of last code line
+
+        Globals that are assigned in the last line or via the `global`
+        statement are committed to the globals if _globals is a
+        :class:`ChainNamespace`.
+
+        :param code: Code to be executed / evaled
+        :param _globals: Globals dict for code execution and eval
+        :param _locals: Locals dict for code execution and eval
+
+        """
 
-        if hasattr(last_body, "targets"):
-            for target in last_body.targets:
-                _globals[target.id] = res
+        if _globals is None:
+            _globals = self._get_updated_environment()
 
-        globals().update(_globals)
+        if _locals is None:
+            _locals = ChainNamespace(_globals)
+
+        exec_code, eval_code, targets = self._compile(code)
+
+        exec(exec_code, _globals, _locals)
+        res = eval(eval_code, _globals, _locals)
+
+        for target in targets:
+            _globals[target.id] = res
+
+        if isinstance(_globals, ChainNamespace):
+            _globals.commit()
 
         return res
 
@@ -1370,7 +2486,16 @@ class CodeArray(DataArray):
 
         env_dict = {'X': key[0], 'Y': key[1], 'Z': key[2], 'bz2': bz2,
                     'base64': base64, 'nn': nn, 'Figure': Figure,
-                    'R': key[0], 'C': key[1], 'T': key[2], 'S': self}
+                    'R': key[0], 'C': key[1], 'T': key[2], 'S': self,
+                    'memo': self.memo, 'volatile': volatile,
+                    'WB': self.open_workbook}
+
+        # Macros may define functions with the names of range functions
+        _globals = self.get_globals()
+        env_dict.update((name, function)
+                        for name, function in self.range_functions.items()
+                        if name not in _globals)
+
         env = self._get_updated_environment(env_dict=env_dict)
 
         if self.safe_mode:
@@ -1386,14 +2511,20 @@ class CodeArray(DataArray):
             return numpy.array(self._make_nested_list(code), dtype="O")
 
         try:
-            signal.signal(signal.SIGALRM, self.handler)
-            signal.alarm(self.settings.timeout)
-        except AttributeError:
-            # No Unix system
-            pass
+            previous_deadline = self.watchdog.arm(self.settings.timeout / 1000)
+            try:
+                result = self.exec_then_eval(code, env)
+            finally:
+                self.watchdog.disarm(previous_deadline)
 
-        try:
-            result = self.exec_then_eval(code, env, {})
+        except RecalculationTimeout:
+            msg = "Recalculation timeout after {} ms."
+            result = RuntimeError(
+                msg.format(self.settings.recalculation_timeout))
+
+        except EvaluationTimeout:
+            msg = "Timeout after {} ms."
+            result = RuntimeError(msg.format(self.settings.timeout))
 
         except AttributeError as err:
             # Attribute Error includes RunTimeError
@@ -1405,18 +2536,126 @@ class CodeArray(DataArray):
         except Exception as err:
             result = Exception(err)
 
-        finally:
-            try:
-                signal.alarm(0)
-            except AttributeError:
-                # No POSIX system
-                pass
+        if isawaitable(result):
+            result = self._submit_awaitable(key, code, result)
 
         # Change back cell value for evaluation from other cells
         # self.dict_grid[key] = _old_code
 
         return result
 
+    def _submit_awaitable(self, key: Tuple[int, int, int], code: str,
+                          awaitable: Awaitable) -> PendingResult:
+        """Runs awaitable of a cell in the background, returns placeholder
+
+        The awaitable runs in the event loop thread without holding the lock
+        of the code array. Cell accesses of the awaitable, e.g. S[0, 0, 0]
+        after an await, take the lock.
+
+        :param key: Key of cell that has returned awaitable
+        :param code: Code of cell that has returned awaitable
+        :param awaitable: Awaitable that the cell has returned
+
+        """
+
+        pending = self.awaitable_runner.submit(awaitable,
+                                               self.settings.timeout / 1000)
+        future = pending.future
+        self._pending_futures.add(future)
+
+        def on_done(_):
+            with self._awaitables_condition:
+                self._done_awaitables.append((key, code, pending))
+                self._pending_futures.discard(future)
+                self._awaitables_condition.notify_all()
+            if self.awaitable_done_callback is not None:
+                self.awaitable_done_callback()
+
+        future.add_done_callback(on_done)
+
+        return pending
+
+    def _get_awaitable_result(self, pending: PendingResult) -> Any:
+        """Returns result of done awaitable as it is shown in the cell
+
+        :param pending: Placeholder of done awaitable
+
+        """
+
+        try:
+            return pending.future.result()
+
+        except asyncio.TimeoutError:
+            msg = "Timeout after {} ms."
+            return RuntimeError(msg.format(self.settings.timeout))
+
+        except asyncio.CancelledError:
+            return RuntimeError("Awaitable has been cancelled.")
+
+        except AttributeError as err:
+            return AttributeError(err)
+
+        except RuntimeError as err:
+            return RuntimeError(err)
+
+        except Exception as err:
+            return Exception(err)
+
+    def apply_awaitable_results(self) -> List[Tuple[int, int, int]]:
+        """Replaces placeholders of done awaitables with their results
+
+        Cached results of dependent cells are invalidated. Results of cells,
+        whose code has changed or whose placeholder has been dropped from
+        the cache, are discarded. Returns keys of updated and invalidated
+        cells.
+
+        """
+
+        with self.lock:
+            keys = []
+
+            while self._done_awaitables:
+                key, code, pending = self._done_awaitables.popleft()
+
+                if self(key) != code:
+                    continue
+
+                if self.result_cache.get(key) is pending:
+                    self.result_cache[key] = \
+                        self._get_awaitable_result(pending)
+                elif self.frozen_cache.get(repr(key)) is pending:
+                    self.frozen_cache[repr(key)] = \
+                        self._get_awaitable_result(pending)
+                else:
+                    continue
+
+                keys.append(key)
+
+                for node in self.dependency_graph.get_dependents(key):
+                    self.result_cache.pop(node, None)
+                    if isinstance(node, tuple):
+                        keys.append(node)
+
+            return keys
+
+    def wait_for_awaitables(self, timeout: float = None
+                            ) -> List[Tuple[int, int, int]]:
+        """Waits until awaitables are done and applies their results
+
+        Returns keys of updated and invalidated cells, see
+        :meth:`apply_awaitable_results`. Must not be called while holding
+        the lock because awaitables that access cells wait for it.
+
+        :param timeout: Maximum waiting time in seconds, None: no limit
+
+        """
+
+        with self._awaitables_condition:
+            self._awaitables_condition.wait_for(
+                lambda: not self._pending_futures, timeout)
+
+        return self.apply_awaitable_results()
+
     def pop(self, key: Tuple[int, int, int]):
         """pop with cache support
 
@@ -1424,13 +2663,72 @@ class CodeArray(DataArray):
 
         """
 
-        try:
-            self.result_cache.pop(repr(key))
+        with self.lock:
+            code = super().pop(key)
 
-        except KeyError:
-            pass
+            self._invalidate(key)
+            self.dependency_graph.remove(tuple(key))
+            self.volatile_keys.discard(tuple(key))
+
+            if self.kernel is not None:
+                self.kernel.set_code(key)
+
+            return code
+
+    def reset_results(self):
+        """Discards all results and the dependencies recorded with them
+
+        Clears the result cache, the dirty cells of manual calculation, the
+        dependency graph and the volatile cells. Dependencies and volatile
+        cells are recorded again when cells are evaluated.
+
+        """
+
+        with self.lock:
+            self.result_cache.clear()
+            self.dependency_graph.clear()
+            self.dirty.clear()
+            self.volatile_keys.clear()
+
+    def insert(self, insertion_point: int, no_to_insert: int, axis: int,
+               tab: int = None):
+        """Inserts no_to_insert rows/cols/tabs/... and resets result cache
+
+        :param insertion_point: Point on axis at which insertion takes place
+        :param no_to_insert: Number of rows/cols/tabs to be inserted (>=0)
+        :param axis: Row/Column/Table insertion if 0/1/2 must be in 0, 1, 2
+        :param tab: Table at which insertion takes place, None means all tables
+
+        """
+
+        with self.lock:
+            super().insert(insertion_point, no_to_insert, axis, tab)
+
+            # Relative references change their targets
+            self.reset_results()
+
+            if self.kernel is not None:
+                self.kernel.reload()
 
-        return super().pop(key)
+    def delete(self, deletion_point: int, no_to_delete: int, axis: int,
+               tab: int = None):
+        """Deletes no_to_delete rows/cols/... and resets result cache
+
+        :param deletion_point: Point on axis at which deletion takes place
+        :param no_to_delete: Number of rows/cols/tabs to be deleted (>=0)
+        :param axis: Row/Column/Table deletion if 0/1/2, must be in 0, 1, 2
+        :param tab: Table at which insertion takes place, None means all tables
+
+        """
+
+        with self.lock:
+            super().delete(deletion_point, no_to_delete, axis, tab)
+
+            # Relative references change their targets
+            self.reset_results()
+
+            if self.kernel is not None:
+                self.kernel.reload()
 
     def reload_modules(self):
         """Reloads modules that are available in cells"""
@@ -1453,17 +2751,65 @@ class CodeArray(DataArray):
                      'copy', 'imap', 'ifilter', 'Selection', 'DictGrid',
                      'numpy', 'CodeArray', 'DataArray', 'datetime', 'signal',
                      'Any', 'Dict', 'Iterable', 'List', 'NamedTuple',
-                     'Sequence', 'Tuple', 'Union']
-
-        for key in list(globals().keys()):
+                     'Sequence', 'Set', 'Tuple', 'Union', 'contextmanager',
+                     'DependencyGraph', 'get_cell_access_names',
+                     'get_code_references', 'get_literal',
+                     'get_volatile_names', 'volatile',
+                     'resolve_index', 'LRUDict', 'SizedLRUDict',
+                     'CodeType', 'ChainNamespace', 'get_compact_dtype',
+                     'CellProfiler', 'Watchdog', 'EvaluationTimeout',
+                     'RecalculationTimeout', 'threading', 'asyncio', 'deque',
+                     'Awaitable', 'isawaitable', 'AwaitableRunner',
+                     'PendingResult', 'Aggregate', 'RangeFunction',
+                     'RANGE_FUNCTIONS', 'aggregate_values',
+                     'combine_aggregates', 'Memoizer', 'Path',
+                     'SelectionIndex', 'IntervalTree', 'RectangleCover',
+                     'get_rectangles',
+                     'WeakValueDictionary', 'SharedCellAttributeDict']
+
+        _globals = self.get_globals()
+        for key in list(_globals.keys()):
             if key not in base_keys:
-                globals().pop(key)
+                _globals.pop(key)
+
+        self.memo.clear()
 
     def get_globals(self) -> dict:
         """Returns globals dict"""
 
         return globals()
 
+    @property
+    def workbook_directory(self) -> Path:
+        """Directory, against which relative workbook paths are resolved"""
+
+        path = Path(getattr(self.settings, "last_file_input_path", None)
+                    or Path.cwd())
+        if path.is_dir():
+            return path
+        return path.parent
+
+    def open_workbook(self, filepath: Union[Path, str]) -> "CodeArray":
+        """Returns read-only code array of another pys or pysu file
+
+        The file is loaded once and again when it is modified, see
+        model.workbooks. Its cells are evaluated when they are accessed.
+
+        :param filepath: Path of file, relative to workbook_directory
+
+        """
+
+        try:
+            from pyspread.model.workbooks import workbook_cache
+        except ImportError:
+            from model.workbooks import workbook_cache
+
+        filepath = Path(filepath).expanduser()
+        if not filepath.is_absolute():
+            filepath = self.workbook_directory / filepath
+
+        return workbook_cache.get(filepath, self.settings)
+
     def execute_macros(self) -> Tuple[str, str]:
         """Executes all macros and returns result string and error string
 
@@ -1471,63 +2817,86 @@ class CodeArray(DataArray):
 
         """
 
-        if self.safe_mode:
-            return '', "Safe mode activated. Code not executed."
-
-        # We need to execute each cell so that assigned globals are updated
-        for key in self:
-            self[key]
+        with self.lock:
+            if self.safe_mode:
+                return '', "Safe mode activated. Code not executed."
 
-        # Windows exec does not like Windows newline
-        self.macros = self.macros.replace('\r\n', '\n')
+            if self.kernel is not None:
+                return self.kernel.execute_macros()
 
-        # Set up environment for evaluation
-        globals().update(self._get_updated_environment())
+            # Cells that assign globals are executed so that the macros can
+            # use these globals. All other cells are evaluated lazily.
+            with self.recalculation():
+                for key, code in list(self.dict_grid.items()):
+                    if ("=" in code or "global" in code) \
+                       and get_code_references(code).stored_names:
+                        self[key]
 
-        # Create file-like string to capture output
-        code_out = io.StringIO()
-        code_err = io.StringIO()
-        err_msg = io.StringIO()
+            # Results of previously defined macro functions are outdated
+            self.memo.clear()
 
-        # Capture output and errors
-        sys.stdout = code_out
-        sys.stderr = code_err
-
-        try:
-            signal.signal(signal.SIGALRM, self.handler)
-            signal.alarm(self.settings.timeout)
-        except AttributeError:
-            # No POSIX system
-            pass
+            # Windows exec does not like Windows newline
+            self.macros = self.macros.replace('\r\n', '\n')
 
-        try:
-            exec(self.macros, globals())
-            try:
-                signal.alarm(0)
-            except AttributeError:
-                # No POSIX system
-                pass
+            # Set up environment for evaluation
+            _globals = self.get_globals()
+            _globals.update(self._get_updated_environment())
 
-        except Exception:
-            exc_info = sys.exc_info()
-            user_tb = get_user_codeframe(exc_info[2]) or exc_info[2]
-            print_exception(exc_info[0], exc_info[1], user_tb, None, err_msg)
-        # Restore stdout and stderr
-        sys.stdout = sys.__stdout__
-        sys.stderr = sys.__stderr__
+            # Bindings of the globals for finding the names that macros change
+            old_globals = dict(_globals)
 
-        results = code_out.getvalue()
-        errs = code_err.getvalue() + err_msg.getvalue()
+            # Create file-like string to capture output
+            code_out = io.StringIO()
+            code_err = io.StringIO()
+            err_msg = io.StringIO()
 
-        code_out.close()
-        code_err.close()
+            # Capture output and errors
+            sys.stdout = code_out
+            sys.stderr = code_err
 
-        # Reset result cache
-        self.result_cache.clear()
+            try:
+                previous_deadline = \
+                    self.watchdog.arm(self.settings.timeout / 1000)
+                try:
+                    exec(self.macros, _globals)
+                finally:
+                    self.watchdog.disarm(previous_deadline)
 
-        # Reset frozen cache
-        self.frozen_cache.clear()
-        return results, errs
+            except Exception:
+                exc_info = sys.exc_info()
+                user_tb = get_user_codeframe(exc_info[2]) or exc_info[2]
+                print_exception(exc_info[0], exc_info[1], user_tb, None,
+                                err_msg)
+            # Restore stdout and stderr
+            sys.stdout = sys.__stdout__
+            sys.stderr = sys.__stderr__
+
+            results = code_out.getvalue()
+            errs = code_err.getvalue() + err_msg.getvalue()
+
+            code_out.close()
+            code_err.close()
+
+            # Reset results of cells that use globals, which the macros
+            # reference or rebind, of frozen cells and of volatile cells
+            macro_references = get_code_references(self.macros)
+            names = set(macro_references.loaded_names)
+            names.update(macro_references.stored_names)
+            missing = object()
+            names.update(name for name in old_globals.keys() | _globals.keys()
+                         if old_globals.get(name, missing)
+                         is not _globals.get(name, missing))
+            frozen_keys = [ast.literal_eval(repr_key)
+                           for repr_key in self.frozen_cache]
+
+            self.volatile_names = get_volatile_names(self.macros)
+            self._discard_results(
+                self.dependency_graph.get_dependents(*names, *frozen_keys))
+            self.invalidate_volatile()
+
+            # Reset frozen cache
+            self.frozen_cache.clear()
+            return results, errs
 
     def _sorted_keys(self, keys: Iterable[Tuple[int, int, int]],
                      startkey: Tuple[int, int, int],
@@ -1638,14 +3007,23 @@ class CodeArray(DataArray):
                 # re errors are cryptical: sre_constants,...
                 pass
 
-    def handler(self, signum: Any, frame: Any):
-        """Signal handler for timeout
+    def recalculation(self):
+        """Context manager that limits the time of a recalculation
+
+        All cell evaluations inside the context share the budget
+        `settings.recalculation_timeout` in milliseconds. Cells that are
+        evaluated after the budget is exhausted return a RuntimeError. These
+        results are not cached, so that the cells are evaluated again when
+        they are accessed after the recalculation.
 
-        :param signum: Ignored
-        :param frame: Ignored
+        The budget is enforced by the watchdog thread with an asynchronous
+        exception. Unlike the SIGALRM signal, it cannot interrupt blocking C
+        calls such as `time.sleep`. A cell that blocks in such a call
+        exceeds the budget until the call returns.
 
         """
 
-        raise RuntimeError("Timeout after {} s.".format(self.settings.timeout))
+        timeout = self.settings.recalculation_timeout / 1000
+        return self.watchdog.budget(timeout)
 
 # End of class CodeArray
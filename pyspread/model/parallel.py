@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Parallel recalculation of independent cells
+
+Cells are grouped into waves. A cell only references cells of earlier waves,
+so that the cells of one wave can be evaluated concurrently on a process
+pool. Each worker process executes the macros on start-up and therefore
+holds its own copy of the macro globals.
+
+Cells that cannot be analyzed statically, cells that assign or use globals
+that are assigned by cells, as well as cells with unpicklable results are
+evaluated serially in the calling process.
+
+**Provides**
+
+ * :class:`ParallelRecalculation`
+
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+from typing import Any, Dict, Iterable, Tuple
+
+try:
+    from pyspread.settings import Settings
+    from pyspread.model.model import CodeArray
+except ImportError:
+    from settings import Settings
+    from model.model import CodeArray
+
+# CodeArray of a worker process
+_worker_code_array = None
+
+
+def _init_worker(shape: Tuple[int, int, int],
+                 code: Dict[Tuple[int, int, int], str], macros: str,
+                 timeout: int):
+    """Initializes worker process
+
+    :param shape: Grid shape
+    :param code: Maps cell key to cell code for all cells of the grid
+    :param macros: Macros of the grid
+    :param timeout: Cell evaluation timeout in seconds
+
+    """
+
+    global _worker_code_array
+
+    settings = Settings(None)
+    settings.timeout = timeout
+
+    _worker_code_array = CodeArray(shape, settings)
+    _worker_code_array.macros = macros
+
+    # Macros are executed before cells are added so that no cell is evaluated
+    _worker_code_array.execute_macros()
+    _worker_code_array.dict_grid.update(code)
+
+
+def _eval_worker(key: Tuple[int, int, int],
+                 inputs: Dict[Tuple[int, int, int], Any]) -> Any:
+    """Evaluates cell in worker process and returns its result
+
+    :param key: Key of cell to be evaluated
+    :param inputs: Maps cell key to result for all cells that key references
+
+    """
+
+    for input_key, result in inputs.items():
+        _worker_code_array.result_cache[input_key] = result
+
+    return _worker_code_array[key]
+
+
+class ParallelRecalculation:
+    """Evaluates cells of a :class:`~model.model.CodeArray` on a process pool
+
+    Worker processes are spawned rather than forked because the calling
+    process usually runs a Qt event loop.
+
+    """
+
+    def __init__(self, code_array: CodeArray, max_workers: int = None):
+        """
+        :param code_array: Grid, for which cells are evaluated
+        :param max_workers: Number of worker processes, None: cpu count
+
+        """
+
+        self.code_array = code_array
+        self.max_workers = max_workers
+
+        # Maps cell key to the keys of the cells that it references
+        self.dependencies = {}
+
+        # Lists of cell keys that can be evaluated concurrently
+        self.waves = []
+
+        # Cell keys that are evaluated serially
+        self.serial_keys = []
+
+    def plan(self, keys: Iterable[Tuple[int, int, int]]):
+        """Groups keys into waves and serially evaluated keys
+
+        :param keys: Keys of cells to be evaluated
+
+        """
+
+        keys = list(keys)
+        todo = set(keys)
+        cell_globals = self.code_array.get_cell_globals()
+
+        self.dependencies.clear()
+        self.waves = []
+        serial_keys = set()
+
+        # Maps key to referenced keys that are not evaluated yet
+        pending = {}
+
+        for key in keys:
+            dependencies = self.code_array.get_static_dependencies(
+                key, cell_globals)
+            if dependencies is None:
+                serial_keys.add(key)
+            else:
+                self.dependencies[key] = dependencies
+                pending[key] = dependencies & todo
+
+        while pending:
+            # Cells that reference serially evaluated cells are serial, too
+            tainted = [key for key, dependencies in pending.items()
+                       if not dependencies.isdisjoint(serial_keys)]
+            if tainted:
+                serial_keys.update(tainted)
+                for key in tainted:
+                    del pending[key]
+                continue
+
+            wave = sorted(key for key, dependencies in pending.items()
+                          if not dependencies)
+            if not wave:
+                # Cyclic references
+                break
+
+            self.waves.append(wave)
+            for key in wave:
+                del pending[key]
+            for dependencies in pending.values():
+                dependencies.difference_update(wave)
+
+        serial_keys.update(pending)
+        self.serial_keys = sorted(serial_keys)
+
+    def _run_waves(self) -> int:
+        """Evaluates waves on process pool, returns number of cached results
+
+        Cells without result, e. g. because it cannot be pickled, are left
+        for serial evaluation.
+
+        """
+
+        code_array = self.code_array
+
+        code = {key: value for key, value in code_array.dict_grid.items()
+                if isinstance(value, str)}
+        initargs = (code_array.shape, code, code_array.macros,
+                    code_array.settings.timeout)
+        context = multiprocessing.get_context("spawn")
+
+        no_results = 0
+
+        with ProcessPoolExecutor(self.max_workers, mp_context=context,
+                                 initializer=_init_worker,
+                                 initargs=initargs) as executor:
+            for wave in self.waves:
+                futures = {}
+                for key in wave:
+                    inputs = {dep: code_array[dep]
+                              for dep in self.dependencies[key]}
+                    futures[key] = executor.submit(_eval_worker, key, inputs)
+
+                for key, future in futures.items():
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception:
+                        # Result or inputs could not be pickled
+                        continue
+
+                    code_array.cache_result(key, result)
+                    no_results += 1
+
+        return no_results
+
+    def run(self, keys: Iterable[Tuple[int, int, int]] = None) -> int:
+        """Evaluates cells and returns number of cells evaluated in parallel
+
+        Cells with cached results are skipped. Nothing is evaluated in
+        safe mode or in kernel mode, in which the kernel process evaluates
+        the cells.
+
+        :param keys: Keys of cells to be evaluated, None: all cells
+
+        """
+
+        code_array = self.code_array
+
+        if code_array.safe_mode or code_array.kernel is not None:
+            return 0
+
+        if keys is None:
+            keys = list(code_array.dict_grid)
+
+        keys = [tuple(key) for key in keys
+                if tuple(key) not in code_array.result_cache
+                and code_array(key) is not None]
+
+        self.plan(keys)
+
+        no_parallel = 0
+
+        if self.waves:
+            try:
+                no_parallel = self._run_waves()
+            except (BrokenProcessPool, OSError):
+                # Remaining cells are evaluated serially
+                pass
+
+        with code_array.recalculation():
+            for key in keys:
+                code_array[key]
+
+        return no_parallel
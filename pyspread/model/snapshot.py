@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Result snapshots
+
+A result snapshot stores pickled cell results in a sidecar file next to a
+pyspread file so that expensive results do not have to be recomputed when
+the file is opened again.
+
+Each result is stored together with a digest of everything that it depends
+on: the cell key and code, the macros and, recursively, the digests of the
+referenced cells. A result is only restored if the digest still matches.
+Cells whose dependencies cannot be determined by static analysis are not
+stored, e.g. cells that call macro functions, which access cells. Frozen
+cells are stored with a digest of their own code and the macros only.
+
+Since unpickling can execute arbitrary code, snapshots are signed with the
+signature key of the user and are ignored if the signature does not match.
+
+**Provides**
+
+ * :func:`get_snapshot_path`
+ * :class:`ResultSnapshot`
+
+"""
+
+import bz2
+from hashlib import blake2b
+from pathlib import Path
+import pickle
+from typing import Dict, Iterable, Tuple, Union
+
+try:
+    from pyspread.lib.hashing import sign, verify
+    from pyspread.model.model import CodeArray
+except ImportError:
+    from lib.hashing import sign, verify
+    from model.model import CodeArray
+
+
+def get_snapshot_path(filepath: Path) -> Path:
+    """Returns path of the result snapshot of a pyspread file
+
+    :param filepath: Path of pyspread file
+
+    """
+
+    return filepath.with_suffix(filepath.suffix + ".results")
+
+
+class ResultSnapshot:
+    """Writes and restores cell results of a code array"""
+
+    def __init__(self, code_array: CodeArray):
+        """
+        :param code_array: Grid, for which results are stored or restored
+
+        """
+
+        self.code_array = code_array
+
+        self._macro_digest = blake2b(code_array.macros.encode("utf-8"),
+                                     digest_size=32).digest()
+        self._cell_globals = code_array.get_cell_globals()
+
+        # Maps cell key to digest, None if cell cannot be stored
+        self._digests = {}
+
+    def _get_dependencies(self, key: Tuple[int, int, int]
+                          ) -> Union[Iterable[Tuple[int, int, int]], None]:
+        """Returns keys of cells that key references, None if unknown
+
+        :param key: Key of cell to be analyzed
+
+        """
+
+        if key not in self.code_array.dict_grid \
+           or self.code_array.cell_attributes[key].frozen:
+            return ()
+
+        dependencies = self.code_array.get_static_dependencies(
+            key, self._cell_globals)
+        if dependencies is None:
+            return
+
+        return sorted(dependencies)
+
+    def _calculate_digest(self, key: Tuple[int, int, int],
+                          dependencies: Iterable[Tuple[int, int, int]]
+                          ) -> Union[bytes, None]:
+        """Returns digest of cell from the digests of its dependencies
+
+        :param key: Key of cell
+        :param dependencies: Keys of cells that key references
+
+        """
+
+        code = self.code_array.dict_grid.get(key)
+
+        digest = blake2b(self._macro_digest, digest_size=32)
+        digest.update(repr(key).encode("utf-8"))
+
+        if code is None:
+            return digest.digest()
+
+        if self.code_array.cell_attributes[key].frozen:
+            digest.update(b"frozen")
+        digest.update(b"\0" + code.encode("utf-8"))
+
+        for dependency in dependencies:
+            dependency_digest = self._digests[dependency]
+            if dependency_digest is None:
+                return
+            digest.update(dependency_digest)
+
+        return digest.digest()
+
+    def get_digest(self, key: Tuple[int, int, int]) -> Union[bytes, None]:
+        """Returns digest of all inputs of a cell, None if unknown
+
+        Cells in reference cycles have no digest.
+
+        :param key: Key of cell
+
+        """
+
+        visiting = set()
+        stack = [key]
+
+        # Depth first traversal without recursion for long reference chains
+        while stack:
+            current = stack[-1]
+            if current in self._digests:
+                stack.pop()
+                continue
+
+            dependencies = self._get_dependencies(current)
+            if dependencies is None:
+                self._digests[current] = None
+                stack.pop()
+                continue
+
+            missing = [dep for dep in dependencies if dep not in self._digests]
+            if missing:
+                if current in visiting:
+                    # Reference cycle
+                    self._digests[current] = None
+                    stack.pop()
+                else:
+                    visiting.add(current)
+                    stack.extend(missing)
+                continue
+
+            self._digests[current] = \
+                self._calculate_digest(current, dependencies)
+            stack.pop()
+
+        return self._digests[key]
+
+    def _cached_results(self) -> Iterable[Tuple[Tuple[int, int, int], object]]:
+        """Yields key result tuples of all cached cell results"""
+
+        code_array = self.code_array
+
+        for key in code_array.dict_grid:
+            if code_array.cell_attributes[key].frozen:
+                cache, node = code_array.frozen_cache, repr(key)
+            else:
+                cache, node = code_array.result_cache, key
+
+            if node in cache:
+                yield key, cache[node]
+
+    def write(self, filepath: Path, signature_key: bytes,
+              maxbytes: int) -> int:
+        """Writes snapshot of cached results, returns number of results
+
+        Smaller results are preferred if not all results fit into maxbytes.
+        Results that cannot be pickled are omitted. An outdated snapshot is
+        removed if no result is stored.
+
+        :param filepath: Path of snapshot file
+        :param signature_key: Key for signing the snapshot
+        :param maxbytes: Maximum size of all pickled results
+
+        """
+
+        entries = []
+
+        # Frozen cell refreshes may change the caches in worker threads
+        with self.code_array.lock:
+            for key, result in self._cached_results():
+                digest = self.get_digest(key)
+                if digest is None:
+                    continue
+                try:
+                    data = pickle.dumps(result,
+                                        protocol=pickle.HIGHEST_PROTOCOL)
+                except Exception:
+                    continue
+                entries.append((len(data), key, digest, data))
+
+        entries.sort(key=lambda entry: entry[0])
+
+        results = {}
+        nbytes = 0
+        for size, key, digest, data in entries:
+            if nbytes + size > maxbytes:
+                break
+            results[key] = digest, data
+            nbytes += size
+
+        if not results:
+            if filepath.exists():
+                filepath.unlink()
+            return 0
+
+        payload = bz2.compress(pickle.dumps(results))
+        signature = sign(payload, signature_key)
+
+        with open(filepath, "wb") as snapshot_file:
+            snapshot_file.write(signature + b"\n" + payload)
+
+        return len(results)
+
+    def read(self, filepath: Path, signature_key: bytes) -> int:
+        """Restores results from a snapshot, returns number of results
+
+        Results are restored only if their digest matches the current cell.
+        Nothing is restored if the snapshot signature is invalid.
+
+        :param filepath: Path of snapshot file
+        :param signature_key: Key for verifying the snapshot
+
+        """
+
+        with open(filepath, "rb") as snapshot_file:
+            signature, _, payload = snapshot_file.read().partition(b"\n")
+
+        if not verify(payload, signature, signature_key):
+            return 0
+
+        results: Dict[Tuple[int, int, int], Tuple[bytes, bytes]] = \
+            pickle.loads(bz2.decompress(payload))
+
+        code_array = self.code_array
+        restored = 0
+
+        with code_array.lock:
+            for key, (digest, data) in results.items():
+                if key not in code_array.dict_grid \
+                   or self.get_digest(key) != digest:
+                    continue
+                try:
+                    result = pickle.loads(data)
+                except Exception:
+                    continue
+
+                if code_array.cell_attributes[key].frozen:
+                    code_array.frozen_cache[repr(key)] = result
+                else:
+                    code_array.cache_result(key, result)
+                restored += 1
+
+        return restored
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+
+"""
+test_kernel
+===========
+
+Unit tests for kernel.py
+
+"""
+
+import sys
+from time import monotonic
+
+from .. import kernel
+from ..kernel import KernelClient
+from ..parallel import ParallelRecalculation
+from ...lib.attrdict import AttrDict
+from ...lib.selection import Selection
+
+# The kernel may have imported the model as top level module
+CodeArray = kernel.CodeArray
+CellAttribute = sys.modules[CodeArray.__module__].CellAttribute
+
+
+class Settings:
+    """Simulates settings class"""
+
+    timeout = 1000
+    recalculation_timeout = 0
+    result_cache_size = 100
+
+
+class TestKernelClient:
+    """Unit tests for KernelClient"""
+
+    def setup_method(self, method):
+        """Creates CodeArray with a kernel"""
+
+        self.code_array = CodeArray((100, 10, 3), Settings())
+        self.code_array.macros = "def f(x):\n    return 2 * x"
+        self.code_array[0, 0, 0] = "f(21)"
+        self.code_array[1, 0, 0] = "S[0, 0, 0] + 1"
+
+        self.kernel = KernelClient(self.code_array)
+        self.kernel.start()
+        self.code_array.kernel = self.kernel
+
+    def teardown_method(self, method):
+        """Stops kernel"""
+
+        self.code_array.kernel = None
+        self.kernel.stop()
+
+    def get_result(self, key):
+        """Polls kernel until all requests are answered, returns result"""
+
+        result = self.code_array[key]
+
+        end = monotonic() + 30
+        while (self.kernel._reply_handlers or self.kernel._batch) \
+                and monotonic() < end:
+            self.kernel.poll()
+            result = self.code_array[key]
+
+        return result
+
+    def test_getitem(self):
+        """Unit test for asynchronous and slice results"""
+
+        assert repr(self.code_array[1, 0, 0]) == "Pending..."
+        assert self.get_result((1, 0, 0)) == 43
+
+        assert list(self.code_array[:2, 0, 0]) == [42, 43]
+        assert self.code_array[0, 1, 0] is None
+
+    def test_set_code(self):
+        """Unit test for code changes that invalidate dependents"""
+
+        assert self.get_result((1, 0, 0)) == 43
+
+        self.code_array[0, 0, 0] = "f(1)"
+
+        # The previous result is shown until the new result has arrived
+        assert self.code_array[1, 0, 0] == 43
+        assert self.get_result((1, 0, 0)) == 3
+
+        self.code_array.pop((0, 0, 0))
+        assert isinstance(self.get_result((1, 0, 0)), Exception)
+
+    def test_getitem_slice_timeout(self):
+        """Unit test for slice results that take too long"""
+
+        self.code_array.settings.timeout = 100
+        self.code_array[2, 0, 0] = "time.sleep(1)\n2"
+
+        result = self.code_array[:3, 0, 0]
+
+        assert isinstance(result, RuntimeError)
+        assert str(result) == "Timeout after 100 ms."
+
+        self.code_array.settings.timeout = 1000
+        assert self.get_result((1, 0, 0)) == 43
+
+    def test_execute_macros(self):
+        """Unit test for executing macros in the kernel without waiting"""
+
+        outputs = []
+        self.kernel.macro_output_callback = \
+            lambda result, err: outputs.append((result, err))
+
+        self.code_array.macros = "def f(x):\n    return 3 * x\nprint(1)"
+
+        assert self.code_array.execute_macros() == \
+            ("Executing macros in kernel process...", "")
+        assert self.get_result((1, 0, 0)) == 64
+        assert outputs[-1] == ("1\n", "")
+
+    def test_refresh(self):
+        """Unit test for refreshing frozen cells in the kernel"""
+
+        self.code_array.macros = "counter = []"
+        self.code_array[2, 0, 0] = "counter.append(1) or len(counter)"
+        self.code_array[3, 0, 0] = "S[2, 0, 0] * 10"
+        self.code_array.cell_attributes.append(CellAttribute(
+            Selection([], [], [], [], [(2, 0)]), 0,
+            AttrDict([("frozen", True)])))
+        self.kernel.reload()
+
+        assert self.get_result((3, 0, 0)) == 10
+
+        self.kernel.refresh([(2, 0, 0)])
+        assert self.get_result((3, 0, 0)) == 20
+
+        self.kernel.refresh()
+        assert self.get_result((3, 0, 0)) == 30
+
+        self.code_array.cell_attributes.pop()
+
+    def test_press_button(self):
+        """Unit test for executing button cells in the kernel"""
+
+        self.code_array.macros = "counter = []"
+        self.code_array[2, 0, 0] = "counter.append(1)"
+        self.code_array[3, 0, 0] = "len(counter)"
+        self.code_array.cell_attributes.append(CellAttribute(
+            Selection([], [], [], [], [(2, 0)]), 0,
+            AttrDict([("button_cell", "Press")])))
+        self.kernel.reload()
+
+        assert self.get_result((3, 0, 0)) == 0
+
+        self.kernel.press_button((2, 0, 0))
+        assert self.get_result((3, 0, 0)) == 1
+
+        self.code_array.cell_attributes.pop()
+
+    def test_restart(self):
+        """Unit test for restarting a blocked kernel"""
+
+        self.code_array[2, 0, 0] = "while True: pass\n0"
+        self.code_array[2, 0, 0]
+        self.kernel.poll()
+
+        self.kernel.restart()
+
+        assert self.kernel.running
+        assert not self.kernel.results
+        assert self.get_result((1, 0, 0)) == 43
+
+    def test_unpicklable(self):
+        """Unit test for results that cannot be pickled"""
+
+        self.code_array[2, 0, 0] = "lambda: 0"
+
+        assert self.get_result((2, 0, 0)).startswith("<function <lambda>")
+
+    def test_parallel_recalculation(self):
+        """Unit test that parallel recalculation is skipped in kernel mode"""
+
+        assert ParallelRecalculation(self.code_array).run() == 0
+        assert not self.code_array.result_cache
@@ -33,10 +33,14 @@ from builtins import str
 from builtins import range
 from builtins import object
 
+from copy import copy
 import fractions  # Yes, it is required
 import math  # Yes, it is required
+from itertools import product
 from os.path import abspath, dirname, join
 import sys
+import threading
+import time
 
 import pytest
 import numpy
@@ -45,7 +49,8 @@ pyspread_path = abspath(join(dirname(__file__) + "/../.."))
 sys.path.insert(0, pyspread_path)
 
 from model.model import (KeyValueStore, CellAttributes, DictGrid, DataArray,
-                         CodeArray, CellAttribute, DefaultCellAttributeDict)
+                         CodeArray, CellAttribute, DefaultCellAttributeDict,
+                         ChainNamespace, SharedCellAttributeDict)
 
 from lib.attrdict import AttrDict
 from lib.selection import Selection
@@ -56,6 +61,8 @@ class Settings:
     """Simulates settings class"""
 
     timeout = 1000
+    recalculation_timeout = 0
+    result_cache_size = 100
 
 
 class TestKeyValueStore(object):
@@ -140,6 +147,247 @@ class TestCellAttributes(object):
         # Cell 2. 2, 0 is merged to cell 2, 2, 0
         assert self.cell_attr.get_merging_cell((2, 2, 0)) == (2, 2, 0)
 
+    def test_get_merging_cell_changes(self):
+        """Test get_merging_cell after merge areas are changed"""
+
+        def merge(top, left, bottom, right, table=0):
+            selection = Selection([(top, left)], [(bottom, right)], [], [],
+                                  [])
+            attr = AttrDict([("merge_area", (top, left, bottom, right))])
+            return CellAttribute(selection, table, attr)
+
+        self.cell_attr.append(merge(2, 2, 5, 5))
+        assert self.cell_attr.get_merging_cell((6, 6, 0)) is None
+
+        # The first merge area that contains a cell merges it
+        self.cell_attr.append(merge(4, 4, 9, 9))
+        assert self.cell_attr.get_merging_cell((5, 5, 0)) == (2, 2, 0)
+        assert self.cell_attr.get_merging_cell((6, 6, 0)) == (4, 4, 0)
+
+        self.cell_attr[0] = merge(3, 3, 4, 4, table=1)
+        assert self.cell_attr.get_merging_cell((5, 5, 0)) == (4, 4, 0)
+        assert self.cell_attr.get_merging_cell((4, 4, 1)) == (3, 3, 1)
+
+        self.cell_attr.pop()
+        assert self.cell_attr.get_merging_cell((5, 5, 0)) is None
+
+    def test_cache_invalidation(self):
+        """Test that changes only invalidate cells that they cover"""
+
+        block = Selection([(0, 0)], [(9, 9)], [], [], [])
+        cell = Selection([], [], [], [], [(5, 5)])
+
+        self.cell_attr.append(CellAttribute(block, 0,
+                                            AttrDict([("angle", 1.0)])))
+        outside = self.cell_attr[20, 20, 0]
+        other_table = self.cell_attr[5, 5, 1]
+        assert self.cell_attr[5, 5, 0].angle == 1.0
+
+        self.cell_attr.append(CellAttribute(cell, 0,
+                                            AttrDict([("angle", 2.0)])))
+
+        assert self.cell_attr._attr_cache[0][20][20] is outside
+        assert self.cell_attr._attr_cache[1][5][5] is other_table
+        assert 5 not in self.cell_attr._attr_cache[0]
+        assert self.cell_attr[5, 5, 0].angle == 2.0
+
+        self.cell_attr[0] = CellAttribute(block, 0,
+                                          AttrDict([("angle", 3.0)]))
+        assert self.cell_attr[4, 4, 0].angle == 3.0
+        assert self.cell_attr[5, 5, 0].angle == 2.0
+
+        self.cell_attr.pop()
+        assert self.cell_attr[5, 5, 0].angle == 3.0
+        assert self.cell_attr._attr_cache[0][20][20] is outside
+
+        self.cell_attr.pop(0)
+        assert self.cell_attr[5, 5, 0].angle == 0.0
+
+        # Cells between the rectangles of a selection are kept
+        cells = Selection([], [], [], [], [(0, 0), (50, 50)])
+        self.cell_attr.append(CellAttribute(cells, 0,
+                                            AttrDict([("angle", 5.0)])))
+        assert self.cell_attr._attr_cache[0][20][20] is outside
+        assert self.cell_attr[50, 50, 0].angle == 5.0
+
+        # Unbounded selections visit the cached cells
+        column = Selection([], [], [], [20], [])
+        self.cell_attr.append(CellAttribute(column, 0,
+                                            AttrDict([("angle", 6.0)])))
+        assert 20 not in self.cell_attr._attr_cache[0]
+        assert self.cell_attr[50, 50, 0].angle == 5.0
+        assert self.cell_attr[20, 20, 0].angle == 6.0
+        self.cell_attr.pop()
+        self.cell_attr.pop()
+
+        self.cell_attr.append(CellAttribute(block, 0,
+                                            AttrDict([("angle", 4.0)])))
+        assert self.cell_attr[5, 5, 0].angle == 4.0
+        del self.cell_attr[:]
+        assert self.cell_attr[5, 5, 0].angle == 0.0
+
+    def test_compacted(self):
+        """Test compacted"""
+
+        block = Selection([(0, 0)], [(9, 9)], [], [], [])
+        cell = Selection([], [], [], [], [(3, 3)])
+        row = Selection([], [], [20], [], [])
+        merging = Selection([], [], [], [], [(5, 5)])
+
+        layers = [
+            (cell, 0, AttrDict([("angle", 1.0), ("underline", True)])),
+            (block, 0, AttrDict([("angle", 2.0)])),
+            (cell, 1, AttrDict([("angle", 3.0)])),
+            (cell, 0, AttrDict()),
+            (merging, 0, AttrDict([("merge_area", (5, 5, 6, 6))])),
+            (block, 0, AttrDict([("pointsize", 12)])),
+            (block, 0, AttrDict([("bgcolor", (0, 0, 0))])),
+            (row, 0, AttrDict([("bgcolor", (0, 0, 0))])),
+        ]
+        for selection, table, attr in layers:
+            self.cell_attr.append(CellAttribute(selection, table, attr))
+
+        keys = list(product(range(22), range(11), range(2)))
+        formats = [self.cell_attr[key] for key in keys]
+
+        compacted = self.cell_attr.compacted()
+
+        assert list(compacted) == [
+            (cell, 0, AttrDict([("underline", True)])),
+            (block, 0, AttrDict([("angle", 2.0)])),
+            (cell, 1, AttrDict([("angle", 3.0)])),
+            (merging, 0, AttrDict([("merge_area", (5, 5, 6, 6))])),
+            (block, 0, AttrDict([("pointsize", 12), ("bgcolor", (0, 0, 0))])),
+            (row, 0, AttrDict([("bgcolor", (0, 0, 0))])),
+        ]
+        assert [compacted[key] for key in keys] == formats
+        assert len(self.cell_attr) == len(layers)
+
+        assert self.cell_attr.compact() == 2
+        assert [self.cell_attr[key] for key in keys] == formats
+        assert self.cell_attr.get_merging_cell((6, 6, 0)) == (5, 5, 0)
+
+    def test_compacted_joins_selections(self):
+        """Test that compacted joins layers with equal attributes"""
+
+        attr = AttrDict([("bgcolor", (255, 0, 0))])
+        for row in range(3):
+            selection = Selection([], [], [], [], [(row, 0)])
+            self.cell_attr.append(CellAttribute(selection, 0, attr))
+
+        compacted = self.cell_attr.compacted()
+
+        assert list(compacted) == [
+            (Selection([], [], [], [], [(0, 0), (1, 0), (2, 0)]), 0, attr)]
+
+    def test_shared_attr_dicts(self):
+        """Test that cells with equal formats share immutable attributes"""
+
+        block = Selection([(0, 0)], [(9, 9)], [], [], [])
+        cell = Selection([], [], [], [], [(3, 3)])
+        self.cell_attr.append(CellAttribute(block, 0,
+                                            AttrDict([("angle", 1.0)])))
+        self.cell_attr.append(CellAttribute(cell, 0,
+                                            AttrDict([("angle", 1.0)])))
+
+        attr = self.cell_attr[0, 0, 0]
+        assert self.cell_attr[9, 9, 0] is attr
+        assert self.cell_attr[3, 3, 0] is attr
+        assert self.cell_attr[10, 10, 0] is not attr
+        assert self.cell_attr[10, 10, 0] is self.cell_attr[0, 0, 1]
+        assert attr.angle == 1.0
+
+        with pytest.raises(TypeError):
+            attr.angle = 2.0
+        with pytest.raises(TypeError):
+            attr["angle"] = 2.0
+        with pytest.raises(TypeError):
+            attr.update(angle=2.0)
+
+        attr_copy = copy(attr)
+        attr_copy.angle = 2.0
+        assert attr_copy.angle == 2.0 and attr.angle == 1.0
+
+        # Equal formats have equal hashes
+        assert hash(attr) == hash(SharedCellAttributeDict(attr))
+        assert hash(attr) != hash(self.cell_attr[10, 10, 0])
+        with pytest.raises(AttributeError):
+            attr.unknown_attribute
+
+        unhashable = SharedCellAttributeDict(AttrDict([("angle", [])]))
+        with pytest.raises(TypeError):
+            hash(unhashable)
+
+    def test_threads(self):
+        """Test that layers can be changed while other threads read"""
+
+        errors = []
+        done = threading.Event()
+
+        def read():
+            try:
+                while not done.is_set():
+                    for row in range(20):
+                        self.cell_attr[row, row, 0]
+            except Exception as error:
+                errors.append(error)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+
+        try:
+            for i in range(300):
+                selection = Selection([], [], [], [], [(i % 20, i % 20)])
+                self.cell_attr.append(CellAttribute(
+                    selection, 0, AttrDict([("angle", float(i))])))
+                if i % 3:
+                    self.cell_attr.pop(0)
+        finally:
+            done.set()
+            reader.join()
+
+        assert not errors
+
+    def test_copy(self):
+        """Test that copies do not share caches"""
+
+        selection = Selection([], [], [], [], [(1, 1)])
+        self.cell_attr.append(CellAttribute(selection, 0,
+                                            AttrDict([("angle", 1.0)])))
+        self.cell_attr[1, 1, 0]
+
+        cell_attr_copy = copy(self.cell_attr)
+        cell_attr_copy.pop()
+
+        assert cell_attr_copy[1, 1, 0].angle == 0.0
+        assert self.cell_attr[1, 1, 0].angle == 1.0
+        assert not CellAttributes()._attr_cache
+
+
+class TestChainNamespace(object):
+    """Unit tests for ChainNamespace"""
+
+    def test_missing(self):
+        """Unit test for looking up names in the parent namespace"""
+
+        parent = {"a": 1, "b": 2}
+        namespace = ChainNamespace(parent, {"b": 3})
+
+        assert namespace["a"] == 1
+        assert namespace["b"] == 3
+        with pytest.raises(KeyError):
+            namespace["c"]
+
+    def test_commit(self):
+        """Unit test for commit"""
+
+        parent = {"a": 1}
+        namespace = ChainNamespace(parent, {"b": 3})
+        namespace["c"] = 4
+        namespace.commit()
+
+        assert parent == {"a": 1, "c": 4}
+
 
 class TestDictGrid(object):
     """Unit tests for DictGrid"""
@@ -412,6 +660,132 @@ class TestCodeArray(object):
         for key in res_data:
             assert res_data[key] == self.code_array(key)
 
+    def test_literals(self):
+        """Unit test for returning constant cells without evaluation"""
+
+        self.code_array[0, 0, 0] = "'abc'"
+        self.code_array[1, 0, 0] = "-2.5"
+        self.code_array[2, 0, 0] = "S[1, 0, 0] * 2"
+
+        def exec_then_eval(code, _globals=None, _locals=None):
+            assert code == "S[1, 0, 0] * 2"
+            return CodeArray.exec_then_eval(self.code_array, code, _globals,
+                                            _locals)
+
+        self.code_array.exec_then_eval = exec_then_eval
+
+        assert self.code_array[0, 0, 0] == "abc"
+        assert self.code_array[2, 0, 0] == -5.0
+        assert (2, 0, 0) not in self.code_array.dict_grid.literals
+
+        self.code_array[1, 0, 0] = "4"
+        assert self.code_array[2, 0, 0] == 8
+
+        # Codes that are set directly are evaluated
+        self.code_array.dict_grid[1, 0, 0] = "1 + 1"
+        assert self.code_array.dict_grid.lookup_literal((1, 0, 0)) \
+            == (False, 4)
+
+        self.code_array.pop((0, 0, 0))
+        assert (0, 0, 0) not in self.code_array.dict_grid.literals
+
+        self.code_array.safe_mode = True
+        assert self.code_array[1, 0, 0] == "1 + 1"
+
+    def test_manual_calculation(self):
+        """Unit test for manual calculation mode and recalculate"""
+
+        self.code_array[0, 0, 0] = "1 + 1"
+        self.code_array[1, 0, 0] = "S[0, 0, 0] * 10"
+        self.code_array[2, 0, 0] = "S[1, 0, 0] + 1"
+        self.code_array[0, 0, 1] = "S[0, 0, 0] - 1"
+
+        assert self.code_array[2, 0, 0] == 21
+        assert self.code_array[0, 0, 1] == 1
+
+        self.code_array.manual_calculation = True
+        self.code_array[0, 0, 0] = "2 + 2"
+
+        assert self.code_array[0, 0, 0] == 4
+        assert self.code_array[2, 0, 0] == 21
+        assert self.code_array.dirty == {(1, 0, 0), (2, 0, 0), (0, 0, 1)}
+
+        selection = Selection([], [], [], [], [(2, 0)])
+        assert self.code_array.recalculate(0, selection) == [(2, 0, 0)]
+        assert self.code_array[2, 0, 0] == 21
+        assert self.code_array.dirty == {(1, 0, 0), (0, 0, 1)}
+
+        assert self.code_array.recalculate(0) == [(1, 0, 0)]
+        assert self.code_array[1, 0, 0] == 40
+        assert self.code_array[0, 0, 1] == 1
+        assert self.code_array.dirty == {(2, 0, 0), (0, 0, 1)}
+
+        assert self.code_array.recalculate() == [(0, 0, 1), (2, 0, 0)]
+        assert not self.code_array.dirty
+        assert self.code_array[0, 0, 1] == 3
+        assert self.code_array[2, 0, 0] == 41
+
+        self.code_array[0, 0, 0] = "3"
+        self.code_array.manual_calculation = False
+
+        assert not self.code_array.dirty
+        assert self.code_array[2, 0, 0] == 31
+
+        self.code_array.manual_calculation = True
+        self.code_array[0, 0, 0] = "4"
+        assert self.code_array.dirty
+
+        self.code_array.reset_results()
+
+        assert not self.code_array.dirty
+        assert not self.code_array.result_cache
+        assert not self.code_array.dependency_graph.dependents
+        self.code_array.manual_calculation = False
+
+    def test_volatile(self):
+        """Unit test for refreshing only volatile cells and dependents"""
+
+        self.code_array[0, 0, 0] = "[1]"
+        self.code_array[1, 0, 0] = "volatile(S[0, 0, 0] + [2])"
+        self.code_array[2, 0, 0] = "S[1, 0, 0] + [3]"
+        self.code_array[3, 0, 0] = "roll()"
+
+        self.code_array.macros = \
+            "import random\ndef roll(): return random.random()"
+        self.code_array.execute_macros()
+
+        for row in range(4):
+            self.code_array[row, 0, 0]
+
+        assert self.code_array.volatile_keys == {(1, 0, 0), (3, 0, 0)}
+
+        self.code_array.invalidate_volatile([(1, 0, 0)])
+
+        assert set(self.code_array.result_cache) == {(0, 0, 0), (3, 0, 0)}
+
+        self.code_array.invalidate_volatile()
+
+        assert set(self.code_array.result_cache) == {(0, 0, 0)}
+
+    def test_execute_macros_invalidation(self):
+        """Unit test for keeping pure results when macros are executed"""
+
+        self.code_array[0, 0, 0] = "[1]"
+        self.code_array[1, 0, 0] = "f(2)"
+        self.code_array[2, 0, 0] = "g(3)"
+
+        self.code_array.macros = "def f(x): return x\ndef g(x): return x"
+        self.code_array.execute_macros()
+
+        for row in range(3):
+            self.code_array[row, 0, 0]
+
+        self.code_array.macros = "def f(x): return 2 * x"
+        self.code_array.execute_macros()
+
+        assert set(self.code_array.result_cache) == {(0, 0, 0), (2, 0, 0)}
+        assert self.code_array[1, 0, 0] == 4
+
     def test_slicing(self):
         """Unit test for __getitem__ and __setitem__"""
 
@@ -467,6 +841,88 @@ class TestCodeArray(object):
 
         assert filled_grid[1, 0, 0] == sum(numpy.arange(0, 10, 0.1))
 
+    def test_incremental_invalidation(self):
+        """Unit test for dependency based result cache invalidation"""
+
+        code_array = self.code_array
+
+        code_array[0, 0, 0] = "1"
+        code_array[1, 0, 0] = "S[0, 0, 0] + 1"
+        code_array[2, 0, 0] = "S[X-1, Y, Z] * 10"
+        code_array[3, 0, 0] = "sum(S[0:3, 0, 0])"
+        code_array[0, 1, 0] = "10 * 10"
+        code_array[1, 1, 0] = "a = 5"
+        code_array[2, 1, 0] = "a + 1"
+
+        assert code_array[3, 0, 0] == 1 + 2 + 20
+        assert code_array[0, 1, 0] == 100
+        assert code_array[1, 1, 0] == 5
+        assert code_array[2, 1, 0] == 6
+
+        code_array[0, 0, 0] = "2"
+
+        assert (0, 1, 0) in code_array.result_cache
+        assert (2, 1, 0) in code_array.result_cache
+        for key in [(0, 0, 0), (1, 0, 0), (2, 0, 0), (3, 0, 0)]:
+            assert key not in code_array.result_cache
+
+        assert code_array[3, 0, 0] == 2 + 3 + 30
+
+        code_array[1, 1, 0] = "a = 7"
+
+        assert (2, 1, 0) not in code_array.result_cache
+        assert (3, 0, 0) in code_array.result_cache
+
+    param_test_read_range = [
+        (["1", "2", "3"], numpy.int64, [1, 2, 3]),
+        (["1.5", "2.5", "numpy.float32(3)"], numpy.float64, [1.5, 2.5, 3]),
+        (["True", "False", "numpy.bool_(1)"], numpy.bool_,
+         [True, False, True]),
+        (["1", "2.5", "3"], object, [1, 2.5, 3]),
+        (["1", "True", "3"], object, [1, True, 3]),
+        (["1", None, "3"], object, [1, None, 3]),
+        (["2**63", "1", "1"], object, [2**63, 1, 1]),
+        (["'a'", "1", "1"], object, ["a", 1, 1]),
+    ]
+
+    @pytest.mark.parametrize("codes, dtype, res", param_test_read_range)
+    def test_read_range(self, codes, dtype, res):
+        """Unit test for read_range"""
+
+        for row, code in enumerate(codes):
+            self.code_array[row, 0, 0] = code
+
+        result = self.code_array.read_range((slice(0, 3), 0, 0), compact=True)
+
+        assert result.dtype == dtype
+        assert result.tolist() == res
+
+        # Slices keep the objects that the cells return
+        result = self.code_array[0:3, 0, 0]
+
+        assert result.dtype == object
+        assert [type(ele) for ele in result] == \
+            [type(self.code_array[row, 0, 0]) for row in range(3)]
+
+    def test_read_range_2d(self):
+        """Unit test for read_range with two slices"""
+
+        for row, column in product(range(3), range(2)):
+            self.code_array[row, column, 1] = str(row * 10 + column)
+        self.code_array[3, 0, 0] = "S[0:3, 0:2, 1].sum(axis=0)"
+
+        result = self.code_array[0:3, 0:2, 1]
+
+        assert result.shape == (3, 2)
+        assert result.dtype == object
+        assert self.code_array[3, 0, 0].tolist() == [30, 33]
+
+        result = self.code_array.read_range((slice(0, 3), slice(0, 2), 1),
+                                            compact=True)
+
+        assert result.shape == (3, 2)
+        assert result.dtype == numpy.int64
+
     def test_make_nested_list(self):
         """Unit test for _make_nested_list"""
 
@@ -492,6 +948,219 @@ class TestCodeArray(object):
         self.code_array[key] = code
         assert self.code_array._eval_cell(key, code) == res
 
+    def test_result_cache(self):
+        """Unit test for result cache keys, statistics and memory budget"""
+
+        result_cache = self.code_array.result_cache
+
+        self.code_array[0, 0, 0] = "numpy.zeros(2**20)"
+        self.code_array[1, 0, 0] = "numpy.zeros(2**20)"
+
+        self.code_array[0, 0, 0]
+        self.code_array[0, 0, 0]
+
+        assert list(result_cache) == [(0, 0, 0)]
+        assert result_cache.hits == result_cache.misses == 1
+        assert result_cache.nbytes >= 8 * 2**20
+
+        result_cache.maxbytes = 10 * 2**20
+        self.code_array[1, 0, 0]
+
+        assert list(result_cache) == [(1, 0, 0)]
+
+    def test_timeout(self):
+        """Unit test for cell and recalculation timeouts"""
+
+        self.code_array.settings.timeout = 50
+        self.code_array.settings.recalculation_timeout = 50
+
+        self.code_array[0, 0, 0] = "while True: pass\n0"
+        self.code_array[1, 0, 0] = "1"
+
+        result = self.code_array[0, 0, 0]
+
+        assert isinstance(result, RuntimeError)
+        assert str(result) == "Timeout after 50 ms."
+        assert self.code_array[1, 0, 0] == 1
+
+        self.code_array.settings.timeout = 0
+        self.code_array.result_cache.clear()
+
+        with self.code_array.recalculation():
+            result = self.code_array[0, 0, 0]
+
+        assert str(result) == "Recalculation timeout after 50 ms."
+        assert (0, 0, 0) not in self.code_array.result_cache
+
+    def test_awaitables(self):
+        """Unit test for cells that return awaitables"""
+
+        self.code_array.macros = \
+            "async def delayed(x):\n    await asyncio.sleep(0.05)\n    " \
+            "return x"
+        self.code_array.execute_macros()
+
+        self.code_array[0, 0, 0] = "delayed(21)"
+        self.code_array[1, 0, 0] = "S[0, 0, 0] * 2"
+        self.code_array[2, 0, 0] = "asyncio.sleep(5)"
+
+        assert repr(self.code_array[0, 0, 0]) == "Pending..."
+        assert isinstance(self.code_array[1, 0, 0], Exception)
+
+        self.code_array.settings.timeout = 100
+        self.code_array[2, 0, 0]
+
+        notifications = []
+        self.code_array.awaitable_done_callback = \
+            lambda: notifications.append(True)
+
+        keys = self.code_array.wait_for_awaitables(2)
+
+        assert sorted(keys) == [(0, 0, 0), (1, 0, 0), (2, 0, 0)]
+        assert len(notifications) >= 1
+        assert self.code_array[0, 0, 0] == 21
+        assert self.code_array[1, 0, 0] == 42
+        assert str(self.code_array[2, 0, 0]) == "Timeout after 100 ms."
+
+        # Results of outdated code are discarded
+        self.code_array[0, 0, 0] = "delayed(1)"
+        self.code_array[0, 0, 0]
+        self.code_array[0, 0, 0] = "5"
+
+        assert self.code_array.wait_for_awaitables(2) == []
+        assert self.code_array[0, 0, 0] == 5
+
+    def test_awaitables_lock(self):
+        """Unit test that awaitables access cells while holding the lock"""
+
+        self.code_array.macros = \
+            "async def later(cells):\n    await asyncio.sleep(0.01)\n" \
+            "    return cells[1, 0, 0] + 1"
+        self.code_array.execute_macros()
+
+        self.code_array[0, 0, 0] = "later(S)"
+        self.code_array[1, 0, 0] = "40 + 1"
+
+        with self.code_array.lock:
+            pending = self.code_array[0, 0, 0]
+            # The awaitable waits for the lock after its await
+            assert not pending.future.done()
+            time.sleep(0.1)
+            assert not pending.future.done()
+
+        assert self.code_array.wait_for_awaitables(2) == [(0, 0, 0)]
+        assert self.code_array[0, 0, 0] == 42
+
+    def test_range_functions(self):
+        """Unit test for range functions in the cell namespace"""
+
+        self.code_array.aggregate_block_size = 4
+
+        for row in range(10):
+            self.code_array[row, 0, 0] = str(row)
+        self.code_array[3, 0, 0] = "'text'"
+
+        self.code_array[0, 1, 0] = "SUM[0:10, 0, 0]"
+        self.code_array[1, 1, 0] = "MEAN[:, 0, 0]"
+        self.code_array[2, 1, 0] = "MIN[2:9, 0, 0], MAX[2:9, 0, 0]"
+        self.code_array[3, 1, 0] = "COUNT[0:10:2, 0, 0]"
+        self.code_array[4, 1, 0] = "SUM(S[0:3, 0, 0], 10)"
+
+        assert self.code_array[0, 1, 0] == 42
+        assert self.code_array[1, 1, 0] == 42 / 9
+        assert self.code_array[2, 1, 0] == (2, 8)
+        assert self.code_array[3, 1, 0] == 5
+        assert self.code_array[4, 1, 0] == 13
+
+        # Only the block of the changed cell is aggregated again
+        block_nodes = [node for node in self.code_array.result_cache
+                       if isinstance(node, str)
+                       and node.startswith("aggregate")]
+        assert "aggregate(slice(4, 8, None), 0, 0)" in block_nodes
+
+        self.code_array[5, 0, 0] = "100"
+
+        assert "aggregate(slice(4, 8, None), 0, 0)" \
+            not in self.code_array.result_cache
+        assert "aggregate(slice(0, 4, None), 0, 0)" \
+            in self.code_array.result_cache
+        assert self.code_array[0, 1, 0] == 137
+        assert self.code_array[2, 1, 0] == (2, 100)
+
+    def test_range_functions_macros(self):
+        """Unit test for macros that define names of range functions"""
+
+        self.code_array.macros = "def SUM(*a): return 'macro SUM'"
+        self.code_array.execute_macros()
+
+        self.code_array[0, 0, 0] = "SUM(1, 2)"
+        self.code_array[1, 0, 0] = "MEAN(1, 2)"
+
+        assert self.code_array[0, 0, 0] == "macro SUM"
+        assert self.code_array[1, 0, 0] == 1.5
+
+        self.code_array.macros = "def SUM(*a): return 'other SUM'"
+        self.code_array.execute_macros()
+
+        assert self.code_array[0, 0, 0] == "other SUM"
+
+        self.code_array.clear_globals()
+        self.code_array.reset_results()
+
+        assert self.code_array[0, 0, 0] == 3
+
+    def test_profiler(self):
+        """Unit test for profiling cell evaluation"""
+
+        profiler = self.code_array.profiler
+
+        self.code_array[0, 0, 0] = "1 + 1"
+        self.code_array[1, 0, 0] = "S[0, 0, 0] * 21"
+
+        self.code_array[1, 0, 0]
+        assert not profiler.profiles
+
+        profiler.enabled = True
+        self.code_array.result_cache.clear()
+        self.code_array[1, 0, 0]
+
+        assert set(profiler.profiles) == {(0, 0, 0), (1, 0, 0)}
+        assert profiler.profiles[1, 0, 0].calls == 1
+        assert profiler.profiles[1, 0, 0].total_time >= \
+            profiler.profiles[0, 0, 0].total_time
+
+    def test_code_cache(self):
+        """Unit test for reusing compiled code in exec_then_eval"""
+
+        code_cache = self.code_array.code_cache
+        code = "a_cached = 21\na_cached * 2"
+
+        assert self.code_array.exec_then_eval(code) == 42
+
+        misses = code_cache.misses
+        hits = code_cache.hits
+
+        assert self.code_array.exec_then_eval(code) == 42
+        assert code_cache.misses == misses
+        assert code_cache.hits == hits + 1
+
+    def test_globals_layering(self):
+        """Unit test for evaluating cells on top of unmodified globals"""
+
+        code_array = self.code_array
+        code_array[0, 0, 0] = "b_layered = 3"
+        code_array[1, 0, 0] = "[b_layered + X + i for i in range(2)]"
+        code_array[2, 0, 0] = "c_layered = 1\nc_layered"
+
+        assert code_array[0, 0, 0] == 3
+        assert code_array[1, 0, 0] == [4, 5]
+        assert code_array[2, 0, 0] == 1
+
+        code_globals = code_array.get_globals()
+        assert code_globals["b_layered"] == 3
+        assert "c_layered" not in code_globals
+        assert code_globals.get("X") is None
+
     def test_execute_macros(self):
         """Unit test for execute_macros"""
 
@@ -500,6 +1169,27 @@ class TestCodeArray(object):
         assert self.code_array._eval_cell((0, 0, 0), "a") == 5
         assert self.code_array._eval_cell((0, 0, 0), "f(2)") == 4
 
+    def test_memo(self):
+        """Unit test for memoizing macro functions"""
+
+        self.code_array.macros = "@memo\ndef f(x): return x ** 2"
+        self.code_array.execute_macros()
+
+        assert self.code_array._eval_cell((0, 0, 0), "f(3)") == 9
+        assert self.code_array._eval_cell((1, 0, 0), "f(3)") == 9
+        assert self.code_array.memo.hits == 1
+        assert self.code_array.memo.misses == 1
+
+        self.code_array.macros = "@memo\ndef f(x): return x ** 3"
+        self.code_array.execute_macros()
+
+        assert self.code_array.memo.hits == 0
+        assert self.code_array._eval_cell((0, 0, 0), "f(3)") == 27
+
+        self.code_array.clear_globals()
+
+        assert not self.code_array.memo.cache
+
     def test_sorted_keys(self):
         """Unit test for _sorted_keys"""
 
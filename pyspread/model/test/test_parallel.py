@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+
+"""
+test_parallel
+=============
+
+Unit tests for parallel.py
+
+"""
+
+from ..model import CodeArray
+from ..parallel import ParallelRecalculation
+
+
+class Settings:
+    """Simulates settings class"""
+
+    timeout = 1000
+    recalculation_timeout = 0
+    result_cache_size = 100
+
+
+class TestParallelRecalculation:
+    """Unit tests for ParallelRecalculation"""
+
+    def setup_method(self, method):
+        """Creates empty CodeArray"""
+
+        self.code_array = CodeArray((100, 10, 3), Settings())
+        self.recalculation = ParallelRecalculation(self.code_array,
+                                                   max_workers=2)
+
+    def test_plan(self):
+        """Unit test for plan"""
+
+        self.code_array[0, 0, 0] = "1"
+        self.code_array[1, 0, 0] = "2"
+        self.code_array[0, 1, 0] = "S[X, 0, 0] + 1"
+        self.code_array[1, 1, 0] = "S[X, Y-1, Z] * 2"
+        self.code_array[0, 2, 0] = "sum(S[:, 1, 0])"
+        self.code_array[2, 0, 0] = "a = 1"
+        self.code_array[3, 0, 0] = "a + 1"
+        self.code_array[4, 0, 0] = "S[3, 0, 0]"
+        self.code_array[5, 0, 0] = "S[int('1'), 0, 0]"
+
+        self.recalculation.plan(self.code_array.keys())
+
+        assert self.recalculation.waves == [[(0, 0, 0), (1, 0, 0)],
+                                            [(0, 1, 0), (1, 1, 0)],
+                                            [(0, 2, 0)]]
+        assert self.recalculation.serial_keys == [(2, 0, 0), (3, 0, 0),
+                                                  (4, 0, 0), (5, 0, 0)]
+
+    def test_plan_cycle(self):
+        """Unit test for plan with cyclic references"""
+
+        self.code_array[0, 0, 0] = "S[1, 0, 0]"
+        self.code_array[1, 0, 0] = "S[0, 0, 0]"
+        self.code_array[2, 0, 0] = "3"
+
+        self.recalculation.plan(self.code_array.keys())
+
+        assert self.recalculation.waves == [[(2, 0, 0)]]
+        assert self.recalculation.serial_keys == [(0, 0, 0), (1, 0, 0)]
+
+    def test_run(self):
+        """Unit test for run"""
+
+        self.code_array.macros = "def f(x):\n    return 2 * x"
+        self.code_array.execute_macros()
+
+        self.code_array[0, 0, 0] = "f(21)"
+        self.code_array[1, 0, 0] = "S[0, 0, 0] + 1"
+        self.code_array[2, 0, 0] = "(i for i in range(3))"
+        self.code_array[3, 0, 0] = "b = 5"
+
+        assert self.recalculation.run() == 2
+
+        assert self.code_array.result_cache[0, 0, 0] == 42
+        assert self.code_array.result_cache[1, 0, 0] == 43
+        assert list(self.code_array[2, 0, 0]) == [0, 1, 2]
+        assert self.code_array[3, 0, 0] == 5
+
+        # Results of parallel evaluation are invalidated incrementally
+        self.code_array[0, 0, 0] = "1"
+        assert self.code_array[1, 0, 0] == 2
+
+    def test_run_macro_cell_access(self):
+        """Unit test for run with macros that access cells"""
+
+        self.code_array.macros = "def g():\n    return S[0, 1, 0] * 2\n" \
+                                 "def h():\n    return g() + 1"
+        self.code_array.execute_macros()
+
+        self.code_array[0, 0, 0] = "g()"
+        self.code_array[1, 0, 0] = "h()"
+        self.code_array[0, 1, 0] = "4"
+
+        self.recalculation.plan(self.code_array.keys())
+        assert self.recalculation.serial_keys == [(0, 0, 0), (1, 0, 0)]
+
+        self.recalculation.run()
+
+        assert self.code_array[0, 0, 0] == 8
+        assert self.code_array[1, 0, 0] == 9
+
+        self.code_array[0, 1, 0] = "5"
+        assert self.code_array[0, 0, 0] == 10
+        assert self.code_array[1, 0, 0] == 11
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+
+"""
+test_snapshot
+=============
+
+Unit tests for snapshot.py
+
+"""
+
+import pytest
+
+from ..model import CodeArray
+from ..snapshot import get_snapshot_path, ResultSnapshot
+
+
+class Settings:
+    """Simulates settings class"""
+
+    timeout = 1000
+    recalculation_timeout = 0
+    result_cache_size = 100
+
+
+KEY = b"test key"
+
+
+def make_code_array(code: dict) -> CodeArray:
+    """Returns CodeArray with given cell code and evaluated cells
+
+    :param code: Maps cell key to code
+
+    """
+
+    code_array = CodeArray((100, 10, 3), Settings())
+    code_array.macros = "def f(x):\n    return 2 * x"
+    code_array.execute_macros()
+
+    for key, cell_code in code.items():
+        code_array[key] = cell_code
+    for key in code:
+        code_array[key]
+
+    return code_array
+
+
+CODE = {
+    (0, 0, 0): "f(21)",
+    (1, 0, 0): "S[0, 0, 0] + 1",
+    (2, 0, 0): "list(range(10000))",
+    (3, 0, 0): "S[int('1'), 0, 0]",
+}
+
+
+def test_get_snapshot_path(tmp_path):
+    """Unit test for get_snapshot_path"""
+
+    filepath = tmp_path / "test.pysu"
+
+    assert get_snapshot_path(filepath) == tmp_path / "test.pysu.results"
+
+
+class TestResultSnapshot:
+    """Unit tests for ResultSnapshot"""
+
+    def test_get_digest(self):
+        """Unit test for get_digest"""
+
+        code_array = make_code_array(CODE)
+        digest = ResultSnapshot(code_array).get_digest((1, 0, 0))
+
+        assert digest is not None
+        assert ResultSnapshot(code_array).get_digest((3, 0, 0)) is None
+
+        # Digest changes with referenced cells and macros
+        code_array[0, 0, 0] = "f(20)"
+        assert ResultSnapshot(code_array).get_digest((1, 0, 0)) != digest
+
+        code_array[0, 0, 0] = "f(21)"
+        assert ResultSnapshot(code_array).get_digest((1, 0, 0)) == digest
+
+        code_array.macros += "\n"
+        assert ResultSnapshot(code_array).get_digest((1, 0, 0)) != digest
+
+    def test_get_digest_cycle(self):
+        """Unit test for get_digest with reference cycle and long chain"""
+
+        code_array = make_code_array({})
+        code_array[0, 0, 0] = "S[1, 0, 0]"
+        code_array[1, 0, 0] = "S[0, 0, 0]"
+        for row in range(2, 100):
+            for column in range(10):
+                code_array[row, column, 0] = "S[X-1, Y, Z] + 1"
+
+        snapshot = ResultSnapshot(code_array)
+
+        assert snapshot.get_digest((0, 0, 0)) is None
+        assert snapshot.get_digest((99, 9, 0)) is not None
+
+    def test_write_read(self, tmp_path):
+        """Unit test for write and read"""
+
+        filepath = tmp_path / "test.pysu.results"
+        ResultSnapshot(make_code_array(CODE)).write(filepath, KEY, 2**20)
+
+        code = dict(CODE)
+        code[1, 0, 0] = "S[0, 0, 0] + 2"
+        code_array = CodeArray((100, 10, 3), Settings())
+        code_array.macros = "def f(x):\n    return 2 * x"
+        code_array.execute_macros()
+        for key, cell_code in code.items():
+            code_array[key] = cell_code
+
+        assert ResultSnapshot(code_array).read(filepath, KEY) == 2
+        assert set(code_array.result_cache) == {(0, 0, 0), (2, 0, 0)}
+        assert code_array[0, 0, 0] == 42
+        assert code_array[1, 0, 0] == 44
+
+        # Restored results are invalidated like evaluated results
+        code_array[0, 0, 0] = "1"
+        assert code_array[1, 0, 0] == 3
+
+    def test_write_read_volatile(self, tmp_path):
+        """Unit test that results of volatile cells are not restored"""
+
+        code = {
+            (0, 0, 0): "random.random()",
+            (1, 0, 0): "time.time()",
+            (2, 0, 0): "S[1, 0, 0] + 1",
+            (3, 0, 0): "now()",
+            (4, 0, 0): "f(21)",
+        }
+
+        def make_volatile_code_array():
+            code_array = CodeArray((100, 10, 3), Settings())
+            code_array.macros = "import random\nimport time\n" \
+                "def f(x):\n    return 2 * x\n" \
+                "def now():\n    return time.time()"
+            code_array.execute_macros()
+            for key, cell_code in code.items():
+                code_array[key] = cell_code
+            return code_array
+
+        code_array = make_volatile_code_array()
+        for key in code:
+            code_array[key]
+
+        snapshot = ResultSnapshot(code_array)
+        assert all(snapshot.get_digest(key) is None for key in list(code)[:4])
+
+        filepath = tmp_path / "test.pysu.results"
+        assert snapshot.write(filepath, KEY, 2**20) == 1
+
+        code_array = make_volatile_code_array()
+        assert ResultSnapshot(code_array).read(filepath, KEY) == 1
+        assert set(code_array.result_cache) == {(4, 0, 0)}
+
+    def test_write_read_macro_cell_access(self, tmp_path):
+        """Unit test for write and read with macros that access cells"""
+
+        def make_macro_code_array(value):
+            code_array = CodeArray((100, 10, 3), Settings())
+            code_array.macros = "def g():\n    return S[0, 1, 0] * 2"
+            code_array.execute_macros()
+            code_array[0, 0, 0] = "g()"
+            code_array[0, 1, 0] = value
+            return code_array
+
+        code_array = make_macro_code_array("2 + 2")
+        assert code_array[0, 0, 0] == 8
+        assert code_array[0, 1, 0] == 4
+
+        snapshot = ResultSnapshot(code_array)
+        assert snapshot.get_digest((0, 0, 0)) is None
+
+        filepath = tmp_path / "test.pysu.results"
+        assert snapshot.write(filepath, KEY, 2**20) == 1
+
+        code_array = make_macro_code_array("2 + 3")
+        assert ResultSnapshot(code_array).read(filepath, KEY) == 0
+        assert code_array[0, 0, 0] == 10
+
+    @pytest.mark.parametrize("maxbytes, restored", [(2**20, 3), (100, 2)])
+    def test_write_maxbytes(self, tmp_path, maxbytes, restored):
+        """Unit test for write with size limit"""
+
+        filepath = tmp_path / "test.pysu.results"
+        snapshot = ResultSnapshot(make_code_array(CODE))
+
+        assert snapshot.write(filepath, KEY, maxbytes) == restored
+
+    def test_read_invalid_signature(self, tmp_path):
+        """Unit test for read of a snapshot signed with another key"""
+
+        filepath = tmp_path / "test.pysu.results"
+        ResultSnapshot(make_code_array(CODE)).write(filepath, b"other", 2**20)
+
+        code_array = make_code_array({})
+        for key, cell_code in CODE.items():
+            code_array[key] = cell_code
+
+        assert ResultSnapshot(code_array).read(filepath, KEY) == 0
+        assert not code_array.result_cache
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+
+"""
+test_workbooks
+==============
+
+Unit tests for workbooks.py
+
+"""
+
+import os
+
+import pytest
+
+from ..model import CodeArray
+from ..workbooks import ExternalCodeArray, load_code_array, WorkbookCache
+from ...lib.hashing import sign
+
+PYSU = """[Pyspread save file version]
+2.0
+[shape]
+10\t5\t2
+[grid]
+0\t0\t0\t'a = 2'
+1\t0\t0\t'S[0, 0, 0] * 21'
+2\t2\t1\t'square(3)'
+3\t0\t0\t{}
+[attributes]
+[row_heights]
+[col_widths]
+[macros]
+def square(x):
+    return x * x
+"""
+
+
+class Settings:
+    """Simulates settings class"""
+
+    shape = 1000, 100, 3
+    timeout = 1000
+    recalculation_timeout = 0
+    result_cache_size = 100
+    signature_key = b"test key"
+
+    def __init__(self, last_file_input_path=None):
+        self.last_file_input_path = last_file_input_path
+
+
+def write_workbook(filepath, code: str = "'1'"):
+    """Writes signed pysu file
+
+    :param filepath: Path of pysu file
+    :param code: Code of cell (3, 0, 0) as Python literal
+
+    """
+
+    data = PYSU.format(code).encode("utf-8")
+    filepath.write_bytes(data)
+    signature_path = filepath.with_suffix(filepath.suffix + ".sig")
+    signature_path.write_bytes(sign(data, Settings.signature_key))
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    """Returns path of a signed pysu file"""
+
+    filepath = tmp_path / "external.pysu"
+    write_workbook(filepath)
+    return filepath
+
+
+def test_load_code_array(workbook):
+    """Unit test for load_code_array with ExternalCodeArray"""
+
+    code_array = load_code_array(workbook, Settings(), ExternalCodeArray)
+
+    assert isinstance(code_array, ExternalCodeArray)
+    assert code_array.shape == (10, 5, 2)
+    assert code_array((1, 0, 0)) == 'S[0, 0, 0] * 21'
+
+    with pytest.raises(TypeError):
+        code_array[0, 0, 0] = "1"
+    with pytest.raises(TypeError):
+        code_array.pop((0, 0, 0))
+
+
+class TestWorkbookCache:
+    """Unit tests for WorkbookCache"""
+
+    def setup_method(self):
+        """Creates empty WorkbookCache"""
+
+        self.workbook_cache = WorkbookCache()
+
+    def test_get(self, workbook):
+        """Unit test for get"""
+
+        code_array = self.workbook_cache.get(workbook, Settings())
+
+        assert code_array.filepath == workbook.resolve()
+        assert code_array[2, 2, 1] == 9
+        assert self.workbook_cache.get(workbook, Settings()) is code_array
+        assert len(self.workbook_cache) == 1
+
+        # Macros do not change the globals of other files
+        assert "square" in code_array.get_globals()
+        assert "square" not in CodeArray.get_globals(code_array)
+
+    def test_get_fresh_namespace(self, workbook):
+        """Unit test that workbooks do not see the globals of other files"""
+
+        model_globals = CodeArray.get_globals(None)
+        model_globals["referencing_macro"] = "secret"
+        try:
+            code_array = self.workbook_cache.get(workbook, Settings())
+        finally:
+            del model_globals["referencing_macro"]
+
+        assert "referencing_macro" not in code_array.get_globals()
+        assert "square" in code_array.get_globals()
+        assert "numpy" in code_array.get_globals()
+
+    def test_get_modified(self, workbook):
+        """Unit test for get with modified file"""
+
+        code_array = self.workbook_cache.get(workbook, Settings())
+        assert code_array[3, 0, 0] == 1
+
+        write_workbook(workbook, "'2'")
+        stat = workbook.stat()
+        os.utime(workbook, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        modified_code_array = self.workbook_cache.get(workbook, Settings())
+        assert modified_code_array is not code_array
+        assert modified_code_array[3, 0, 0] == 2
+
+    def test_get_unsigned(self, workbook):
+        """Unit test for get with unapproved file"""
+
+        workbook.with_suffix(".pysu.sig").unlink()
+
+        with pytest.raises(ValueError):
+            self.workbook_cache.get(workbook, Settings())
+        assert not self.workbook_cache.workbooks
+
+
+def test_open_workbook(workbook):
+    """Unit test for CodeArray.open_workbook and WB in cells"""
+
+    settings = Settings(workbook.with_name("host.pysu"))
+    code_array = CodeArray((10, 5, 1), settings)
+    code_array[0, 0, 0] = "WB('external.pysu')[1, 0, 0]"
+
+    assert code_array[0, 0, 0] == 42
+    assert (0, 0, 0) in code_array.volatile_keys
+
+    external = code_array.open_workbook(workbook)
+
+    # Only accessed cells and cells that assign globals are evaluated
+    assert (1, 0, 0) in external.result_cache
+    assert (2, 2, 1) not in external.result_cache
+
+
+def test_open_workbook_cyclic(workbook):
+    """Unit test for CodeArray.open_workbook with cyclic reference"""
+
+    write_workbook(workbook, "'b = WB(\"external.pysu\")[0, 0, 0]'")
+
+    code_array = CodeArray((10, 5, 1), Settings(workbook))
+    external = code_array.open_workbook(workbook)
+
+    # The reference fails while the workbook is loaded and works afterwards
+    assert external[3, 0, 0] == 2
+    assert external.get_globals()["b"] == 2
+
+
+def test_open_workbook_frozen_cache(workbook):
+    """Unit test that loading workbooks keeps frozen results of others"""
+
+    code_array = CodeArray((10, 5, 1), Settings(workbook))
+    code_array.frozen_cache["(0, 0, 0)"] = "frozen"
+
+    external = code_array.open_workbook(workbook)
+
+    assert external.frozen_cache is not code_array.frozen_cache
+    assert code_array.frozen_cache == {"(0, 0, 0)": "frozen"}
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Cross workbook references
+
+Cells access other pyspread files via ``WB("other.pysu")[0, 0, 0]``. Each
+file is loaded once per process into a read-only code array, which is
+shared by all referencing cells. Only the cells that are accessed are
+evaluated, and their results are cached in the external code array.
+
+A workbook is loaded again when the modification time of its file changes.
+Since cells that call ``WB`` are volatile, refreshing volatile cells picks
+up these changes.
+
+The macros of an external workbook are executed in a namespace of its own
+so that they do not change the globals of the referencing file.
+
+**Provides**
+
+ * :func:`load_code_array`
+ * :class:`ExternalCodeArray`
+ * :class:`WorkbookCache`
+ * :data:`workbook_cache`
+
+"""
+
+import bz2
+from pathlib import Path
+import threading
+from typing import Dict, Tuple, Union
+
+try:
+    from pyspread.interfaces.pys import PysReader
+    from pyspread.lib.hashing import verify
+    from pyspread.model.model import CodeArray
+except ImportError:
+    from interfaces.pys import PysReader
+    from lib.hashing import verify
+    from model.model import CodeArray
+
+
+def load_code_array(filepath: Path, settings,
+                    code_array_type: type = CodeArray) -> CodeArray:
+    """Returns code array with content of pys or pysu file
+
+    Raises ValueError if the file is not signed with the signature key from
+    settings because its code is not executed otherwise.
+
+    :param filepath: Path of pys or pysu file
+    :param settings: Settings that provide timeout and signature key
+    :param code_array_type: CodeArray or subclass that is returned
+
+    """
+
+    signature_path = filepath.with_suffix(filepath.suffix + '.sig')
+    try:
+        with open(filepath, "rb") as infile:
+            with open(signature_path, "rb") as sigfile:
+                is_signed = verify(infile.read(), sigfile.read(),
+                                   settings.signature_key)
+    except OSError:
+        is_signed = False
+
+    if not is_signed:
+        msg = "{} is not approved. Open and approve it in pyspread first."
+        raise ValueError(msg.format(filepath))
+
+    # File compression handling
+    if filepath.suffix == ".pysu":
+        fopen = open
+    else:
+        fopen = bz2.open
+
+    code_array = code_array_type(settings.shape, settings)
+
+    with fopen(filepath, "rb") as infile:
+        for _ in PysReader(infile, code_array):
+            pass
+
+    return code_array
+
+
+class ExternalCodeArray(CodeArray):
+    """Read-only code array of a workbook that other files reference
+
+    Cells and macros are evaluated in the namespace of the workbook instead
+    of the globals of the model module.
+
+    """
+
+    def __init__(self, shape: Tuple[int, int, int], settings):
+        """
+        :param shape: Shape of the grid
+        :param settings: Pyspread settings
+
+        """
+
+        super().__init__(shape, settings)
+
+        # Globals of the workbook, initially the names that the model module
+        # provides without the macros and cell globals of the current file
+        self.namespace = dict(super().get_globals())
+        self.clear_globals()
+
+        # Path of the workbook file, set by WorkbookCache
+        self.filepath = None
+
+    def __setitem__(self, key, value):
+        raise TypeError("External workbooks are read-only")
+
+    def pop(self, key):
+        raise TypeError("External workbooks are read-only")
+
+    @property
+    def workbook_directory(self) -> Path:
+        """Directory of the workbook file"""
+
+        if self.filepath is None:
+            return super().workbook_directory
+        return self.filepath.parent
+
+    def get_globals(self) -> dict:
+        """Returns namespace of the workbook"""
+
+        return self.namespace
+
+
+class WorkbookCache:
+    """Loads workbooks once and again when their files are modified"""
+
+    def __init__(self):
+        # Maps resolved file path to modification time and code array
+        self.workbooks: Dict[Path, Tuple[int, ExternalCodeArray]] = {}
+
+        # Files that are being loaded for detecting cyclic references
+        self._loading = set()
+
+        # Reentrant because loading executes cells that may open workbooks
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.workbooks)
+
+    def get(self, filepath: Union[Path, str], settings) -> ExternalCodeArray:
+        """Returns code array of the workbook, loads it if required
+
+        Raises OSError if the file cannot be accessed, ValueError if it is not
+        approved, if its macros fail or if workbooks reference each other.
+
+        :param filepath: Path of pys or pysu file
+        :param settings: Settings that provide timeout and signature key
+
+        """
+
+        filepath = Path(filepath).resolve()
+        mtime = filepath.stat().st_mtime_ns
+
+        with self._lock:
+            try:
+                loaded_mtime, code_array = self.workbooks[filepath]
+            except KeyError:
+                pass
+            else:
+                if loaded_mtime == mtime:
+                    return code_array
+
+            if filepath in self._loading:
+                msg = "Cyclic workbook reference to {}"
+                raise ValueError(msg.format(filepath))
+
+            self._loading.add(filepath)
+            try:
+                code_array = load_code_array(filepath, settings,
+                                             ExternalCodeArray)
+                code_array.filepath = filepath
+                _, errors = code_array.execute_macros()
+            finally:
+                self._loading.discard(filepath)
+
+            if errors:
+                raise ValueError("{}: {}".format(filepath, errors))
+
+            self.workbooks[filepath] = mtime, code_array
+            return code_array
+
+    def clear(self):
+        """Removes all loaded workbooks"""
+
+        with self._lock:
+            self.workbooks.clear()
+
+
+workbook_cache = WorkbookCache()
+"""Workbooks that cells of this process reference"""
@@ -123,6 +123,9 @@ class MacroPanel(QDialog):
 
         self.parent.grid.gui_update()
 
+        # Evaluate remaining cells in idle time, visible cells first
+        self.parent.evaluation_scheduler.start()
+
     def update(self):
         """Update macro content"""
 
@@ -37,7 +37,7 @@ pyspread
 import os
 import sys
 
-from PyQt5.QtCore import Qt, pyqtSignal, QEvent, QTimer, QRectF
+from PyQt5.QtCore import Qt, pyqtSignal, QEvent, QRectF
 from PyQt5.QtWidgets import (QWidget, QMainWindow, QApplication,
                              QMessageBox, QDockWidget, QUndoStack, QVBoxLayout,
                              QStyleOptionViewItem, QSplitter)
@@ -52,6 +52,7 @@ try:
     from pyspread.__init__ import VERSION, APP_NAME
     from pyspread.cli import PyspreadArgumentParser
     from pyspread.settings import Settings
+    from pyspread.headless import headless_main
     from pyspread.icons import Icon, IconPath
     from pyspread.grid import Grid
     from pyspread.grid_renderer import painter_save
@@ -64,15 +65,21 @@ try:
     from pyspread.widgets import Widgets
     from pyspread.dialogs import (ApproveWarningDialog, PreferencesDialog,
                                   ManualDialog, TutorialDialog,
-                                  PrintAreaDialog, PrintPreviewDialog)
+                                  PrintAreaDialog, PrintPreviewDialog,
+                                  HotCellsDialog)
     from pyspread.installer import DependenciesDialog
     from pyspread.panels import MacroPanel
     from pyspread.lib.hashing import genkey
+    from pyspread.lib.selection import Selection
     from pyspread.model.model import CellAttributes
+    from pyspread.model.parallel import ParallelRecalculation
+    from pyspread.scheduler import (EvaluationScheduler, FrozenCellRefresher,
+                                    AwaitableResultUpdater, KernelUpdater)
 except ImportError:
     from __init__ import VERSION, APP_NAME
     from cli import PyspreadArgumentParser
     from settings import Settings
+    from headless import headless_main
     from icons import Icon, IconPath
     from grid import Grid
     from grid_renderer import painter_save
@@ -83,11 +90,16 @@ except ImportError:
     from workflows import Workflows
     from widgets import Widgets
     from dialogs import (ApproveWarningDialog, PreferencesDialog, ManualDialog,
-                         TutorialDialog, PrintAreaDialog, PrintPreviewDialog)
+                         TutorialDialog, PrintAreaDialog, PrintPreviewDialog,
+                         HotCellsDialog)
     from installer import DependenciesDialog
     from panels import MacroPanel
     from lib.hashing import genkey
+    from lib.selection import Selection
     from model.model import CellAttributes
+    from model.parallel import ParallelRecalculation
+    from scheduler import (EvaluationScheduler, FrozenCellRefresher,
+                           AwaitableResultUpdater, KernelUpdater)
 
 
 LICENSE = "GNU GENERAL PUBLIC LICENSE Version 3"
@@ -116,7 +128,6 @@ class MainWindow(QMainWindow):
         self.settings = Settings(self, reset_settings=reset_settings)
         self.workflows = Workflows(self)
         self.undo_stack = QUndoStack(self)
-        self.refresh_timer = QTimer()
 
         self._init_widgets()
 
@@ -227,6 +238,11 @@ class MainWindow(QMainWindow):
 
         self.grids = [self.grid, self.grid_2, self.grid_3, self.grid_4]
 
+        self.evaluation_scheduler = EvaluationScheduler(self)
+        self.frozen_cell_refresher = FrozenCellRefresher(self)
+        self.awaitable_result_updater = AwaitableResultUpdater(self)
+        self.kernel_updater = KernelUpdater(self)
+
         self.macro_panel = MacroPanel(self, self.grid.model.code_array)
 
         self.main_panel = QWidget(self)
@@ -249,7 +265,6 @@ class MainWindow(QMainWindow):
 
         QApplication.instance().focusChanged.connect(self.on_focus_changed)
         self.gui_update.connect(self.on_gui_update)
-        self.refresh_timer.timeout.connect(self.on_refresh_timer)
 
     def _layout(self):
         """Layouts for main window"""
@@ -372,7 +387,7 @@ class MainWindow(QMainWindow):
             # Disable approval menu entry
             self.main_window_actions.approve.setEnabled(False)
             # Clear result cache
-            self.grid.model.code_array.result_cache.clear()
+            self.grid.model.code_array.reset_results()
             # Execute macros
             self.macro_panel.on_apply()
 
@@ -495,12 +510,134 @@ class MainWindow(QMainWindow):
     def on_clear_globals(self):
         """Clear globals event handler"""
 
-        self.grid.model.code_array.result_cache.clear()
+        self.grid.model.code_array.reset_results()
 
         # Clear globals
         self.grid.model.code_array.clear_globals()
         self.grid.model.code_array.reload_modules()
 
+    def on_recalculate_parallel(self):
+        """Recalculate in parallel event handler
+
+        In kernel mode, cells are evaluated in the kernel process instead.
+
+        """
+
+        code_array = self.grid.model.code_array
+
+        if code_array.kernel is not None:
+            self.statusBar().showMessage(
+                "Parallel recalculation is not available in kernel mode.")
+            return
+        code_array.reset_results()
+
+        self.evaluation_scheduler.cancel()
+
+        self.statusBar().showMessage("Recalculating cells in parallel...")
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            ParallelRecalculation(code_array).run()
+        finally:
+            QApplication.restoreOverrideCursor()
+            self.statusBar().clearMessage()
+
+        self.grid.gui_update()
+
+    def on_toggle_manual_calculation(self, toggled: bool):
+        """Toggle manual calculation mode event handler
+
+        Leaving manual calculation mode updates all dirty cells.
+
+        :param toggled: Toggle state
+
+        """
+
+        self.grid.model.code_array.manual_calculation = toggled
+
+        for grid in self.grids:
+            grid.viewport().update()
+
+    def on_recalculate(self):
+        """Recalculate dirty cells event handler"""
+
+        self._recalculate()
+
+    def on_recalculate_table(self):
+        """Recalculate dirty cells of current table event handler"""
+
+        self._recalculate(table=self.grid.table)
+
+    def on_recalculate_selection(self):
+        """Recalculate dirty selected cells event handler"""
+
+        self._recalculate(table=self.grid.table,
+                          selection=self.grid.selection)
+
+    def _recalculate(self, table: int = None, selection: Selection = None):
+        """Evaluates dirty cells in one batch and repaints the grids
+
+        :param table: Recalculate only cells of this table, None: all cells
+        :param selection: Recalculate only selected cells of table
+
+        """
+
+        self.evaluation_scheduler.cancel()
+
+        self.statusBar().showMessage("Recalculating cells...")
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            self.grid.model.code_array.recalculate(table, selection)
+        finally:
+            QApplication.restoreOverrideCursor()
+            self.statusBar().clearMessage()
+
+        for grid in self.grids:
+            grid.viewport().update()
+
+    def on_toggle_kernel(self, toggled: bool):
+        """Toggle kernel mode event handler
+
+        In kernel mode, cells are evaluated in a separate process, see
+        :class:`model.kernel.KernelClient`.
+
+        :param toggled: Toggle state
+
+        """
+
+        if toggled:
+            self.kernel_updater.start()
+        else:
+            self.kernel_updater.stop()
+
+    def on_restart_kernel(self):
+        """Restart kernel event handler, cancels running evaluations"""
+
+        self.kernel_updater.restart()
+
+    def on_toggle_profiler(self, toggled: bool):
+        """Toggle cell profiler event handler
+
+        Enabling the profiler discards old profiles and cached results so
+        that all visible cells are evaluated and recorded.
+
+        :param toggled: Toggle state
+
+        """
+
+        code_array = self.grid.model.code_array
+        code_array.profiler.enabled = toggled
+
+        if toggled:
+            code_array.profiler.clear()
+            code_array.reset_results()
+            self.grid.gui_update()
+
+    def on_hot_cells(self):
+        """Show hot cells dialog"""
+
+        dialog = HotCellsDialog(self)
+        dialog.show()
+
     def on_preferences(self):
         """Preferences event handler (:class:`dialogs.PreferencesDialog`) """
 
@@ -516,6 +653,10 @@ class MainWindow(QMainWindow):
                     data[key] = genkey()
                 self.settings.__setattr__(key, data[key])
 
+            # Apply memory budget of the result cache
+            self.grid.model.code_array.result_cache.maxbytes = \
+                self.settings.result_cache_size * 2**20
+
             # Immediately adjust file history in menu
             if max_file_history_changed:
                 self.menuBar().file_menu.history_submenu.update()
@@ -537,28 +678,19 @@ class MainWindow(QMainWindow):
         self.undo_stack.redo()
 
     def on_toggle_refresh_timer(self, toggled: bool):
-        """Toggles periodic timer for frozen cells
+        """Toggles periodic updates of frozen cells
+
+        Frozen cells are refreshed in worker threads, see
+        :class:`scheduler.FrozenCellRefresher`.
 
         :param toggled: Toggle state
 
         """
 
         if toggled:
-            self.refresh_timer.start(self.settings.refresh_timeout)
+            self.frozen_cell_refresher.start()
         else:
-            self.refresh_timer.stop()
-
-    def on_refresh_timer(self):
-        """Event handler for self.refresh_timer.timeout
-
-        Called for periodic updates of frozen cells.
-        Does nothing if either the entry_line or a cell editor is active.
-
-        """
-
-        if not self.entry_line.hasFocus() \
-           and self.grid.state() != self.grid.EditingState:
-            self.grid.refresh_frozen_cells()
+            self.frozen_cell_refresher.stop()
 
     def _toggle_widget(self, widget: QWidget, action_name: str, toggled: bool):
         """Toggles widget visibility and updates toggle actions
@@ -759,6 +891,10 @@ def main():
     parser = PyspreadArgumentParser()
     args, unknown = parser.parse_known_args()
 
+    if args.headless:
+        sys.exit(headless_main(args.headless, args.output_dir, args.format,
+                               args.jobs, args.reset_settings))
+
     app = QApplication(sys.argv)
     main_window = MainWindow(args.file, reset_settings=args.reset_settings)
 
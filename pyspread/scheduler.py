@@ -0,0 +1,597 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Cells are evaluated lazily when they are painted. After opening a file or
+applying macros, the :class:`EvaluationScheduler` evaluates the remaining
+cells in idle time so that scrolling and dependent cells are fast.
+
+Visible cells of the current table are evaluated first, then the other
+cells of the current table and finally all other cells. Each event loop
+iteration evaluates cells for at most `time_slice` seconds, so that the
+GUI stays responsive. Progress is shown in the statusbar, where the
+evaluation can be canceled.
+
+Frozen cells are refreshed periodically by the
+:class:`FrozenCellRefresher` on a thread pool, so that frozen cells that
+poll slow data sources do not block the GUI.
+
+Cells that return awaitables show a placeholder until the awaitable is
+done. The :class:`AwaitableResultUpdater` then shows the result.
+
+In kernel mode, cells are evaluated in a separate process. The
+:class:`KernelUpdater` exchanges requests and results with the kernel.
+
+**Provides**
+
+ * :class:`EvaluationScheduler`
+ * :class:`FrozenCellRefresher`
+ * :class:`AwaitableResultUpdater`
+ * :class:`KernelUpdater`
+ * :func:`update_viewports`
+
+"""
+
+from ast import literal_eval
+from concurrent.futures import ThreadPoolExecutor
+from heapq import heappop, heappush
+from time import monotonic, perf_counter
+from typing import Any, List, Tuple
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QMainWindow, QProgressBar, QPushButton
+
+try:
+    from pyspread.model.kernel import KernelClient
+except ImportError:
+    from model.kernel import KernelClient
+
+
+class EvaluationScheduler(QObject):
+    """Evaluates cells in idle time, visible cells of current table first"""
+
+    time_slice = 0.05
+    """Maximum duration of evaluations per event loop iteration in seconds"""
+
+    def __init__(self, main_window: QMainWindow):
+        """
+        :param main_window: Application main window
+
+        """
+
+        super().__init__(main_window)
+
+        self.main_window = main_window
+
+        self.keys = []
+        self.position = 0
+
+        # Timer with interval 0 fires whenever the event loop is idle
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.on_timeout)
+
+        self._init_widgets()
+
+    def _init_widgets(self):
+        """Creates progress bar and cancel button in the statusbar"""
+
+        statusbar = self.main_window.statusBar()
+
+        self.progress_bar = QProgressBar(statusbar)
+        self.progress_bar.setFormat("Evaluating cells %v / %m")
+        self.progress_bar.setMaximumWidth(250)
+        statusbar.addPermanentWidget(self.progress_bar)
+
+        self.cancel_button = QPushButton("Cancel", statusbar)
+        self.cancel_button.setToolTip("Cancel background evaluation of cells."
+                                      " Remaining cells are evaluated when "
+                                      "they are displayed.")
+        self.cancel_button.clicked.connect(self.cancel)
+        statusbar.addPermanentWidget(self.cancel_button)
+
+        self._show_widgets(False)
+
+    def _show_widgets(self, visible: bool):
+        """Shows or hides progress bar and cancel button
+
+        :param visible: Widgets are shown if True
+
+        """
+
+        self.progress_bar.setVisible(visible)
+        self.cancel_button.setVisible(visible)
+
+    @property
+    def running(self) -> bool:
+        """True if background evaluation is in progress"""
+
+        return self.timer.isActive()
+
+    def visible_keys(self) -> List[Tuple[int, int, int]]:
+        """Returns keys of the cells that are visible in the main grid"""
+
+        grid = self.main_window.grid
+        viewport = grid.viewport()
+        shape = grid.model.shape
+
+        top = max(grid.rowAt(0), 0)
+        bottom = grid.rowAt(viewport.height())
+        bottom = shape[0] - 1 if bottom == -1 else bottom
+        left = max(grid.columnAt(0), 0)
+        right = grid.columnAt(viewport.width())
+        right = shape[1] - 1 if right == -1 else right
+
+        return [(row, column, grid.table)
+                for row in range(top, bottom + 1)
+                for column in range(left, right + 1)]
+
+    def prioritized_keys(self) -> List[Tuple[int, int, int]]:
+        """Returns keys of all cells with code, highest priority first"""
+
+        code_array = self.main_window.grid.model.code_array
+        table = self.main_window.grid.table
+
+        visible_keys = [key for key in self.visible_keys()
+                        if key in code_array.dict_grid]
+        visible_key_set = set(visible_keys)
+
+        table_keys = []
+        other_keys = []
+        for key in code_array.dict_grid:
+            if key[2] != table:
+                other_keys.append(key)
+            elif key not in visible_key_set:
+                table_keys.append(key)
+
+        return visible_keys + table_keys + other_keys
+
+    def start(self):
+        """(Re-)starts background evaluation of all cells"""
+
+        self.cancel()
+
+        if self.main_window.safe_mode:
+            return
+
+        self.keys = self.prioritized_keys()
+        self.position = 0
+
+        if not self.keys:
+            return
+
+        self.progress_bar.setRange(0, len(self.keys))
+        self.progress_bar.setValue(0)
+        self._show_widgets(True)
+
+        self.timer.start(0)
+
+    def cancel(self):
+        """Stops background evaluation"""
+
+        self.timer.stop()
+        self.keys = []
+        self.position = 0
+        self._show_widgets(False)
+
+    def on_timeout(self):
+        """Evaluates cells for one time slice"""
+
+        code_array = self.main_window.grid.model.code_array
+
+        if code_array.safe_mode:
+            self.cancel()
+            return
+
+        end = perf_counter() + self.time_slice
+
+        while self.position < len(self.keys) and perf_counter() < end:
+            key = self.keys[self.position]
+            self.position += 1
+
+            # Cells may have been deleted or evaluated for painting meanwhile
+            if key in code_array.dict_grid \
+               and key not in code_array.result_cache:
+                code_array[key]
+
+        if self.position < len(self.keys):
+            self.progress_bar.setValue(self.position)
+        else:
+            self.cancel()
+
+
+class FrozenCellRefresher(QObject):
+    """Refreshes frozen cells periodically on a thread pool
+
+    The refresh interval of a frozen cell is its `refresh_interval` cell
+    attribute or `settings.refresh_timeout` if the attribute is not set,
+    both in milliseconds. Due times are kept in a priority queue. A cell is
+    scheduled again when its refresh has finished, so that slow cells do
+    not pile up.
+
+    Results are delivered to the GUI thread, where only the refreshed cell
+    and the cells that depend on it are invalidated and repainted. Results
+    of refreshes that have been submitted before refreshing was stopped are
+    discarded.
+
+    In kernel mode, frozen cells are not refreshed periodically because
+    they are evaluated in the kernel process. They are refreshed there on
+    request, see :meth:`grid.Grid.refresh_frozen_cells`.
+
+    Workers evaluate cells without holding the lock of the code array, so
+    that painting and other refreshes do not wait for slow data sources.
+    Cell accesses of frozen cells, e.g. S[0, 0, 0], take the lock. Results
+    are stored while holding the lock in the GUI thread.
+
+    """
+
+    max_workers = 4
+    """Number of worker threads"""
+
+    # Emitted from worker threads with cell key, code, result and generation
+    result_ready = pyqtSignal(object, str, object, int)
+
+    def __init__(self, main_window: QMainWindow):
+        """
+        :param main_window: Application main window
+
+        """
+
+        super().__init__(main_window)
+
+        self.main_window = main_window
+
+        self.executor = None
+
+        # Increased when refreshing is stopped, identifies submitted refreshes
+        self.generation = 0
+
+        # Heap of due time, cell key tuples
+        self.queue = []
+
+        # Keys of cells that are queued or refreshed
+        self.scheduled = set()
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.on_timeout)
+
+        self.result_ready.connect(self.on_result)
+
+    @property
+    def running(self) -> bool:
+        """True if periodic refreshing is active"""
+
+        return self.executor is not None
+
+    def start(self):
+        """Starts periodic refreshing of frozen cells"""
+
+        if self.running:
+            return
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="pyspread refresh")
+        self.on_timeout()
+
+    def stop(self):
+        """Stops periodic refreshing, running refreshes are discarded"""
+
+        self.timer.stop()
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+            self.generation += 1
+
+        self.queue.clear()
+        self.scheduled.clear()
+
+    def interval(self, key: Tuple[int, int, int]) -> float:
+        """Returns refresh interval of frozen cell in seconds
+
+        :param key: Key of frozen cell
+
+        """
+
+        code_array = self.main_window.grid.model.code_array
+
+        refresh_interval = code_array.cell_attributes[key].refresh_interval
+        if not refresh_interval:
+            refresh_interval = self.main_window.settings.refresh_timeout
+
+        return refresh_interval / 1000
+
+    def _schedule(self, key: Tuple[int, int, int], now: float):
+        """Queues key for the next refresh
+
+        :param key: Key of frozen cell
+        :param now: Current monotonic time
+
+        """
+
+        self.scheduled.add(key)
+        heappush(self.queue, (now + self.interval(key), key))
+
+    def _is_editing(self) -> bool:
+        """True if either the entry line or a cell editor is active"""
+
+        grid = self.main_window.grid
+
+        return self.main_window.entry_line.hasFocus() \
+            or grid.state() == grid.EditingState
+
+    def _restart_timer(self):
+        """Starts timer for the next due refresh
+
+        The timer fires at least every `settings.refresh_timeout` ms so that
+        newly frozen cells are picked up.
+
+        """
+
+        delay = self.main_window.settings.refresh_timeout / 1000
+        if self.queue:
+            delay = min(delay, self.queue[0][0] - monotonic())
+
+        self.timer.start(max(0, int(delay * 1000)))
+
+    def on_timeout(self):
+        """Submits refreshes of all due frozen cells to the thread pool"""
+
+        if not self.running:
+            return
+
+        code_array = self.main_window.grid.model.code_array
+        now = monotonic()
+
+        if code_array.kernel is not None:
+            self._restart_timer()
+            return
+
+        with code_array.lock:
+            frozen_keys = list(code_array.frozen_cache)
+
+        for repr_key in frozen_keys:
+            key = literal_eval(repr_key)
+            if key not in self.scheduled:
+                self._schedule(key, now)
+
+        while self.queue and self.queue[0][0] <= now:
+            _, key = heappop(self.queue)
+
+            code = code_array(key)
+            if code_array.safe_mode or code is None \
+               or not code_array.cell_attributes[key].frozen:
+                # Cell has been thawed or deleted
+                self.scheduled.discard(key)
+                continue
+
+            if self._is_editing():
+                self._schedule(key, now)
+                continue
+
+            self.executor.submit(self._refresh, code_array, key, code,
+                                 self.generation)
+
+        self._restart_timer()
+
+    def _refresh(self, code_array, key: Tuple[int, int, int], code: str,
+                 generation: int):
+        """Evaluates frozen cell, runs in a worker thread
+
+        The lock of the code array is not held, cell accesses take it.
+
+        :param code_array: Code array of the frozen cell
+        :param key: Key of frozen cell
+        :param code: Code of frozen cell
+        :param generation: Generation of refreshes at submission
+
+        """
+
+        with code_array._evaluating(None):
+            result = code_array._eval_cell(key, code)
+
+        self.result_ready.emit(key, code, result, generation)
+
+    def on_result(self, key: Tuple[int, int, int], code: str, result: Any,
+                  generation: int):
+        """Stores refreshed result and repaints affected cells
+
+        :param key: Key of refreshed cell
+        :param code: Code, for which the result has been evaluated
+        :param result: Refreshed result
+        :param generation: Generation of refreshes at submission
+
+        """
+
+        if not self.running or generation != self.generation:
+            # Refreshing has been stopped since the submission
+            return
+
+        code_array = self.main_window.grid.model.code_array
+
+        with code_array.lock:
+            if code_array(key) == code \
+               and code_array.cell_attributes[key].frozen:
+                code_array.frozen_cache[repr(key)] = result
+                self._update_cells(key)
+
+        self._schedule(key, monotonic())
+        self._restart_timer()
+
+    def _update_cells(self, key: Tuple[int, int, int]):
+        """Invalidates dependents of key and repaints them with key
+
+        :param key: Key of refreshed cell
+
+        """
+
+        code_array = self.main_window.grid.model.code_array
+
+        dependents = code_array.dependency_graph.get_dependents(key)
+        code_array._invalidate(key)
+
+        keys = [key] + [node for node in dependents
+                        if isinstance(node, tuple)]
+
+        update_viewports(self.main_window, keys)
+
+
+class AwaitableResultUpdater(QObject):
+    """Shows results of awaitables that cells return when they are done
+
+    Awaitables are run on a background event loop by the code array, which
+    emits :attr:`awaitable_done` from the event loop thread. The signal is
+    delivered in the GUI thread, where the results are applied.
+
+    """
+
+    awaitable_done = pyqtSignal()
+
+    def __init__(self, main_window: QMainWindow):
+        """
+        :param main_window: Application main window
+
+        """
+
+        super().__init__(main_window)
+
+        self.main_window = main_window
+
+        self.awaitable_done.connect(self.on_awaitable_done)
+
+        code_array = main_window.grid.model.code_array
+        code_array.awaitable_done_callback = self.awaitable_done.emit
+
+    def on_awaitable_done(self):
+        """Applies results of done awaitables and repaints their cells"""
+
+        code_array = self.main_window.grid.model.code_array
+
+        keys = code_array.apply_awaitable_results()
+        if keys:
+            update_viewports(self.main_window, keys)
+
+
+class KernelUpdater(QObject):
+    """Runs an evaluation kernel process and shows its results
+
+    The kernel connection is polled periodically, so that the GUI never
+    waits for evaluations.
+
+    """
+
+    interval = 10
+    """Polling interval in milliseconds"""
+
+    def __init__(self, main_window: QMainWindow):
+        """
+        :param main_window: Application main window
+
+        """
+
+        super().__init__(main_window)
+
+        self.main_window = main_window
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.interval)
+        self.timer.timeout.connect(self.on_timeout)
+
+    @property
+    def running(self) -> bool:
+        """True if cells are evaluated in a kernel process"""
+
+        return self.main_window.grid.model.code_array.kernel is not None
+
+    def start(self):
+        """Starts kernel process, which takes over cell evaluation"""
+
+        if self.running:
+            return
+
+        code_array = self.main_window.grid.model.code_array
+
+        kernel = KernelClient(code_array)
+        kernel.macro_output_callback = \
+            self.main_window.macro_panel.update_result_viewer
+        kernel.start()
+        code_array.kernel = kernel
+
+        self.timer.start()
+
+        for grid in self.main_window.grids:
+            grid.viewport().update()
+
+    def stop(self):
+        """Stops kernel process, cells are evaluated in the GUI process
+
+        The macros are executed in the GUI process.
+
+        """
+
+        if not self.running:
+            return
+
+        self.timer.stop()
+
+        code_array = self.main_window.grid.model.code_array
+        code_array.kernel.stop()
+        code_array.kernel = None
+
+        self.main_window.macro_panel.on_apply()
+
+    def restart(self):
+        """Restarts kernel process, e.g. for canceling a recalculation"""
+
+        if self.running:
+            self.main_window.grid.model.code_array.kernel.restart()
+            self.on_timeout()
+
+    def on_timeout(self):
+        """Exchanges requests and results with the kernel"""
+
+        keys = self.main_window.grid.model.code_array.kernel.poll()
+        if keys:
+            update_viewports(self.main_window, keys)
+
+
+def update_viewports(main_window: QMainWindow,
+                     keys: List[Tuple[int, int, int]]):
+    """Repaints cells in all grids, e.g. after their results have changed
+
+    Cell data is unchanged, so that only the viewports are updated.
+
+    :param main_window: Application main window
+    :param keys: Keys of cells to be repainted
+
+    """
+
+    for grid in main_window.grids:
+        table_keys = [(row, column) for row, column, table in keys
+                      if table == grid.table]
+        if table_keys:
+            rows, columns = zip(*table_keys)
+            top_left = grid.model.index(min(rows), min(columns))
+            bottom_right = grid.model.index(max(rows), max(columns))
+            rect = grid.visualRect(top_left)
+            rect = rect.united(grid.visualRect(bottom_right))
+            grid.viewport().update(rect)
@@ -117,10 +117,22 @@ class Settings:
     """Timeout for cell calculations in milliseconds"""
 
 
+    recalculation_timeout = 0
+    """Time budget for recalculating all cells in milliseconds, 0: no limit"""
+
+
     refresh_timeout = 1000
     """Timeout for frozen cell updates in milliseconds"""
 
 
+    result_cache_size = 1024
+    """Memory budget for cached cell results in MiB"""
+
+
+    result_snapshot_size = 0
+    """Size limit for result snapshots saved with files in MiB, 0: disabled"""
+
+
     signature_key = None
     """Key for signing save files"""
 
@@ -140,6 +152,9 @@ class Settings:
     show_frozen = False
     """If `True` then frozen cell background is striped"""
 
+    show_heat_map = False
+    """If `True` then profiled cell background is colored by evaluation time"""
+
 
     find_dialog_state = None
     """Find dialog state - needs to be stored when dialog is closed"""
@@ -223,7 +238,10 @@ class Settings:
         if self.file_history:
             settings.setValue("file_history", self.file_history)
         settings.setValue("timeout", self.timeout)
+        settings.setValue("recalculation_timeout", self.recalculation_timeout)
         settings.setValue("refresh_timeout", self.refresh_timeout)
+        settings.setValue("result_cache_size", self.result_cache_size)
+        settings.setValue("result_snapshot_size", self.result_snapshot_size)
         settings.setValue("signature_key", self.signature_key)
 
         # GUI state
@@ -259,8 +277,12 @@ class Settings:
 
         settings.sync()
 
-    def restore(self):
-        """Restores application state from QSettings"""
+    def restore(self, widgets: bool = True):
+        """Restores application state from QSettings
+
+        :param widgets: Restore GUI state, requires main window as parent
+
+        """
 
         if self.reset_settings:
             return
@@ -290,9 +312,15 @@ class Settings:
         setting2attr("max_file_history", mapper=int)
         setting2attr("file_history")
         setting2attr("timeout", mapper=int)
+        setting2attr("recalculation_timeout", mapper=int)
         setting2attr("refresh_timeout", mapper=int)
+        setting2attr("result_cache_size", mapper=int)
+        setting2attr("result_snapshot_size", mapper=int)
         setting2attr("signature_key")
 
+        if not widgets:
+            return
+
         # GUI state
 
         for widget_name in self.widget_names:
@@ -33,6 +33,7 @@ import sys
 
 import pytest
 
+from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QApplication
 
 PYSPREADPATH = abspath(join(dirname(__file__) + "/.."))
@@ -276,6 +277,9 @@ class TestGridTableModel:
     def test_reset(self):
         """Unit test for reset"""
 
+        self.model.code_array.dirty.add((0, 0, 0))
+        self.model.code_array.volatile_keys.add((0, 0, 0))
+
         self.model.reset()
 
         assert not self.model.code_array.dict_grid
@@ -284,6 +288,25 @@ class TestGridTableModel:
         assert not self.model.code_array.col_widths
         assert not self.model.code_array.macros
         assert not self.model.code_array.result_cache
+        assert not self.model.code_array.dirty
+        assert not self.model.code_array.volatile_keys
+
+    def test_derived_cache(self):
+        """Unit test for objects that are derived from shared formats"""
+
+        key1, key2 = (0, 0, 0), (5, 3, 0)
+        attr = self.model.code_array.cell_attributes[key1]
+        assert self.model.code_array.cell_attributes[key2] is attr
+
+        font1 = self.model.font(key1)
+        font2 = self.model.font(key2)
+        assert font1 == font2 and font1 is not font2
+        assert "font" in self.model._derived_cache[attr]
+
+        index1 = self.model.index(*key1[:2])
+        index2 = self.model.index(*key2[:2])
+        assert self.model.data(index1, Qt.TextAlignmentRole) == \
+            self.model.data(index2, Qt.TextAlignmentRole)
 
 
 class TestGridCellDelegate:
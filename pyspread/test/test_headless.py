@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+test_headless
+=============
+
+Unit tests for headless.py
+
+"""
+
+import json
+
+import pytest
+
+from ..headless import export_results, load_code_array, resolve_awaitables
+from ..lib.hashing import sign
+
+PYSU = b"""[Pyspread save file version]
+2.0
+[shape]
+10\t5\t2
+[grid]
+0\t0\t0\t'a = 2'
+1\t0\t0\t'S[0, 0, 0] * 21'
+0\t1\t0\t'"text"'
+2\t2\t1\t'square(3)'
+[attributes]
+[row_heights]
+[col_widths]
+[macros]
+def square(x):
+    return x * x
+"""
+
+
+class Settings:
+    """Simulates settings class"""
+
+    shape = 1000, 100, 3
+    timeout = 1000
+    recalculation_timeout = 0
+    result_cache_size = 100
+    signature_key = b"test key"
+
+
+@pytest.fixture
+def signed_file(tmp_path):
+    """Returns path of a signed pysu file"""
+
+    filepath = tmp_path / "test.pysu"
+    filepath.write_bytes(PYSU)
+    signature_path = tmp_path / "test.pysu.sig"
+    signature_path.write_bytes(sign(PYSU, Settings.signature_key))
+
+    return filepath
+
+
+def test_load_code_array(signed_file):
+    """Unit test for load_code_array"""
+
+    code_array = load_code_array(signed_file, Settings())
+
+    assert code_array.shape == (10, 5, 2)
+    assert code_array((1, 0, 0)) == 'S[0, 0, 0] * 21'
+    assert "def square" in code_array.macros
+
+
+def test_load_code_array_unsigned(signed_file):
+    """Unit test for load_code_array with unapproved file"""
+
+    signed_file.write_bytes(PYSU + b"print(1)\n")
+
+    with pytest.raises(ValueError):
+        load_code_array(signed_file, Settings())
+
+
+@pytest.mark.parametrize("file_format", ["csv", "json"])
+def test_export_results(signed_file, file_format):
+    """Unit test for export_results"""
+
+    code_array = load_code_array(signed_file, Settings())
+    code_array.execute_macros()
+
+    filepaths = export_results(code_array, signed_file.with_suffix(""),
+                               file_format)
+
+    assert [path.name for path in filepaths] == \
+        ["test_0.{}".format(file_format), "test_1.{}".format(file_format)]
+
+    if file_format == "csv":
+        assert filepaths[0].read_text().splitlines() == ["2,text", "42,"]
+    else:
+        rows = json.loads(filepaths[1].read_text())
+        assert rows[2][2] == 9
+        assert len(rows) == 3 and len(rows[0]) == 3
+
+
+def test_resolve_awaitables(signed_file):
+    """Unit test for resolve_awaitables"""
+
+    code_array = load_code_array(signed_file, Settings())
+    code_array.execute_macros()
+
+    code_array[3, 0, 0] = "asyncio.sleep(0.01, result=S[1, 0, 0])"
+    code_array[4, 0, 0] = "asyncio.sleep(0.01, result=S[3, 0, 0] + 1)"
+
+    resolve_awaitables(code_array)
+
+    assert code_array[3, 0, 0] == 42
+    assert code_array[4, 0, 0] == 43
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+test_scheduler
+==============
+
+Unit tests for scheduler.py
+
+"""
+
+from contextlib import contextmanager
+from os.path import abspath, dirname, join
+import sys
+import threading
+from time import monotonic
+
+from PyQt5.QtWidgets import QApplication
+
+PYSPREADPATH = abspath(join(dirname(__file__) + "/.."))
+
+
+@contextmanager
+def insert_path(path):
+    sys.path.insert(0, path)
+    yield
+    sys.path.pop(0)
+
+
+with insert_path(PYSPREADPATH):
+    from ..pyspread import MainWindow
+    from ..lib.attrdict import AttrDict
+    from ..lib.selection import Selection
+
+
+app = QApplication.instance()
+if app is None:
+    app = QApplication([])
+main_window = MainWindow()
+
+# The main window may have imported the model as top level module
+CellAttribute = sys.modules[
+    type(main_window.grid.model.code_array).__module__].CellAttribute
+
+
+class TestEvaluationScheduler:
+    """Unit tests for EvaluationScheduler"""
+
+    scheduler = main_window.evaluation_scheduler
+    code_array = main_window.grid.model.code_array
+
+    def setup_method(self, method):
+        """Fills cells in current table, far away and in another table"""
+
+        main_window.safe_mode = False
+        main_window.grid.table = 0
+
+        self.code_array.dict_grid.clear()
+        self.code_array.result_cache.clear()
+
+        self.code_array[999, 0, 1] = "0 + 1"
+        self.code_array[999, 0, 0] = "0 + 2"
+        self.code_array[0, 0, 0] = "0 + 3"
+
+    def teardown_method(self, method):
+        """Stops scheduler and removes cells"""
+
+        self.scheduler.cancel()
+        self.code_array.dict_grid.clear()
+        self.code_array.result_cache.clear()
+
+    def test_prioritized_keys(self):
+        """Unit test for prioritized_keys"""
+
+        assert self.scheduler.prioritized_keys() == \
+            [(0, 0, 0), (999, 0, 0), (999, 0, 1)]
+
+    def test_start(self):
+        """Unit test for start and on_timeout"""
+
+        self.scheduler.start()
+
+        assert self.scheduler.running
+        assert not self.code_array.result_cache
+
+        while self.scheduler.running:
+            self.scheduler.on_timeout()
+
+        assert set(self.code_array.result_cache) == \
+            {(0, 0, 0), (999, 0, 0), (999, 0, 1)}
+
+    def test_start_safe_mode(self):
+        """Unit test for start in safe mode"""
+
+        main_window.safe_mode = True
+        self.scheduler.start()
+
+        assert not self.scheduler.running
+
+        # Leaving safe mode applies the macros and starts the scheduler
+        main_window.safe_mode = False
+
+        assert self.scheduler.running
+
+
+class TestFrozenCellRefresher:
+    """Unit tests for FrozenCellRefresher"""
+
+    refresher = main_window.frozen_cell_refresher
+    code_array = main_window.grid.model.code_array
+
+    def setup_method(self, method):
+        """Creates frozen cell that counts its refreshes and a dependent"""
+
+        main_window.safe_mode = False
+        main_window.grid.table = 0
+
+        self.code_array.dict_grid.clear()
+        self.code_array.result_cache.clear()
+        self.code_array.frozen_cache.clear()
+
+        self.code_array.get_globals()["refresh_log"] = []
+
+        selection = Selection([], [], [], [], [(0, 0)])
+        attr_dict = AttrDict([("frozen", True), ("refresh_interval", 10)])
+        self.code_array.cell_attributes.append(
+            CellAttribute(selection, 0, attr_dict))
+
+        self.code_array[0, 0, 0] = "refresh_log.append(1) or len(refresh_log)"
+        self.code_array[1, 0, 0] = "S[0, 0, 0] + 100"
+
+    def teardown_method(self, method):
+        """Stops refresher and removes cells"""
+
+        self.refresher.stop()
+        self.code_array.cell_attributes.pop()
+        self.code_array.dict_grid.clear()
+        self.code_array.result_cache.clear()
+        self.code_array.frozen_cache.clear()
+
+    def test_interval(self):
+        """Unit test for interval"""
+
+        assert self.refresher.interval((0, 0, 0)) == 0.01
+        assert self.refresher.interval((1, 0, 0)) == \
+            main_window.settings.refresh_timeout / 1000
+
+    def test_refresh(self):
+        """Unit test for periodic refreshes in worker threads"""
+
+        assert self.code_array[1, 0, 0] == 101
+
+        self.refresher.start()
+
+        end = monotonic() + 5
+        while self.code_array.frozen_cache["(0, 0, 0)"] < 3 \
+                and monotonic() < end:
+            app.processEvents()
+
+        assert self.code_array.frozen_cache["(0, 0, 0)"] >= 3
+        assert self.code_array[1, 0, 0] >= 103
+
+        self.refresher.stop()
+
+        assert not self.refresher.running
+        assert not self.refresher.queue
+
+    def test_refresh_without_lock(self):
+        """Unit test that workers evaluate without the model lock"""
+
+        code = self.code_array((0, 0, 0))
+        worker = threading.Thread(target=self.refresher._refresh,
+                                  args=(self.code_array, (0, 0, 0), code,
+                                        self.refresher.generation))
+
+        with self.code_array.lock:
+            worker.start()
+            worker.join(5)
+            assert not worker.is_alive()
+
+        assert self.code_array.get_globals()["refresh_log"] == [1]
+
+    def test_on_result_outdated(self):
+        """Unit test that results from before a restart are discarded"""
+
+        assert self.code_array[0, 0, 0] == 1
+
+        generation = self.refresher.generation
+        self.refresher.start()
+        self.refresher.stop()
+        self.refresher.start()
+
+        code = self.code_array((0, 0, 0))
+        self.refresher.on_result((0, 0, 0), code, "outdated", generation)
+        assert self.code_array.frozen_cache["(0, 0, 0)"] != "outdated"
+
+        self.refresher.on_result((0, 0, 0), code, "current",
+                                 self.refresher.generation)
+        assert self.code_array.frozen_cache["(0, 0, 0)"] == "current"
+
+
+class TestAwaitableResultUpdater:
+    """Unit tests for AwaitableResultUpdater"""
+
+    code_array = main_window.grid.model.code_array
+
+    def setup_method(self, method):
+        """Adds cell that returns a coroutine and a dependent cell"""
+
+        main_window.safe_mode = False
+
+        self.code_array[0, 0, 0] = "asyncio.sleep(0.05, result=21)"
+        self.code_array[1, 0, 0] = "S[0, 0, 0] * 2"
+
+    def teardown_method(self, method):
+        """Removes cells"""
+
+        self.code_array.dict_grid.clear()
+        self.code_array.result_cache.clear()
+
+    def test_on_awaitable_done(self):
+        """Unit test for applying results in the GUI thread"""
+
+        assert repr(self.code_array[0, 0, 0]) == "Pending..."
+        self.code_array[1, 0, 0]
+
+        end = monotonic() + 5
+        while repr(self.code_array.result_cache.get((0, 0, 0))) == \
+                "Pending..." and monotonic() < end:
+            app.processEvents()
+
+        assert self.code_array[0, 0, 0] == 21
+        assert (1, 0, 0) not in self.code_array.result_cache
+        assert self.code_array[1, 0, 0] == 42
@@ -668,10 +668,14 @@ class CellButton(QPushButton):
     def on_clicked(self):
         """Clicked event handler, executes cell code"""
 
+        if self.grid.model.code_array.kernel is not None:
+            self.grid.model.code_array.kernel.press_button(self.key)
+            return
+
         code = self.grid.model.code_array(self.key)
         result = self.grid.model.code_array._eval_cell(self.key, code)
         self.grid.model.code_array.frozen_cache[repr(self.key)] = result
-        self.grid.model.code_array.result_cache.clear()
+        self.grid.model.code_array.reset_results()
         self.grid.model.dataChanged.emit(QModelIndex(), QModelIndex())
 
 
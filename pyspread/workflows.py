@@ -72,6 +72,7 @@ try:
     from pyspread.lib.file_helpers import \
         (linecount, file_progress_gen, ProgressDialogCanceled)
     from pyspread.model.model import CellAttribute
+    from pyspread.model.snapshot import get_snapshot_path, ResultSnapshot
 except ImportError:
     import commands
     from dialogs \
@@ -89,6 +90,7 @@ except ImportError:
     from lib.file_helpers import \
         (linecount, file_progress_gen, ProgressDialogCanceled)
     from model.model import CellAttribute
+    from model.snapshot import get_snapshot_path, ResultSnapshot
 
 
 class Workflows:
@@ -315,6 +317,11 @@ class Workflows:
             grid.model.reset()
             self.main_window.safe_mode = False
             return
+        # Files that have been formatted for a long time are compacted
+        cell_attributes = code_array.cell_attributes
+        if len(cell_attributes) > cell_attributes.compaction_threshold:
+            cell_attributes.compact()
+
         # Explicitly set the grid shape
         shape = code_array.shape
         grid.model.shape = shape
@@ -341,6 +348,9 @@ class Workflows:
         # Update macro editor
         self.main_window.macro_panel.update()
 
+        # Restore results that have been saved with the file
+        self.load_result_snapshot(filepath)
+
         # Add to file history
         self.main_window.settings.add_to_file_history(filepath.as_posix())
 
@@ -474,6 +484,62 @@ class Workflows:
 
         self.sign_file(filepath)
 
+        self.save_result_snapshot(filepath)
+
+    def load_result_snapshot(self, filepath: Path):
+        """Restores cell results from result snapshot of filepath
+
+        Nothing is restored in safe mode.
+
+        :param filepath: Path of the opened file
+
+        """
+
+        snapshot_path = get_snapshot_path(filepath)
+        if self.main_window.safe_mode or not snapshot_path.exists():
+            return
+
+        code_array = self.main_window.grid.model.code_array
+        signature_key = self.main_window.settings.signature_key
+
+        try:
+            restored = ResultSnapshot(code_array).read(snapshot_path,
+                                                       signature_key)
+        except Exception as error:
+            # Snapshots are optional, a broken snapshot is ignored
+            msg = "Result snapshot not loaded: {}".format(error)
+            self.main_window.statusBar().showMessage(msg)
+            return
+
+        if restored:
+            msg = "{} results restored from snapshot.".format(restored)
+            self.main_window.statusBar().showMessage(msg)
+            self.main_window.grid.gui_update()
+
+    def save_result_snapshot(self, filepath: Path):
+        """Saves cached cell results as result snapshot of filepath
+
+        The snapshot is only saved if enabled in the preferences and if not
+        in safe mode.
+
+        :param filepath: Path of the saved file
+
+        """
+
+        maxbytes = self.main_window.settings.result_snapshot_size * 2**20
+        if self.main_window.safe_mode or not maxbytes:
+            return
+
+        code_array = self.main_window.grid.model.code_array
+        signature_key = self.main_window.settings.signature_key
+
+        try:
+            ResultSnapshot(code_array).write(get_snapshot_path(filepath),
+                                             signature_key, maxbytes)
+        except (OSError, ValueError) as error:
+            msg = "Error saving result snapshot: {}".format(error)
+            self.main_window.statusBar().showMessage(msg)
+
     def file_save(self):
         """File save workflow"""
 
@@ -785,6 +851,25 @@ class Workflows:
         except Exception as error:
             self.main_window.statusBar().showMessage(str(error))
 
+    def profile_export(self):
+        """Export hot cell report of the cell profiler to a csv file"""
+
+        dial = FileExportDialog(self.main_window, ["CSV (*.csv)"])
+        if not dial.file_path:
+            return  # Cancel pressed
+        filepath = Path(dial.file_path)
+
+        if filepath.suffix != dial.suffix:
+            filepath = filepath.with_suffix(dial.suffix)
+
+        profiler = self.main_window.grid.model.code_array.profiler
+
+        try:
+            with open(filepath, "w", newline='', encoding='utf-8') as csvfile:
+                profiler.write_csv(csvfile)
+        except OSError as error:
+            self.main_window.statusBar().showMessage(str(error))
+
     @contextmanager
     def print_zoom(self, zoom: float = 1.0):
         """Decorator for tasks that have to take place in standard zoom